@@ -0,0 +1,228 @@
+"""
+admission Module
+================
+
+Holds back new job starts while the machine is busy with work that isn't LQTS's,
+e.g. an engineer using their desktop.  Before a job is started the controller
+looks at
+
+    * the 1 minute load average, less the cores LQTS's own jobs are using, per cpu
+    * the pressure stall information in /proc/pressure/{cpu,memory,io} (the
+      "some" avg10 percentage, Linux 4.20+)
+    * the memory available to new processes
+
+and holds the start if any of them is over its threshold.  Readings are taken at
+most once per *interval* seconds.  Thresholds of 0 are turned off, as are
+readings the platform doesn't provide.
+
+With *autoscale* on, the pool also shrinks its worker count by one each time it
+checks under pressure and grows it by one (up to the configured count) once all
+readings are below half their thresholds.
+
+Changes between admitting and holding are logged.  *metrics* gives the latest
+readings and counts for the API.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+
+import psutil
+
+from lqts.simple_logging import Level, getLogger
+
+PRESSURE_DIR = Path("/proc/pressure")
+
+
+def read_pressure(resource: str, pressure_dir: Path = PRESSURE_DIR) -> float | None:
+    """The "some" avg10 stall percentage of cpu, memory or io, or None if not available"""
+    try:
+        text = (pressure_dir / resource).read_text()
+    except OSError:
+        return None
+    for line in text.splitlines():
+        kind, *fields = line.split()
+        if kind == "some":
+            values = dict(field.split("=", 1) for field in fields)
+            return float(values["avg10"])
+    return None
+
+
+def read_load() -> float | None:
+    """The 1 minute load average, or None if not available"""
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+
+
+def read_available_mb() -> float:
+    return psutil.virtual_memory().available / 2**20
+
+
+class AdmissionController:
+    """
+    Parameters
+    ----------
+    max_load: float
+        Load average per cpu, not counting LQTS's jobs, above which starts are held
+    max_cpu_pressure, max_memory_pressure, max_io_pressure: float
+        "some" avg10 stall percentages above which starts are held
+    min_available_mb: float
+        Starts are held when less memory than this is available
+    autoscale: bool
+        Shrink and grow the pool's worker count with the pressure
+    interval: float
+        Seconds the readings are reused for
+    """
+
+    def __init__(
+        self,
+        max_load: float = 0.0,
+        max_cpu_pressure: float = 0.0,
+        max_memory_pressure: float = 0.0,
+        max_io_pressure: float = 0.0,
+        min_available_mb: float = 0.0,
+        autoscale: bool = False,
+        interval: float = 1.0,
+        pressure_dir: Path = PRESSURE_DIR,
+    ):
+        self.max_load = max_load
+        self.max_cpu_pressure = max_cpu_pressure
+        self.max_memory_pressure = max_memory_pressure
+        self.max_io_pressure = max_io_pressure
+        self.min_available_mb = min_available_mb
+        self.autoscale = autoscale
+        self.interval = interval
+        self.pressure_dir = Path(pressure_dir)
+
+        self.log = getLogger("lqts", Level.INFO)
+        self._lock = threading.Lock()
+
+        self.readings: dict = {}
+        self.reasons: list[str] = []
+        self.holding = False
+        self.admitted = 0  # job starts allowed
+        self.held = 0  # job starts held back
+        self.held_seconds = 0.0  # total time spent holding
+        self.shrinks = 0
+        self.grows = 0
+        self._last_reading = 0.0
+        self._held_since = None
+
+    @property
+    def enabled(self) -> bool:
+        return any(
+            (self.max_load, self.max_cpu_pressure, self.max_memory_pressure, self.max_io_pressure, self.min_available_mb)
+        )
+
+    def _read(self, busy_cores: int) -> dict:
+        load = read_load()
+        cpus = psutil.cpu_count() or 1
+        return {
+            "load_per_cpu": None if load is None else max(load - busy_cores, 0.0) / cpus,
+            "cpu_pressure": read_pressure("cpu", self.pressure_dir),
+            "memory_pressure": read_pressure("memory", self.pressure_dir),
+            "io_pressure": read_pressure("io", self.pressure_dir),
+            "available_mb": read_available_mb(),
+        }
+
+    def _over(self, readings: dict, scale: float = 1.0) -> list[str]:
+        """Descriptions of the readings over *scale* times their thresholds"""
+        reasons = []
+        for name, limit in (
+            ("load_per_cpu", self.max_load),
+            ("cpu_pressure", self.max_cpu_pressure),
+            ("memory_pressure", self.max_memory_pressure),
+            ("io_pressure", self.max_io_pressure),
+        ):
+            value = readings.get(name)
+            if limit and value is not None and value > limit * scale:
+                reasons.append(f"{name}={value:.2f} > {limit * scale:.2f}")
+        available = readings.get("available_mb")
+        if self.min_available_mb and available is not None and available < self.min_available_mb / scale:
+            reasons.append(f"available_mb={available:.0f} < {self.min_available_mb / scale:.0f}")
+        return reasons
+
+    def update(self, busy_cores: int = 0, now: float | None = None) -> list[str]:
+        """
+        Takes new readings if the last ones are older than *interval*.  Returns
+        the reasons starts are held (empty if they are not).
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if now - self._last_reading < self.interval:
+                return self.reasons
+            self._last_reading = now
+            self.readings = self._read(busy_cores)
+            self.reasons = self._over(self.readings)
+
+            if self.reasons and not self.holding:
+                self.log.warning(f"!!! Holding job starts: {', '.join(self.reasons)}")
+                self._held_since = now
+            elif self.holding and not self.reasons:
+                self.log.info(f"*** Resuming job starts after {now - self._held_since:.0f} s")
+                self.held_seconds += now - self._held_since
+                self._held_since = None
+            self.holding = bool(self.reasons)
+            return self.reasons
+
+    def admit(self, busy_cores: int = 0, now: float | None = None) -> bool:
+        """True if a job may start now"""
+        if not self.enabled:
+            return True
+        if self.update(busy_cores, now):
+            self.held += 1
+            return False
+        self.admitted += 1
+        return True
+
+    def target_workers(self, current: int, limit: int, busy_cores: int = 0) -> int:
+        """
+        The worker count autoscaling wants: one fewer while under pressure, one more
+        (up to *limit*) once every reading is under half its threshold
+        """
+        if not (self.autoscale and self.enabled):
+            return limit
+        if self.update(busy_cores):
+            target = max(current - 1, 1)
+        elif not self._over(self.readings, scale=0.5):
+            target = min(current + 1, limit)
+        else:
+            target = current
+        target = min(target, limit)
+
+        if target < current:
+            self.shrinks += 1
+            self.log.info(f"*** Reducing workers to {target} ({', '.join(self.reasons)})")
+        elif target > current:
+            self.grows += 1
+            self.log.info(f"*** Increasing workers to {target}")
+        return target
+
+    def metrics(self) -> dict:
+        """The latest readings, thresholds and decision counts"""
+        with self._lock:
+            held_seconds = self.held_seconds
+            if self._held_since is not None:
+                held_seconds += time.time() - self._held_since
+            return {
+                "enabled": self.enabled,
+                "holding": self.holding,
+                "reasons": list(self.reasons),
+                "readings": dict(self.readings),
+                "thresholds": {
+                    "max_load": self.max_load,
+                    "max_cpu_pressure": self.max_cpu_pressure,
+                    "max_memory_pressure": self.max_memory_pressure,
+                    "max_io_pressure": self.max_io_pressure,
+                    "min_available_mb": self.min_available_mb,
+                },
+                "admitted": self.admitted,
+                "held": self.held,
+                "held_seconds": held_seconds,
+                "autoscale": self.autoscale,
+                "shrinks": self.shrinks,
+                "grows": self.grows,
+            }
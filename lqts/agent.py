@@ -0,0 +1,179 @@
+"""
+agent Module
+============
+
+An Agent runs jobs from an LQTS server on another machine.  It asks the server
+for jobs that fit in its free cores (``/api_v1/job_request``), runs them exactly
+like the server's own pool does (a WorkItem with the same log file, cpu affinity,
+priority and walltime handling) and reports each one when it finishes
+(``/api_v1/heartbeat``).  Several agents can serve one queue, so the queue can use
+the cores of several machines.
+
+Jobs are pulled by the agent, so the server never has to reach the agent's machine.
+Every job handed to an agent is leased to it for LQTS_LEASE_TTL seconds.  The agent
+renews the leases of all of its running jobs, and reports the ones that finished,
+in a single heartbeat request each pass of its loop.  If an agent goes away its
+jobs are requeued once their leases run out.
+The working directory and log file of a job have to be valid paths on the agent's
+machine (e.g. a shared file system).
+"""
+
+import socket
+import time
+
+import requests
+
+from lqts.core.schema import AgentReport, Job, JobID, JobStatus
+from lqts.mp_pool2 import WorkItem
+from lqts.resources import CPUResourceManager
+from lqts.simple_logging import Level, getLogger
+
+
+class Agent:
+    """
+    Pulls jobs from an LQTS server and runs them on this machine
+
+    Parameters
+    ----------
+    url: str
+        Base url of the server, e.g. http://server:9200
+    cores: int
+        Number of cores on this machine to use for jobs
+    name: str
+        Name reported to the server.  Defaults to the host name
+    poll_interval: float
+        Seconds between checks for finished jobs and new work
+    session:
+        Object used to make the http requests (a requests.Session by default)
+    """
+
+    def __init__(self, url: str, cores: int, name: str = "", poll_interval: float = 1.0, session=None):
+        self.url = url.rstrip("/")
+        self.name = name or socket.gethostname()
+        self.poll_interval = poll_interval
+        self.session = session if session is not None else requests.Session()
+
+        self.CPUManager = CPUResourceManager(cores)
+
+        self._work_items: dict[JobID, WorkItem] = {}
+        self._finished_jobs: list[Job] = []  # finished jobs not yet reported to the server
+        self._stopping = False
+
+        self.log = getLogger(f"lqts-agent-{self.name}", Level.INFO)
+
+    def request_jobs(self) -> int:
+        """
+        Asks the server for jobs until there are no free cores or no jobs that fit.
+        Returns the number of jobs started.
+        """
+        started = 0
+        while self.CPUManager.cpu_avalaible_count() > 0:
+            response = self.session.get(
+                f"{self.url}/api_v1/job_request",
+                params={"cores": self.CPUManager.cpu_avalaible_count(), "agent": self.name},
+            )
+            data = response.json()
+            if not data:
+                break
+
+            job = Job.model_validate(data)
+            some_available, cores = self.CPUManager.get_processors(count=job.job_spec.cores)
+            if not some_available:
+                # the server honours the core count we sent, so this shouldn't happen
+                job.status = JobStatus.Error
+                job.completed = job.started
+                self.report(job)
+                break
+
+            work_item = WorkItem(job=job, cores=cores)
+            self._work_items[job.job_id] = work_item
+            try:
+                work_item.start()
+            except Exception as ex:
+                self.log.error(f"Error starting job {job.job_id}: {ex}")
+                job.status = JobStatus.Error
+            self.log.info(f">>> Started     job {job.job_id}.  cores={cores}")
+            started += 1
+
+            if work_item.job.status == JobStatus.Error:
+                # the command could not be started
+                self._finish(job.job_id, work_item)
+
+        return started
+
+    def process_completions(self) -> int:
+        """
+        Reports finished jobs to the server and frees their cores.  Returns the
+        number of jobs that finished.
+        """
+        finished = 0
+        for job_id, work_item in list(self._work_items.items()):
+            if not work_item.is_running():
+                # like the server's pool, give the logging thread one more pass
+                # before the log file is closed
+                work_item.mark += 1
+                if work_item.mark > 1:
+                    self._finish(job_id, work_item)
+                    finished += 1
+        return finished
+
+    def _finish(self, job_id: JobID, work_item: WorkItem):
+        work_item.clean_up()
+        self.CPUManager.free_processors(work_item.cores)
+        self._work_items.pop(job_id)
+        self.report(work_item.job)
+        self.log.info(f"--- Completed   job {job_id}.  Duration = {work_item.job.walltime}")
+
+    def report(self, job: Job):
+        """Queues a finished job to be reported with the next heartbeat"""
+        self._finished_jobs.append(job)
+
+    def heartbeat(self) -> list[JobID]:
+        """
+        Renews the leases of the running jobs and reports the finished ones.
+        Jobs the server says this agent no longer holds are killed.  Returns
+        the ids of the killed jobs.
+        """
+        report = AgentReport(agent=self.name, running=list(self._work_items), completed=self._finished_jobs)
+        response = self.session.post(f"{self.url}/api_v1/heartbeat", json=report.model_dump(mode="json"))
+        response.raise_for_status()
+        lost = [JobID.parse_obj(item) for item in response.json()["lost"]]
+
+        # only forget the finished jobs once the server has them
+        self._finished_jobs = self._finished_jobs[len(report.completed) :]
+
+        for job_id in lost:
+            work_item = self._work_items.pop(job_id, None)
+            if work_item is not None:
+                self.log.info(f"--- Lost lease on job {job_id}.  Killing it")
+                work_item.kill(JobStatus.Deleted)
+                work_item.clean_up()
+                self.CPUManager.free_processors(work_item.cores)
+        return lost
+
+    def run_once(self):
+        """One pass of the agent's loop"""
+        self.process_completions()
+        if self._work_items or self._finished_jobs:
+            self.heartbeat()
+        if not self._stopping:
+            self.request_jobs()
+
+    def run(self):
+        """
+        Runs until stop() is called and the running jobs have finished
+        """
+        self.log.info(f"Agent {self.name} serving {self.url} with {self.CPUManager.cpu_count} cores")
+        while not (self._stopping and not self._work_items and not self._finished_jobs):
+            try:
+                self.run_once()
+            except requests.exceptions.ConnectionError:
+                self.log.error(f"Could not reach lqts server at {self.url}")
+            except (requests.exceptions.RequestException, ValueError, KeyError) as ex:
+                # a bad or unexpected reply: the unreported jobs are kept for the next pass
+                self.log.error(f"Bad reply from lqts server at {self.url}: {ex!r}")
+            time.sleep(self.poll_interval)
+
+    def stop(self):
+        """Stop asking for new jobs.  run() returns when the running jobs are done"""
+        self._stopping = True
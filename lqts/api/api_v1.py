@@ -1,7 +1,14 @@
+import itertools
 from datetime import datetime
 
+from fastapi import HTTPException
+from fastapi.responses import PlainTextResponse
+
+from lqts import metrics
 from lqts.core import server
-from lqts.core.schema import Job, JobID, JobSpec, JobStatus
+from lqts.core.schema import AgentReport, Job, JobID, JobSpec
+from lqts.overhead import overhead_report
+from lqts.profiling import timed
 
 API_VERSION = "api_v1"
 
@@ -9,6 +16,7 @@ app = server.get_app()
 
 
 @app.get(f"/{API_VERSION}/qstat")
+@timed("qstat")
 async def get_queue_status(options: dict):
     # print(options)
 
@@ -27,26 +35,99 @@ async def get_queue_status(options: dict):
     return queue_status
 
 
+@app.get(f"/{API_VERSION}/history")
+async def get_history(
+    group: int | None = None,
+    status: str | None = None,
+    command: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = 100,
+) -> list[Job]:
+    """
+    Gets finished jobs from the history database, most recent first.
+    *command* matches any part of the command.  *since* and *until* limit the
+    completion time.
+    """
+    if app.queue.history is None:
+        return []
+    try:
+        return app.queue.history.query(
+            group=group, status=status, command=command, since=since, until=until, limit=limit
+        )
+    except ValueError as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
+
+
+@app.get(f"/{API_VERSION}/history/summary")
+async def get_history_summary(
+    by: str = "status",
+    group: int | None = None,
+    status: str | None = None,
+    command: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> list[dict]:
+    """
+    Job counts and walltime totals from the history database, grouped *by*
+    status, group, command, agent or day
+    """
+    if app.queue.history is None:
+        return []
+    try:
+        return app.queue.history.summary(
+            by=by, group=group, status=status, command=command, since=since, until=until
+        )
+    except ValueError as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
+
+
+@app.get(f"/{API_VERSION}/overhead")
+async def get_overhead(group: int | None = None, limit: int = 1000, by_group: bool = True) -> list[dict]:
+    """
+    Per job group (or for all of them together, with by_group=false), how long
+    jobs spent between the phases recorded in Job.phases and how much of it was
+    scheduler overhead.  Covers the jobs in the queue and, with a history
+    database, up to *limit* finished jobs.
+    """
+    jobs = {}
+    if app.queue.history is not None:
+        for job in app.queue.history.query(group=group, limit=limit):
+            jobs[job.job_id] = job
+    for job in itertools.chain(list(app.queue.running_jobs.values()), list(app.queue.completed_jobs.values())):
+        if group is None or job.job_id.group == group:
+            jobs[job.job_id] = job
+    return overhead_report(jobs.values(), by_group=by_group)
+
+
 @app.post(f"/{API_VERSION}/qsub")
 async def qsub(job_specs: list[JobSpec]):
     # print(f"Submitted job specs {job_specs}")
-    return app.queue.submit(job_specs)
+    try:
+        return app.queue.submit(job_specs)
+    except ValueError as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
 
 
 @app.get(f"/{API_VERSION}/qsummary")
+@timed("qsummary")
 async def get_summary():
     """
     Gets a summary of what the state of the queue is.
     * I = Initialized
     * Q = Queued
     * R = Running
+    * P = Paused (running jobs suspended to make room for urgent ones)
     * D = Deleted
     * C = completed
     """
     # c = Counter([job.status.value for job in app.queue.jobs])
+    preempted = sum(1 for job in list(app.queue.running_jobs.values()) if job.preempted is not None)
     summary = {
-        "Running": len(app.queue.running_jobs),
-        "Queued": len(app.queue.queued_jobs),
+        "Running": len(app.queue.running_jobs) - preempted,
+        "Preempted": preempted,
+        "Queued": app.queue.queued_count(),
+        "Users": app.queue.user_summary(),
     }
     # for letter in "RQDC":
     #     if letter not in c:
@@ -55,6 +136,60 @@ async def get_summary():
     return summary
 
 
+@app.get(f"/{API_VERSION}/eta")
+async def get_eta(job_ids: list[str]) -> dict:
+    """
+    Estimates how many seconds until the given jobs (ids like "12.003", or "12"
+    for a whole group) have finished, from the predicted runtimes of the jobs
+    running and queued ahead of them
+    """
+    ids = []
+    for job_id in job_ids:
+        if "." not in job_id or job_id.endswith(".*"):
+            ids.extend(app.queue.unfinished_ids(int(job_id.partition(".")[0])))
+        else:
+            ids.append(JobID.parse_obj(job_id))
+    return app.queue.estimate_completion(ids, app.pool.max_workers)
+
+
+@app.post(f"/{API_VERSION}/predict")
+async def predict_runtime(job_spec: JobSpec) -> dict:
+    """
+    Predicted runtime of a job in seconds: the median and 90th percentile of the
+    runtimes of similar finished jobs.  Both are null if nothing similar has run.
+    """
+    return {
+        "median": app.queue.predictor.predict(job_spec),
+        "p90": app.queue.predictor.predict_p90(job_spec),
+    }
+
+
+@app.get(f"/{API_VERSION}/cache")
+async def get_cache_stats() -> dict:
+    """
+    Gets the hit/miss counts and size of the result cache
+    """
+    return app.pool.result_cache.stats()
+
+
+@app.get(f"/{API_VERSION}/admission")
+async def get_admission() -> dict:
+    """
+    Gets the admission controller's latest load, pressure and memory readings,
+    whether it is holding job starts (and why) and how often it has
+    """
+    return app.pool.admission.metrics()
+
+
+@app.get(f"/{API_VERSION}/resources")
+async def get_resources() -> dict:
+    """
+    Gets the capacity and use of each named resource, the jobs holding it and
+    the queued jobs waiting for it
+    """
+    return app.queue.resource_status()
+
+
 @app.get(f"/{API_VERSION}/workers")
 async def get_workers():
     """
@@ -74,9 +209,39 @@ async def set_workers(count: int) -> int:
     return app.pool.max_workers
 
 
+@app.get(f"/{API_VERSION}/autotune")
+async def get_autotune() -> dict:
+    """
+    Gets the worker autotuner's bounds, the throughput it measured for each
+    worker count and its recent windows and decisions
+    """
+    return app.pool.autotuner.report()
+
+
 @app.get(f"/{API_VERSION}/jobgroup")
 async def get_job_group(group_number: int) -> list[JobID]:
-    return list(app.queue.job_groups[group_number].jobs.keys())
+    """
+    Gets the ids of the jobs in a group that have not finished
+    """
+    return app.queue.unfinished_ids(group_number)
+
+
+@app.get(f"/{API_VERSION}/arrays")
+async def get_array_groups() -> list[dict]:
+    """
+    Gets a summary of each array group: its size, the number of members with
+    each status and the index ranges of the members that have not finished
+    """
+    return [
+        {
+            "group": array.group_number,
+            "size": len(array),
+            "counts": array.counts(),
+            "unfinished": array.unfinished_ranges(),
+            "summary": array.summary(),
+        }
+        for array in list(app.queue.array_groups.values())
+    ]
 
 
 @app.post(f"/{API_VERSION}/qclear")
@@ -119,39 +284,77 @@ async def qdel(job_ids: list[JobID]) -> dict[str, list[JobID]]:
     deleted_jobs = app.queue.qdel(job_ids)
 
     for job_id in deleted_jobs:
-        if job_id in app.pool._work_items:
-            app.pool.kill_job(job_id)
+        # also finds the jobs of packed chunks, which share a work item
+        app.pool.kill_job(job_id)
 
     return {"Deleted jobs": deleted_jobs}
 
 
 @app.post(f"/{API_VERSION}/qpriority")
-async def qpriority(priority: int, job_ids: list[JobID]):
+async def qpriority(
+    priority: int, job_ids: list[JobID], status: str | None = None, command: str | None = None
+) -> int:
+    """
+    Sets the priority of the listed jobs that also match *status* and
+    *command*, if given.  Returns the number of jobs changed.
+    """
     app.log.info(f"Setting priority of jobs {job_ids} to {priority}")
-    for job_id in job_ids:
-        job, _ = app.queue.find_job(job_id)
+    return app.queue.set_priority(priority, job_ids=job_ids, status=status, command=command)
+
 
-        job.job_spec.priority = priority
+@app.post(f"/{API_VERSION}/priority")
+async def set_priority(
+    priority: int,
+    group: int | None = None,
+    status: str | None = None,
+    command: str | None = None,
+) -> int:
+    """
+    Sets the priority of every queued or running job matching the filters:
+    *group*, *status* (e.g. Q or P) and *command* (a glob pattern such as
+    "*solver*").  At least one filter is required.  Returns the number of jobs
+    changed.
+    """
+    if group is None and not status and not command:
+        raise HTTPException(status_code=400, detail="Give a group, status or command to select the jobs")
+    return app.queue.set_priority(priority, group=group, status=status, command=command)
 
 
 @app.get(f"/{API_VERSION}/job_request")
-async def job_request() -> Job:
-    job = app.queue.queued_jobs.pop()
-    if job is None:
-        return "{}"
-    else:
-        job.started = datetime.now()
-        job.status = JobStatus.Running
-        app.queue.running_jobs[job.job_id] = job
-        app.log.info("  +Started job {} at {}".format(job.job_id, job.started))
-        return job
+async def job_request(cores: int = 1, agent: str = "") -> Job | None:
+    """
+    Used by remote agents (lqts-agent) to get a job to run.  Returns the next
+    runnable job needing no more than *cores* cores, or null if there is none.
+    The job is marked as running and leased to the agent, which must renew the
+    lease through /heartbeat or the job is requeued.
+    """
+    job = app.queue.request_job(cores, agent)
+    if job is not None:
+        app.log.info(f"  +Dispatched job {job.job_id} to agent {agent}")
+    return job
 
 
 @app.post(f"/{API_VERSION}/job_done")
 async def job_done(done_job: Job):
+    """
+    Used by remote agents to report that a job has finished
+    """
     app.queue.on_job_finished(done_job)
 
 
+@app.post(f"/{API_VERSION}/heartbeat")
+async def heartbeat(report: AgentReport) -> dict[str, list[JobID]]:
+    """
+    Used by remote agents to renew the leases of all their running jobs and
+    report their finished jobs in one request.  Returns the running jobs the
+    agent no longer holds, which it should kill.
+    """
+    lost = app.queue.agent_report(report)
+    if lost:
+        app.log.info(f"  Agent {report.agent} no longer holds jobs {lost}")
+    return {"lost": lost}
+
+
 @app.post(f"/{API_VERSION}/job_started")
 async def job_started():
     pass
@@ -162,3 +365,11 @@ async def qresume(job_ids: list[JobID]) -> list[JobID]:
     print("Received requst to resume some jobs")
     jobs_resumed = app.queue.resume(job_ids=job_ids)
     return jobs_resumed
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> str:
+    """
+    Gets the queue, pool and request metrics in the Prometheus text format
+    """
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,40 @@
+from fastapi import HTTPException
+from fastapi.responses import PlainTextResponse
+
+from lqts.core import server
+from lqts.profiling import TIMINGS, collapsed, sample_stacks
+
+MAX_PROFILE_SECONDS = 60
+
+app = server.get_app()
+
+
+@app.get("/debug/timings")
+async def get_timings() -> dict[str, dict]:
+    """
+    Gets the number of calls and total, mean, maximum and last durations (in
+    seconds) of the scheduler's hot paths and the qstat handlers
+    """
+    return TIMINGS.report()
+
+
+@app.get("/debug/profile")
+def get_profile(seconds: float = 5.0, interval: float = 0.005, format: str = "collapsed"):
+    """
+    Samples the stacks of all the server's threads every *interval* for
+    *seconds*.  Returns them as collapsed stacks, ready for flamegraph.pl or
+    speedscope, or with format=json as a dict of stack counts.  Only available
+    when LQTS_PROFILING is set.
+    """
+    if not app.config.profiling:
+        raise HTTPException(status_code=404, detail="Profiling is off.  Set LQTS_PROFILING to turn it on")
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {MAX_PROFILE_SECONDS}")
+
+    # a plain def runs in the thread pool, so the event loop's thread is sampled too
+    stacks, samples = sample_stacks(seconds, max(interval, 0.001))
+    if format == "json":
+        return {"samples": samples, "interval": interval, "stacks": dict(stacks.most_common())}
+    return PlainTextResponse(
+        collapsed(stacks), headers={"Content-Disposition": 'attachment; filename="lqts.collapsed"'}
+    )
@@ -0,0 +1,191 @@
+"""
+autotune Module
+===============
+
+Finds the worker count that gets the most work done.  Memory bandwidth bound
+jobs slow each other down, so past some point more concurrent jobs finish a
+batch later, not sooner.
+
+The tuner measures throughput over windows of at least *interval* seconds: the
+jobs the pool finished per second, each weighted by its predicted core-seconds
+relative to the average, so a window of short jobs doesn't look better than one
+of long jobs.  (Counting completions per core-second of the jobs themselves
+would always favor one worker.)  Windows in which the pool ran out of queued
+work, or in which the worker count was changed by someone else, are thrown
+away.
+
+The score of each worker count is kept as a moving average.  After each window
+the tuner moves to a neighboring count that scored more than *hysteresis*
+better, or else tries a neighbor (in the direction it is going first) that
+hasn't been measured in the last *memory* windows, or else stays put.  Scores
+expiring makes it look again now and then, as the job mix changes.
+
+Each window and decision is kept in *trajectory* for review.
+"""
+
+import threading
+import time
+from collections import deque
+
+from lqts.core.schema import Job
+from lqts.simple_logging import Level, getLogger
+
+
+class WorkerAutotuner:
+    """
+    Parameters
+    ----------
+    min_workers, max_workers: int
+        Bounds of the worker count
+    interval: float
+        Minimum length of a measurement window in seconds
+    min_completions: int
+        Windows are extended until at least this many jobs have finished
+    hysteresis: float
+        Fraction a neighboring count has to score better by before the tuner moves
+    memory: int
+        Number of windows a score is trusted for before the count is measured again
+    enabled: bool
+        False turns tuning off, so the report can still say so
+    """
+
+    def __init__(
+        self,
+        min_workers: int = 1,
+        max_workers: int = 1,
+        interval: float = 300.0,
+        min_completions: int = 5,
+        hysteresis: float = 0.05,
+        memory: int = 10,
+        enabled: bool = True,
+    ):
+        self.min_workers = max(min_workers, 1)
+        self.max_workers = max(max_workers, self.min_workers)
+        self.interval = interval
+        self.min_completions = min_completions
+        self.hysteresis = hysteresis
+        self.memory = memory
+        self.enabled = enabled
+
+        self.log = getLogger("lqts", Level.INFO)
+        self._lock = threading.Lock()
+
+        self.workers: int | None = None  # count the current window is measuring
+        self.direction = -1  # fewer workers first, that is what helps bandwidth bound jobs
+        self.scores: dict[int, tuple[float, int]] = {}  # workers -> (score, window number)
+        self.windows = 0
+        self.trajectory: deque = deque(maxlen=500)
+
+        self._mean_cost = 0.0  # moving average of the predicted core-seconds of finished jobs
+        self._reset(None, time.time())
+
+    def _reset(self, workers: int | None, now: float):
+        self.workers = workers
+        self._window_start = now
+        self._work = 0.0
+        self._completions = 0
+        self._starved = False
+
+    def record(self, job: Job):
+        """Counts a job the pool has finished"""
+        if not self.enabled or job.cached:
+            return
+        with self._lock:
+            weight = 1.0
+            if job.predicted_runtime:
+                cost = job.predicted_runtime * max(job.job_spec.cores, 1)
+                self._mean_cost = cost if not self._mean_cost else 0.95 * self._mean_cost + 0.05 * cost
+                weight = cost / self._mean_cost
+            self._work += weight
+            self._completions += 1
+
+    def _score(self, workers: int) -> float | None:
+        score, window = self.scores.get(workers, (None, 0))
+        if score is None or self.windows - window > self.memory:
+            return None
+        return score
+
+    def _decide(self, workers: int) -> tuple[int, str]:
+        neighbors = [
+            neighbor
+            for neighbor in (workers + self.direction, workers - self.direction)
+            if self.min_workers <= neighbor <= self.max_workers
+        ]
+
+        best, reason = workers, "holding"
+        for neighbor in neighbors:
+            score = self._score(neighbor)
+            if score is not None and score > self._score(best) * (1 + self.hysteresis):
+                best, reason = neighbor, f"{neighbor} workers scored {score:.3g}"
+        if best != workers:
+            return best, reason
+
+        for neighbor in neighbors:
+            if self._score(neighbor) is None:
+                return neighbor, "probing"
+        return workers, reason
+
+    def update(self, workers: int, saturated: bool = True, now: float | None = None) -> int:
+        """
+        Call this periodically with the pool's worker count and whether it has
+        queued work to start.  Returns the worker count to use.
+        """
+        now = time.time() if now is None else now
+        if not self.enabled:
+            return workers
+
+        with self._lock:
+            if workers != self.workers:
+                # first call, or someone else resized the pool
+                self._reset(min(max(workers, self.min_workers), self.max_workers), now)
+                return self.workers
+
+            self._starved |= not saturated
+            elapsed = now - self._window_start
+            if elapsed < self.interval or self._completions < self.min_completions:
+                return workers
+
+            self.windows += 1
+            entry = {
+                "window": self.windows,
+                "time": now,
+                "workers": workers,
+                "seconds": elapsed,
+                "completions": self._completions,
+                "score": None,
+            }
+            if self._starved:
+                entry["decision"] = "discarded, the queue ran dry"
+                self.trajectory.append(entry)
+                self._reset(workers, now)
+                return workers
+
+            score = self._work / elapsed
+            previous = self._score(workers)
+            if previous is not None:
+                score = 0.5 * previous + 0.5 * score
+            self.scores[workers] = (score, self.windows)
+            entry["score"] = score
+
+            target, reason = self._decide(workers)
+            if target != workers:
+                self.direction = 1 if target > workers else -1
+                self.log.info(f"*** Autotune: {workers} -> {target} workers ({reason}, score {score:.3g})")
+            entry["decision"] = f"{target} workers, {reason}"
+            self.trajectory.append(entry)
+            self._reset(target, now)
+            return target
+
+    def report(self) -> dict:
+        """The bounds, measured scores and recent windows"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "workers": self.workers,
+                "min_workers": self.min_workers,
+                "max_workers": self.max_workers,
+                "interval": self.interval,
+                "hysteresis": self.hysteresis,
+                "scores": {workers: score for workers, (score, _) in sorted(self.scores.items())},
+                "trajectory": list(self.trajectory),
+            }
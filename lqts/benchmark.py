@@ -0,0 +1,303 @@
+"""
+benchmark Module
+================
+
+End-to-end throughput benchmarks.  Each workload runs against a fresh server
+started on a free port with its queue file, history and caches in a temporary
+directory, so a benchmark never touches the user's own server.
+
+Workloads
+---------
+* tiny: many short jobs, submitted one request at a time
+* wide: jobs that each need all the workers' cores
+* chain: a chain of jobs, each depending on the one before
+* dag: fan-out/fan-in levels: a job, *width* jobs depending on it, a job
+  depending on all of them, and so on
+* array: one submission of many identical jobs (an array group)
+
+Each job sleeps for the workload's runtime in a fresh python interpreter.
+
+Measurements
+------------
+* submit throughput: jobs per second of time spent in qsub requests
+* time to fill all cores: from the first submission until every worker core
+  was seen allocated (None if that never happened)
+* makespan and completed jobs per second
+* dispatch latency (a job being picked to its process starting) and queue wait
+  percentiles, and the scheduler overhead per job, from the server's job
+  phases (see lqts.overhead)
+* core-idle fraction: the share of worker core-seconds between the first
+  submission and the end of the run with no job on them
+* server CPU time, CPU fraction and peak RSS, of the server process alone
+
+The core and job counts are polled from /metrics every *poll* seconds, which
+costs the server a little time itself.  The results are plain dicts, written
+as JSON by qbench so runs can be compared.
+"""
+
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import psutil
+import requests
+
+from lqts.core.schema import JobSpec
+from lqts.version import VERSION
+
+WORKLOADS = ("tiny", "wide", "chain", "dag", "array")
+
+# default size of each workload
+DEFAULT_JOBS = {"tiny": 500, "wide": 50, "chain": 100, "dag": 100, "array": 100000}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def parse_metrics(text: str) -> dict[str, float]:
+    """The samples of a Prometheus text page, keyed by name and labels as written"""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            samples[name] = float(value)
+    return samples
+
+
+class BenchServer:
+    """
+    An LQTS server in a subprocess, on a free port and with all of its files in
+    a temporary directory.  Use it as a context manager.
+    """
+
+    def __init__(self, workers: int, startup_timeout: float = 60.0):
+        self.workers = workers
+        self.startup_timeout = startup_timeout
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process: subprocess.Popen = None
+        self._tmp = None
+
+    def __enter__(self) -> "BenchServer":
+        self._tmp = tempfile.TemporaryDirectory(prefix="lqts-bench-")
+        self.dir = Path(self._tmp.name)
+        env = {
+            **os.environ,
+            "LQTS_IP_ADDRESS": "127.0.0.1",
+            "LQTS_PORT": str(self.port),
+            "LQTS_NWORKERS": str(self.workers),
+            "LQTS_QUEUE_FILE": str(self.dir / "queue.txt"),
+            "LQTS_HISTORY_FILE": str(self.dir / "history.db"),
+            "LQTS_LOG_FILE": str(self.dir / "lqts.log"),
+            "LQTS_CACHE_DIR": str(self.dir / "cache"),
+            "LQTS_STATE_DIR": str(self.dir / "jobs"),
+            "LQTS_COMPLETED_LIMIT": str(10**9),
+            # the server runs in the temporary directory, so make sure it finds this lqts
+            "PYTHONPATH": os.pathsep.join(
+                filter(None, [str(Path(__file__).resolve().parent.parent), os.environ.get("PYTHONPATH")])
+            ),
+        }
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "lqts.main:app", "--port", str(self.port), "--log-level", "warning"],
+            cwd=self.dir,  # away from any .env file
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        t0 = time.time()
+        while time.time() - t0 < self.startup_timeout:
+            if self.process.poll() is not None:
+                break
+            try:
+                requests.get(f"{self.url}/api_v1/workers", timeout=1)
+                return self
+            except requests.ConnectionError:
+                time.sleep(0.1)
+
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"The benchmark server did not start on port {self.port}")
+
+    def __exit__(self, *args):
+        if self.process is not None and self.process.poll() is None:
+            try:
+                requests.post(f"{self.url}/api_v1/qclear", params={"really": True}, timeout=5)
+            except requests.RequestException:
+                pass
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self._tmp is not None:
+            self._tmp.cleanup()
+            self._tmp = None
+
+    def get(self, path: str, **params):
+        response = requests.get(f"{self.url}{path}", params=params, timeout=60)
+        response.raise_for_status()
+        return response.json()
+
+    def qsub(self, job_specs: list[JobSpec]) -> list[dict]:
+        response = requests.post(
+            f"{self.url}/api_v1/qsub", json=[spec.model_dump(mode="json") for spec in job_specs], timeout=600
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def metrics(self) -> dict[str, float]:
+        response = requests.get(f"{self.url}/metrics", timeout=60)
+        return parse_metrics(response.text)
+
+
+class Submitter:
+    """Submits the jobs of a workload and keeps count of the time it takes"""
+
+    def __init__(self, server: BenchServer, runtime: float, working_dir: str):
+        self.server = server
+        self.command = f'"{sys.executable}" -c "import time; time.sleep({runtime})"'
+        self.working_dir = working_dir
+        self.jobs = 0
+        self.seconds = 0.0
+        self.first = None
+
+    def spec(self, **kwargs) -> JobSpec:
+        return JobSpec(command=self.command, working_dir=self.working_dir, **kwargs)
+
+    def __call__(self, job_specs: list[JobSpec]) -> list[dict]:
+        t0 = time.time()
+        if self.first is None:
+            self.first = t0
+        job_ids = self.server.qsub(job_specs)
+        self.seconds += time.time() - t0
+        self.jobs += len(job_specs)
+        return job_ids
+
+
+def submit_workload(name: str, submit: Submitter, jobs: int, workers: int, width: int):
+    """Submits *jobs* jobs in the shape of workload *name*"""
+    if name == "tiny":
+        for _ in range(jobs):
+            submit([submit.spec()])
+
+    elif name == "wide":
+        for _ in range(jobs):
+            submit([submit.spec(cores=max(workers, 1))])
+
+    elif name == "chain":
+        previous = []
+        for _ in range(jobs):
+            previous = submit([submit.spec(depends=previous)])
+
+    elif name == "dag":
+        join = submit([submit.spec()])
+        while submit.jobs < jobs:
+            fan = submit([submit.spec(depends=join) for _ in range(min(width, jobs - submit.jobs))])
+            if submit.jobs < jobs:
+                join = submit([submit.spec(depends=fan)])
+
+    elif name == "array":
+        submit([submit.spec() for _ in range(jobs)])
+
+    else:
+        raise ValueError(f"Unknown workload {name}.  Choose from {', '.join(WORKLOADS)}")
+
+
+def run_workload(
+    name: str,
+    jobs: int | None = None,
+    runtime: float = 0.0,
+    workers: int | None = None,
+    width: int = 10,
+    poll: float = 0.25,
+    timeout: float = 3600.0,
+) -> dict:
+    """Runs one workload on a fresh server and returns its measurements"""
+    jobs = DEFAULT_JOBS[name] if jobs is None else jobs
+    workers = workers or max(psutil.cpu_count() - 2, 1)
+
+    with BenchServer(workers) as server:
+        workers = server.get("/api_v1/workers")
+        server_process = psutil.Process(server.process.pid)
+        cpu_before = server_process.cpu_times()
+        peak_rss = server_process.memory_info().rss
+
+        submit = Submitter(server, runtime, str(server.dir))
+        submit_workload(name, submit, jobs, workers, width)
+
+        # follow the run
+        fill_seconds = None
+        busy_core_seconds = 0.0
+        last = time.time()
+        completed = False
+        while time.time() - submit.first < timeout:
+            samples = server.metrics()
+            now = time.time()
+            allocated = samples.get('lqts_cores{state="allocated"}', 0)
+            busy_core_seconds += allocated * (now - last)
+            last = now
+            if fill_seconds is None and workers and allocated >= workers:
+                fill_seconds = now - submit.first
+            peak_rss = max(peak_rss, server_process.memory_info().rss)
+
+            unfinished = sum(samples.get(f'lqts_jobs{{status="{status}"}}', 0) for status in "QRPI")
+            if not unfinished:
+                completed = True
+                break
+            time.sleep(poll)
+
+        end = time.time()
+        cpu_after = server_process.cpu_times()
+        makespan = end - submit.first
+        cpu_seconds = (cpu_after.user + cpu_after.system) - (cpu_before.user + cpu_before.system)
+
+        # let the history catch up before reading the job phases
+        time.sleep(6)
+        report = server.get("/api_v1/overhead", limit=submit.jobs, by_group=False)
+        intervals = report[0]["intervals"] if report else {}
+
+    return {
+        "workload": name,
+        "jobs": submit.jobs,
+        "runtime": runtime,
+        "workers": workers,
+        "width": width if name == "dag" else None,
+        "completed": completed,
+        "submit_seconds": submit.seconds,
+        "submit_rate": submit.jobs / submit.seconds if submit.seconds else None,
+        "fill_seconds": fill_seconds,
+        "makespan": makespan,
+        "throughput": submit.jobs / makespan if completed and makespan else None,
+        "dispatch_latency": intervals.get("dispatch"),
+        "queue_wait": intervals.get("queue_wait"),
+        "reap_latency": intervals.get("reap"),
+        "overhead": report[0]["overhead"] if report else None,
+        "core_idle_fraction": 1 - busy_core_seconds / (workers * makespan) if workers and makespan else None,
+        "server": {
+            "cpu_seconds": cpu_seconds,
+            "cpu_fraction": cpu_seconds / makespan if makespan else None,
+            "peak_rss_mb": peak_rss / 2**20,
+        },
+    }
+
+
+def run_suite(workloads=WORKLOADS, **options) -> dict:
+    """Runs each workload and returns the results with a description of the machine"""
+    return {
+        "lqts_version": VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": psutil.cpu_count(),
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "options": options,
+        "results": [run_workload(name, **options) for name in workloads],
+    }
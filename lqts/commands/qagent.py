@@ -0,0 +1,46 @@
+import os
+
+import click
+
+from lqts.agent import Agent
+from lqts.core.config import config
+
+
+@click.command("lqts-agent")
+@click.option(
+    "--cores",
+    type=int,
+    default=max(os.cpu_count() - 2, 1),
+    help="Number of cores on this machine to run jobs on",
+)
+@click.option("--name", default="", help="Name of this agent.  Defaults to the host name")
+@click.option(
+    "--interval",
+    "-i",
+    type=float,
+    default=1.0,
+    help="How often to check for finished jobs and ask for new ones",
+)
+@click.option("--port", default=config.port, help="The port number of the server")
+@click.option(
+    "--ip_address", default=config.ip_address, help="The IP address of the server"
+)
+def qagent(cores, name="", interval=1.0, port=config.port, ip_address=config.ip_address):
+    """
+    Runs jobs from an LQTS server on this machine.  The agent asks the server for
+    jobs that fit in its free cores and reports them back when they finish.
+    """
+    config.port = port
+    config.ip_address = ip_address
+
+    agent = Agent(config.url, cores=cores, name=name, poll_interval=interval)
+    try:
+        agent.run()
+    except KeyboardInterrupt:
+        print("Stopping.  Waiting for running jobs to finish (Ctrl-C again to abandon them)")
+        agent.stop()
+        agent.run()
+
+
+if __name__ == "__main__":
+    qagent()
@@ -0,0 +1,69 @@
+import json
+from pathlib import Path
+
+import click
+
+import lqts.displaytable as dt
+from lqts.benchmark import WORKLOADS, run_suite
+
+
+def _seconds(value) -> str:
+    return "-" if value is None else f"{value:.3f}"
+
+
+def print_results(suite: dict):
+    rows = [["Workload", "Jobs", "Submit/s", "Fill (s)", "Makespan", "Jobs/s", "Dispatch p50", "p95", "Idle", "CPU", "RSS (MB)"]]
+    for result in suite["results"]:
+        dispatch = result["dispatch_latency"] or {}
+        rows.append(
+            [
+                result["workload"] + ("" if result["completed"] else " (timed out)"),
+                result["jobs"],
+                "-" if result["submit_rate"] is None else f"{result['submit_rate']:.0f}",
+                _seconds(result["fill_seconds"]),
+                f"{result['makespan']:.1f}",
+                "-" if result["throughput"] is None else f"{result['throughput']:.2f}",
+                _seconds(dispatch.get("p50")),
+                _seconds(dispatch.get("p95")),
+                "-" if result["core_idle_fraction"] is None else f"{result['core_idle_fraction']:.0%}",
+                "-" if result["server"]["cpu_fraction"] is None else f"{result['server']['cpu_fraction']:.0%}",
+                f"{result['server']['peak_rss_mb']:.0f}",
+            ]
+        )
+    print(dt.make_table(rows, colsep="|", use_rowsep=False, maxwidth=120))
+
+
+@click.command("qbench")
+@click.option(
+    "--workload",
+    "-w",
+    "workloads",
+    multiple=True,
+    type=click.Choice(WORKLOADS),
+    help="Workload to run (repeat for several).  All of them by default",
+)
+@click.option("--jobs", "-n", type=int, default=None, help="Number of jobs in each workload (defaults per workload)")
+@click.option("--runtime", "-t", type=float, default=0.0, help="Seconds each job sleeps")
+@click.option("--workers", type=int, default=None, help="Number of workers of the benchmark server")
+@click.option("--width", type=int, default=10, help="Number of jobs in each fan-out of the dag workload")
+@click.option("--timeout", type=float, default=3600.0, help="Seconds to wait for each workload to finish")
+@click.option("--output", "-o", type=click.Path(dir_okay=False), default=None, help="Write the results to this JSON file")
+def qbench(workloads=(), jobs=None, runtime=0.0, workers=None, width=10, timeout=3600.0, output=None):
+    """
+    Benchmarks LQTS end to end.  Each workload runs against its own server,
+    started on a free port with its files in a temporary directory, and reports
+    submit throughput, time to fill the cores, makespan, dispatch latency,
+    core-idle fraction and the server's CPU and memory use.
+    """
+    suite = run_suite(
+        workloads or WORKLOADS, jobs=jobs, runtime=runtime, workers=workers, width=width, timeout=timeout
+    )
+    print_results(suite)
+
+    if output:
+        Path(output).write_text(json.dumps(suite, indent=2))
+        print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    qbench()
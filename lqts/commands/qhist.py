@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+
+import click
+import requests
+
+import lqts.displaytable as dt
+from lqts.core.config import config
+from lqts.core.schema import Job
+
+AGE_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+
+def parse_time(value: str | None) -> str | None:
+    """
+    Turns an age such as 90m, 12h or 2d into the time that long ago.  Anything
+    else is passed on as an ISO date/time.
+    """
+    if not value:
+        return None
+    if value[-1] in AGE_UNITS and value[:-1].replace(".", "", 1).isdigit():
+        return (datetime.now() - timedelta(**{AGE_UNITS[value[-1]]: float(value[:-1])})).isoformat()
+    return value
+
+
+@click.command("qhist")
+@click.option("--group", "-g", type=int, default=None, help="Only jobs in this job group")
+@click.option("--status", "-s", default=None, help="Only jobs with this status (e.g. C, E, D, X)")
+@click.option("--command", default=None, help="Only jobs whose command contains this text")
+@click.option("--since", default=None, help="Only jobs completed since this time (ISO time or an age like 12h, 2d)")
+@click.option("--until", default=None, help="Only jobs completed before this time (ISO time or an age like 12h, 2d)")
+@click.option("--limit", "-n", type=int, default=50, help="Maximum number of jobs to list")
+@click.option(
+    "--summary",
+    type=click.Choice(["status", "group", "command", "agent", "day"]),
+    default=None,
+    help="Show job counts and walltimes grouped by this instead of listing jobs",
+)
+@click.option(
+    "--overhead",
+    is_flag=True,
+    default=False,
+    help="Show the mean seconds each job group spent in each phase and in scheduler overhead",
+)
+@click.option("--port", default=config.port, help="The port number of the server")
+@click.option(
+    "--ip_address", default=config.ip_address, help="The IP address of the server"
+)
+def qhist(
+    group=None,
+    status=None,
+    command=None,
+    since=None,
+    until=None,
+    limit=50,
+    summary=None,
+    overhead=False,
+    port=config.port,
+    ip_address=config.ip_address,
+):
+    """Shows finished jobs from the server's job history"""
+
+    config.port = port
+    config.ip_address = ip_address
+
+    params = {
+        "group": group,
+        "status": status,
+        "command": command,
+        "since": parse_time(since),
+        "until": parse_time(until),
+    }
+    params = {key: value for key, value in params.items() if value is not None}
+
+    if overhead:
+        response = requests.get(f"{config.url}/api_v1/overhead", params={"limit": limit, **params})
+        rows = [["Group", "Jobs", "Overhead", "p95", "Alloc", "Spawn", "Reap", "Persist", "Queued", "Run"]]
+        for item in response.json():
+            intervals = item["intervals"]
+
+            def mean(name):
+                return f"{intervals[name]['mean']:.3f}" if name in intervals else ""
+
+            rows.append(
+                [
+                    item["group"],
+                    item["jobs"],
+                    f"{item['overhead']['mean']:.3f}" if item["overhead"] else "",
+                    f"{item['overhead']['p95']:.3f}" if item["overhead"] else "",
+                    mean("allocation"),
+                    mean("spawn"),
+                    mean("reap"),
+                    mean("persist"),
+                    mean("queue_wait"),
+                    mean("run"),
+                ]
+            )
+    elif summary:
+        response = requests.get(f"{config.url}/api_v1/history/summary", params={"by": summary, **params})
+        rows = [[summary.capitalize(), "Jobs", "Total (h)", "Mean (s)", "Min (s)", "Max (s)"]]
+        for item in response.json():
+            rows.append(
+                [
+                    item[summary],
+                    item["count"],
+                    f"{(item['total_walltime'] or 0) / 3600:.2f}",
+                    f"{item['mean_walltime'] or 0:.1f}",
+                    f"{item['min_walltime'] or 0:.1f}",
+                    f"{item['max_walltime'] or 0:.1f}",
+                ]
+            )
+    else:
+        response = requests.get(f"{config.url}/api_v1/history", params={"limit": limit, **params})
+        jobs = [Job.model_validate(item) for item in response.json()]
+        for job in jobs:
+            # the times come back as strings
+            for field in ("started", "completed"):
+                if isinstance(getattr(job, field), str):
+                    setattr(job, field, datetime.fromisoformat(getattr(job, field)))
+
+        rows = [["ID", "St", "Rc", "Command", "Walltime", "Completed", "WorkingDir"]]
+        for job in jobs:
+            rows.append(
+                [
+                    job.job_id,
+                    job.status.value,
+                    "" if job.returncode is None else job.returncode,
+                    job.job_spec.command,
+                    job.walltime,
+                    job.completed.isoformat(timespec="seconds") if job.completed else "",
+                    job.job_spec.working_dir,
+                ]
+            )
+
+    print(dt.make_table(rows, colsep="|", use_rowsep=False, maxwidth=90))
+
+
+if __name__ == "__main__":
+    qhist()
@@ -14,52 +14,62 @@ digits += ". "
 @click.command("qpriority")
 @click.argument("priority", nargs=1)
 @click.argument("job_ids", nargs=-1)
+@click.option("--status", "-s", default=None, help="Only jobs with this status (e.g. Q, P)")
+@click.option("--command", default=None, help="Only jobs whose command matches this pattern (e.g. '*solver*')")
 @click.option("--port", default=config.port, help="The port number of the server")
 @click.option(
     "--ip_address", default=config.ip_address, help="The IP address of the server"
 )
 def qpriority(
-    priority=10, job_ids=None, port=config.port, ip_address=config.ip_address
+    priority=10, job_ids=None, status=None, command=None, port=config.port, ip_address=config.ip_address
 ):
     """Change the priority of one or more jobs"""
 
-    if not job_ids and sys.stdin.seekable():
+    filters = {key: value for key, value in (("status", status), ("command", command)) if value}
+
+    if not job_ids and not filters and sys.stdin.seekable():
         # get the job ids from standard input
         job_id_string = "".join(c for c in sys.stdin.read() if c in digits)
         job_ids = job_id_string.split()
 
-    if not job_ids:
-        print("no jobs to wait on.")
+    if not job_ids and not filters:
+        print("no jobs to change.")
         return
 
     config.port = port
     config.ip_address = ip_address
 
+    if not job_ids:
+        # every job matching the filters
+        response = requests.post(f"{config.url}/api_v1/priority", params={"priority": priority, **filters})
+        print(response.text)
+        return
+
     # Parse the job ids
     input_job_ids = job_ids
     job_ids = []
     for job_id in list(input_job_ids):
-        if "." not in job_id:
-            # A job group was specified
-            response = requests.get(
-                f"{config.url}/api_v1/jobgroup?group_number={int(job_id)}"
+        if "." not in job_id or job_id.endswith(".*"):
+            # A job group was specified, which the server changes in one go
+            response = requests.post(
+                f"{config.url}/api_v1/priority",
+                params={"priority": priority, "group": int(job_id.partition(".")[0]), **filters},
             )
-            # print(response.json())
-            if response.status_code == 200:
-                job_ids.extend([JobID(**item) for item in response.json()])
+            print(response.text)
 
         else:
             job_ids.append(JobID.parse_obj(job_id))
 
-    # job_ids = set(job_ids)
-    job_ids = [jid.dict() for jid in set(job_ids)]
-    # data = {"priority": priority, "job_ids": job_ids}
-    # print(data)
-    response = requests.post(
-        f"{config.url}/api_v1/qpriority", params={"priority": priority}, json=job_ids
-    )
+    if job_ids:
+        # job_ids = set(job_ids)
+        job_ids = [jid.dict() for jid in set(job_ids)]
+        # data = {"priority": priority, "job_ids": job_ids}
+        # print(data)
+        response = requests.post(
+            f"{config.url}/api_v1/qpriority", params={"priority": priority, **filters}, json=job_ids
+        )
 
-    print(response.text)
+        print(response.text)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import os
+from datetime import datetime, timedelta
 from pathlib import Path
 
 import click
@@ -7,7 +8,38 @@ import ujson
 
 import lqts.displaytable as dt
 from lqts.core.config import config
-from lqts.core.schema import Job, JobID
+from lqts.core.schema import Job, JobID, JobSpec
+
+
+def format_dependencies(job_spec: JobSpec) -> str:
+    """e.g. 12.001,afterok:13.000,aftercorr:14"""
+    parts = [str(d) for d in job_spec.depends]
+    parts += [f"afterok:{d}" for d in job_spec.depends_ok]
+    parts += [f"afternotok:{d}" for d in job_spec.depends_notok]
+    parts += [f"aftercorr:{group}" for group in job_spec.depends_corr]
+    return ",".join(parts) if parts else "-"
+
+
+def format_seconds(seconds: float | None) -> str:
+    """e.g. 0:12:30, or - if there is no prediction"""
+    return "-" if seconds is None else str(timedelta(seconds=round(seconds)))
+
+
+def format_resource(name: str, status: dict, max_ids: int = 5) -> str:
+    """e.g. abaqus_lic: 6/8 in use by 12.000(2),12.001(4); 3 waiting: 12.002,12.003,13.000"""
+
+    def listed(ids: list) -> str:
+        return ",".join(ids[:max_ids]) + (",..." if len(ids) > max_ids else "")
+
+    text = f"{name}: {status['in_use']}/{status['capacity']} in use"
+    holders = [f"{job_id}({count})" for job_id, count in status["holders"].items()]
+    if holders:
+        text += " by " + listed(holders)
+    if status["waiting_count"]:
+        text += f"; {status['waiting_count']} waiting"
+        if status["waiting"]:
+            text += ": " + listed(status["waiting"])
+    return text
 
 
 @click.command("qstat")
@@ -54,7 +86,7 @@ def qstat(
         # print(response.json())
         jobs = [Job.model_validate_json(item) for item in response.json()]
 
-        rows = [["ID", "St", "Pr", "Command", "Walltime", "WorkingDir", "Dep"]]
+        rows = [["ID", "St", "Pr", "Command", "Walltime", "Pred", "WorkingDir", "Dep"]]
         for job in jobs:
             job: Job = job
             rows.append(
@@ -64,14 +96,37 @@ def qstat(
                     job.job_spec.priority,
                     job.job_spec.command if job.job_spec is not None else "",
                     job.walltime,
+                    format_seconds(job.predicted_runtime),
                     job.job_spec.working_dir,
-                    (
-                        ",".join(str(d) for d in job.job_spec.depends)
-                        if job.job_spec.depends
-                        else "-"
-                    ),
+                    format_dependencies(job.job_spec),
                 ]
             )
 
         t = dt.make_table(rows, colsep="|", use_rowsep=False, maxwidth=90)
         print(t)
+
+        preempted = [job for job in jobs if job.preempted is not None]
+        if preempted:
+            print(
+                "Preempted (suspended for urgent jobs): "
+                + ", ".join(f"{job.job_id} for {format_seconds((datetime.now() - job.preempted).total_seconds())}" for job in preempted)
+            )
+
+        response = requests.get(f"{config.url}/api_v1/arrays")
+        if response.status_code == 200:
+            for array in response.json():
+                print(array["summary"])
+
+        response = requests.get(f"{config.url}/api_v1/resources")
+        if response.status_code == 200:
+            for name, status in response.json().items():
+                print(format_resource(name, status))
+
+        response = requests.get(f"{config.url}/api_v1/cache")
+        if response.status_code == 200:
+            stats = response.json()
+            if stats["hits"] or stats["misses"]:
+                print(
+                    f"Result cache: {stats['hits']} hits, {stats['misses']} misses, "
+                    f"{stats['entries']} entries ({stats['size_bytes'] / 2**20:.1f} MB)"
+                )
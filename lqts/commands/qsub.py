@@ -1,6 +1,5 @@
 import json
 import os
-from itertools import chain
 from pathlib import Path
 
 import click
@@ -9,7 +8,7 @@ import requests
 from lqts.core.config import config
 from lqts.core.schema import JobID, JobSpec
 from lqts.path_util import encode_path, find_file
-from lqts.qsub_util import get_job_ids, parse_walltime
+from lqts.qsub_util import parse_dependencies, parse_resources, parse_walltime
 
 from .click_ext import OptionNargs
 
@@ -32,7 +31,8 @@ from .click_ext import OptionNargs
     default=list,
     type=list,
     help="Specify one or more jobs that these batch of jobs depend on."
-    " They will be held until those jobs complete",
+    " They will be held until those jobs complete.  Prefix with afterok:, afternotok: or"
+    " aftercorr: (member by member) to depend on how they finish",
 )
 @click.option("--debug", is_flag=True, default=False, help="Produce debug output")
 @click.option(
@@ -47,6 +47,47 @@ from .click_ext import OptionNargs
 @click.option(
     "--cores", type=int, default=1, help="Number of cores/threads required by the job"
 )
+@click.option(
+    "--resource",
+    "resources",
+    multiple=True,
+    help="NAME=COUNT of a server resource (license etc.) the job holds while it runs.  May be given more than once",
+)
+@click.option(
+    "--threads",
+    type=int,
+    default=None,
+    help="Thread count exported to the job (OMP_NUM_THREADS etc.).  Defaults to --cores",
+)
+@click.option(
+    "--env",
+    "-e",
+    multiple=True,
+    help="NAME=VALUE to set in the job's environment.  May be given more than once",
+)
+@click.option(
+    "--cache",
+    is_flag=True,
+    default=False,
+    help="Reuse the outputs of an earlier identical run instead of running again",
+)
+@click.option(
+    "--input",
+    "inputs",
+    multiple=True,
+    help="Input file that is part of the cache key.  May be given more than once",
+)
+@click.option(
+    "--output",
+    "outputs",
+    multiple=True,
+    help="Output file saved in the cache.  May be given more than once",
+)
+@click.option(
+    "--cache-env",
+    multiple=True,
+    help="Environment variable that is part of the cache key.  May be given more than once",
+)
 @click.option("--port", default=config.port, help="The port number of the server")
 @click.option(
     "--ip_address", default=config.ip_address, help="The IP address of the server"
@@ -72,6 +113,13 @@ def qsub(
     debug=False,
     walltime=None,
     cores=1,
+    resources=(),
+    threads=None,
+    env=(),
+    cache=False,
+    inputs=(),
+    outputs=(),
+    cache_env=(),
     port=config.port,
     ip_address=config.ip_address,
     alternate_runner=False,
@@ -90,8 +138,7 @@ def qsub(
 
     working_dir = encode_path(os.getcwd())
 
-    if depends:
-        depends = list(chain(*[get_job_ids(d) for d in depends]))
+    dependencies = parse_dependencies(depends)
 
     if walltime:
         walltime = parse_walltime(walltime)
@@ -104,9 +151,16 @@ def qsub(
         working_dir=working_dir,
         log_file=logfile,
         priority=priority,
-        depends=depends,
+        **dependencies,
         walltime=walltime,
         cores=cores,
+        resources=parse_resources(resources),
+        threads=threads,
+        env=dict(item.split("=", 1) for item in env),
+        cache=cache,
+        inputs=list(inputs),
+        outputs=list(outputs),
+        cache_env=list(cache_env),
         alternate_runner=alternate_runner,
     )
 
@@ -1,6 +1,5 @@
 import json
 import os
-from itertools import chain
 from pathlib import Path
 
 import click
@@ -8,7 +7,7 @@ import requests
 
 from lqts.core.schema import JobID, JobSpec
 from lqts.path_util import encode_path, find_file
-from lqts.qsub_util import config, get_job_ids, parse_walltime
+from lqts.qsub_util import config, parse_dependencies, parse_resources, parse_walltime
 
 from .click_ext import OptionNargs
 
@@ -30,6 +29,21 @@ from .click_ext import OptionNargs
 @click.option(
     "--cores", type=int, default=1, help="Number of cores/threads required by the job"
 )
+@click.option(
+    "--resource",
+    "resources",
+    multiple=True,
+    help="NAME=COUNT of a server resource (license etc.) the job holds while it runs.  May be given more than once",
+)
+@click.option(
+    "--pack",
+    type=int,
+    default=0,
+    help=(
+        "Run up to this many commands back to back in one worker slot.  "
+        "Use this for large numbers of very short commands."
+    ),
+)
 @click.option("--port", default=config.port, help="The port number of the server")
 @click.option(
     "--ip_address", default=config.ip_address, help="The IP address of the server"
@@ -54,6 +68,8 @@ def qsub_argfile(
     debug=False,
     submit_delay=0.0,
     cores=1,
+    resources=(),
+    pack=0,
     port=config.port,
     ip_address=config.ip_address,
     alternate_runner=False,
@@ -75,6 +91,8 @@ def qsub_argfile(
         port,
         ip_address,
         alternate_runner,
+        pack=pack,
+        resources=resources,
     )
 
 
@@ -91,6 +109,8 @@ def _qsub_argfile(
     ip_address=config.ip_address,
     alternate_runner=False,
     walltime=None,
+    pack=0,
+    resources=(),
 ):
 
     from glob import glob
@@ -101,8 +121,7 @@ def _qsub_argfile(
     job_specs = []
     working_dir = encode_path(os.getcwd())
 
-    if depends:
-        depends = list(chain(*[get_job_ids(d) for d in depends]))
+    dependencies = parse_dependencies(depends)
 
     with open(argfile) as f:
 
@@ -121,10 +140,12 @@ def _qsub_argfile(
                 working_dir=working_dir,
                 log_file=log_file,
                 priority=priority,
-                depends=depends,
+                **dependencies,
                 cores=cores,
+                resources=parse_resources(resources),
                 alternate_runner=alternate_runner,
                 walltime=walltime,
+                pack=pack,
             )
             js = JobSpec.model_validate(js)
             job_specs.append(js.model_dump())
@@ -1,5 +1,4 @@
 import os
-from itertools import chain
 from pathlib import Path
 
 import click
@@ -7,7 +6,7 @@ import requests
 
 from lqts.core.schema import JobID, JobSpec
 from lqts.path_util import encode_path, find_file
-from lqts.qsub_util import config, get_job_ids, parse_walltime
+from lqts.qsub_util import config, parse_dependencies, parse_resources, parse_walltime
 
 from .click_ext import OptionNargs
 
@@ -36,6 +35,12 @@ from .click_ext import OptionNargs
 @click.option(
     "--cores", type=int, default=1, help="Number of cores/threads required by the job"
 )
+@click.option(
+    "--resource",
+    "resources",
+    multiple=True,
+    help="NAME=COUNT of a server resource (license etc.) the job holds while it runs.  May be given more than once",
+)
 @click.option("--port", default=config.port, help="The port number of the server")
 @click.option(
     "--ip_address", default=config.ip_address, help="The IP address of the server"
@@ -77,6 +82,7 @@ def qsub_cmulti(
     debug=False,
     log=False,
     cores=1,
+    resources=(),
     port=config.port,
     ip_address=config.ip_address,
     walltime=None,
@@ -114,10 +120,7 @@ def qsub_cmulti(
     job_specs = []
     working_dir = encode_path(os.getcwd())
 
-    if depends:
-        depends = list(chain(*[get_job_ids(d) for d in depends]))
-    else:
-        depends = []
+    dependencies = parse_dependencies(depends)
 
     if walltime:
         walltime = parse_walltime(walltime)
@@ -142,8 +145,9 @@ def qsub_cmulti(
             working_dir=working_dir,
             log_file=logfile,
             priority=priority,
-            depends=depends,
+            **dependencies,
             cores=cores,
+            resources=parse_resources(resources),
             alternate_runner=alternate_runner,
         )
         job_specs.append(js.dict())
@@ -0,0 +1,144 @@
+import base64
+import json
+import os
+import pickle
+
+import click
+import requests
+
+from lqts.core.config import config
+from lqts.core.schema import JobID, JobSpec
+from lqts.path_util import encode_path
+from lqts.qsub_util import parse_dependencies, parse_resources, parse_walltime
+
+from .click_ext import OptionNargs
+
+
+@click.command("qsub-func")
+@click.argument("function", nargs=1)
+@click.argument("args", nargs=-1)
+@click.option(
+    "--kwargs",
+    default="{}",
+    type=str,
+    help="Keyword arguments for the function as a JSON object",
+)
+@click.option(
+    "--json-args",
+    is_flag=True,
+    default=False,
+    help="Parse each positional argument as JSON instead of passing it as a string",
+)
+@click.option(
+    "--pickle-args",
+    is_flag=True,
+    default=False,
+    help="Send the arguments pickled instead of as JSON",
+)
+@click.option("--priority", default=1, type=int)
+@click.option("--logfile", default="", type=str, help="Name of log file")
+@click.option(
+    "-d",
+    "--depends",
+    cls=OptionNargs,
+    default=list,
+    type=list,
+    help="Specify one or more jobs that these batch of jobs depend on."
+    " They will be held until those jobs complete",
+)
+@click.option("--debug", is_flag=True, default=False, help="Produce debug output")
+@click.option(
+    "--walltime",
+    type=str,
+    default=None,
+    help="A amount of time a job is allowed to run.  It will be killed after this amount",
+)
+@click.option(
+    "--cores", type=int, default=1, help="Number of cores/threads required by the job"
+)
+@click.option(
+    "--resource",
+    "resources",
+    multiple=True,
+    help="NAME=COUNT of a server resource (license etc.) the job holds while it runs.  May be given more than once",
+)
+@click.option("--port", default=config.port, help="The port number of the server")
+@click.option(
+    "--ip_address", default=config.ip_address, help="The IP address of the server"
+)
+def qsub_func(
+    function,
+    args,
+    kwargs="{}",
+    json_args=False,
+    pickle_args=False,
+    priority=1,
+    logfile=None,
+    depends=None,
+    debug=False,
+    walltime=None,
+    cores=1,
+    resources=(),
+    port=config.port,
+    ip_address=config.ip_address,
+):
+    """Submits a python function to run in a warm python worker.
+
+    FUNCTION is given as module:function, and the module must be importable
+    by the server (e.g. on its PYTHONPATH or installed).  Example:
+
+        qsub-func mypackage.solvers:solve 1 2 --json-args --kwargs '{"tol": 1e-6}'
+    """
+
+    if ":" not in function:
+        print("function must be given as module:function")
+        return
+
+    if json_args:
+        args = [json.loads(arg) for arg in args]
+    else:
+        args = list(args)
+    kwargs = json.loads(kwargs)
+
+    working_dir = encode_path(os.getcwd())
+
+    dependencies = parse_dependencies(depends)
+
+    if walltime:
+        walltime = parse_walltime(walltime)
+
+    job_spec = JobSpec(
+        command=f"{function}(*{args}, **{kwargs})",
+        working_dir=working_dir,
+        log_file=logfile,
+        priority=priority,
+        **dependencies,
+        walltime=walltime,
+        cores=cores,
+        resources=parse_resources(resources),
+        function=function,
+    )
+    if pickle_args:
+        job_spec.function_pickle = base64.b64encode(pickle.dumps((args, kwargs))).decode()
+    else:
+        job_spec.function_args = args
+        job_spec.function_kwargs = kwargs
+
+    if debug:
+        print([job_spec.model_dump()])
+
+    config.port = port
+    config.ip_address = ip_address
+
+    response = requests.post(f"{config.url}/api_v1/qsub", json=[job_spec.model_dump()])
+
+    if response.status_code == 200:
+        if debug:
+            print(response)
+        print(" ".join(str(JobID(**item)) for item in response.json()))
+    else:
+        print(response)
+
+
+def app():
+    qsub_func(windows_expand_args=False)
@@ -5,6 +5,7 @@ import requests
 import requests.exceptions
 import urllib3.exceptions
 
+import lqts.displaytable as dt
 from lqts.core.config import config
 
 
@@ -22,9 +23,26 @@ def qsummary(port=config.port, ip_address=config.ip_address):
     try:
         response = requests.get(f"{config.url}/api_v1/qsummary")
 
-        for k, v in response.json().items():
+        summary = response.json()
+        users = summary.pop("Users", [])
+        for k, v in summary.items():
             print(f"{k}: {v}")
 
+        if users:
+            rows = [["User", "Running", "Queued", "Share", "Usage (core-h)", "Factor"]]
+            for user in users:
+                rows.append(
+                    [
+                        user["user"] or "-",
+                        user["running"],
+                        user["queued"],
+                        user.get("share", "-"),
+                        f"{user['usage_core_hours']:.2f}" if "usage_core_hours" in user else "-",
+                        f"{user['factor']:.3f}" if "factor" in user else "-",
+                    ]
+                )
+            print(dt.make_table(rows, colsep="|", use_rowsep=False))
+
     except (urllib3.exceptions.NewConnectionError, requests.exceptions.ConnectionError):
         print(f'Could not reach lqts server at "{config.url}')
 
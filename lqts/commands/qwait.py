@@ -1,5 +1,6 @@
 import sys
 import time
+from datetime import timedelta
 
 # import chardet
 from pathlib import Path
@@ -79,6 +80,16 @@ def qwait(
             Job(**ujson.loads(item)).job_id for item in response.json()
         )
 
+        # members of array groups only show up in qstat when they are next in line
+        response = requests.get(f"{config.url}/api_v1/arrays")
+        if response.status_code == 200:
+            unfinished = {array["group"]: array["unfinished"] for array in response.json()}
+            queued_or_running_job_ids.update(
+                job_id
+                for job_id in job_ids
+                if any(start <= job_id.index < stop for start, stop in unfinished.get(job_id.group, []))
+            )
+
         waiting_on = job_ids.intersection(queued_or_running_job_ids)
         # print(waiting_on)
         if len(waiting_on) > 0:
@@ -99,6 +110,14 @@ def qwait(
                 num_finshed = num_jobs_left - len(waiting_on)
                 t.update(num_finshed)
                 num_jobs_left = len(waiting_on)
+
+            response = requests.get(f"{config.url}/api_v1/eta", json=list(input_job_ids))
+            if response.status_code == 200:
+                eta = response.json()
+                t.set_postfix_str(
+                    f"ETA {timedelta(seconds=round(eta['seconds']))}"
+                    + (f" ({eta['unpredicted']} unpredicted)" if eta["unpredicted"] else "")
+                )
         else:
             done_waiting = True
 
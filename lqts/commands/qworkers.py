@@ -1,21 +1,57 @@
+from datetime import datetime
 from multiprocessing import cpu_count
 from pathlib import Path
 
 import click
 import requests
 
+import lqts.displaytable as dt
 from lqts.core.config import config
 
 # import lqts.environment
 
 
+def print_autotune(report: dict):
+    if not report["enabled"]:
+        print("Autotuning is off (set LQTS_AUTOTUNE)")
+        return
+    print(
+        f"Autotuning between {report['min_workers']} and {report['max_workers']} workers, "
+        f"now at {report['workers']}"
+    )
+    for workers, score in report["scores"].items():
+        print(f"  {workers:>3} workers: {score:.3g} jobs/s")
+
+    rows = [["Window", "Time", "Workers", "Seconds", "Jobs", "Score", "Decision"]]
+    for entry in report["trajectory"][-20:]:
+        rows.append(
+            [
+                entry["window"],
+                datetime.fromtimestamp(entry["time"]).strftime("%H:%M:%S"),
+                entry["workers"],
+                f"{entry['seconds']:.0f}",
+                entry["completions"],
+                "-" if entry["score"] is None else f"{entry['score']:.3g}",
+                entry["decision"],
+            ]
+        )
+    if len(rows) > 1:
+        print(dt.make_table(rows, colsep="|", use_rowsep=False, maxwidth=90))
+
+
 @click.command("qworkers")
 @click.argument("count", type=int, default=None, required=False)
+@click.option(
+    "--autotune",
+    is_flag=True,
+    default=False,
+    help="Show the throughput the autotuner measured for each worker count and its recent decisions",
+)
 @click.option("--port", default=config.port, help="The port number of the server")
 @click.option(
     "--ip_address", default=config.ip_address, help="The IP address of the server"
 )
-def qworkers(count, debug=False, port=config.port, ip_address=config.ip_address):
+def qworkers(count, autotune=False, debug=False, port=config.port, ip_address=config.ip_address):
     """
     Gets or sets the number of workers in the server process pool.  Without an argument
     this returns the current number of workers being used.
@@ -23,7 +59,9 @@ def qworkers(count, debug=False, port=config.port, ip_address=config.ip_address)
     config.port = port
     config.ip_address = ip_address
 
-    if count:
+    if autotune:
+        print_autotune(requests.get(f"{config.url}/api_v1/autotune").json())
+    elif count:
         count = int(count)
         response = requests.post("{}/api_v1/workers?count={}".format(config.url, count))
         print("Worker pool resized to {} workers".format(int(response.text)))
@@ -19,17 +19,64 @@ class Configuration(BaseModel):
     queue_file: str = os.environ.get(
         "LQTS_QUEUE_FILE", join(expanduser("~"), "lqts.queue.txt")
     )
+    history_file: str = os.environ.get(
+        "LQTS_HISTORY_FILE", join(expanduser("~"), "lqts.history.db")
+    )
     nworkers: int = int(os.environ.get("LQTS_NWORKERS", max(cpu_count() - 2, 1)))
     ssl_cert: str = os.environ.get("LQTS_SSL_CERT", None)
 
-    prune_time_limit: timedelta = timedelta(days=1)
+    prune_time_limit: timedelta = timedelta(
+        hours=float(os.environ.get("LQTS_PRUNE_TIME_LIMIT_HOURS", 24))
+    )
     completed_limit: int = int(os.environ.get("LQTS_COMPLETED_LIMIT", 1000))
+    array_threshold: int = int(os.environ.get("LQTS_ARRAY_THRESHOLD", 100))
+    shortest_first: bool = parse_bool(os.environ.get("LQTS_SHORTEST_FIRST", False))
+    priority_aging: float = float(os.environ.get("LQTS_PRIORITY_AGING", 0))
+    fairshare_weight: float = float(os.environ.get("LQTS_FAIRSHARE_WEIGHT", 5))
+    fairshare_half_life_hours: float = float(os.environ.get("LQTS_FAIRSHARE_HALF_LIFE_HOURS", 24))
+    fairshare_shares: str = os.environ.get("LQTS_FAIRSHARE_SHARES", "")
+    resources: str = os.environ.get("LQTS_RESOURCES", "")
+    predictor_warmup: int = int(os.environ.get("LQTS_PREDICTOR_WARMUP", 5000))
 
     resume_on_start_up: bool = parse_bool(
         os.environ.get("LQTS_RESUME_ON_START_UP", False)
     )
 
     debug: bool = parse_bool(os.environ.get("LQTS_DEBUG", False))
+    profiling: bool = parse_bool(os.environ.get("LQTS_PROFILING", False))
+
+    use_launcher: bool = parse_bool(os.environ.get("LQTS_USE_LAUNCHER", False))
+
+    supervise: bool = parse_bool(os.environ.get("LQTS_SUPERVISE", False))
+    state_dir: str = os.environ.get("LQTS_STATE_DIR", join(expanduser("~"), ".lqts", "jobs"))
+
+    cache_dir: str = os.environ.get("LQTS_CACHE_DIR", join(expanduser("~"), ".lqts", "cache"))
+    cache_max_mb: float = float(os.environ.get("LQTS_CACHE_MAX_MB", 1024))
+    cache_content_hash: bool = parse_bool(os.environ.get("LQTS_CACHE_CONTENT_HASH", False))
+
+    local_execution: bool = parse_bool(os.environ.get("LQTS_LOCAL_EXECUTION", True))
+    lease_ttl: float = float(os.environ.get("LQTS_LEASE_TTL", 60))
+    lease_max_retries: int = int(os.environ.get("LQTS_LEASE_MAX_RETRIES", 2))
+
+    preempt_priority: int = int(os.environ.get("LQTS_PREEMPT_PRIORITY", 0))
+
+    autotune: bool = parse_bool(os.environ.get("LQTS_AUTOTUNE", False))
+    autotune_min_workers: int = int(os.environ.get("LQTS_AUTOTUNE_MIN_WORKERS", 1))
+    autotune_max_workers: int = int(os.environ.get("LQTS_AUTOTUNE_MAX_WORKERS", 0))
+    autotune_interval: float = float(os.environ.get("LQTS_AUTOTUNE_INTERVAL", 300))
+    autotune_hysteresis: float = float(os.environ.get("LQTS_AUTOTUNE_HYSTERESIS", 0.05))
+
+    admit_max_load: float = float(os.environ.get("LQTS_ADMIT_MAX_LOAD", 0))
+    admit_max_cpu_pressure: float = float(os.environ.get("LQTS_ADMIT_MAX_CPU_PRESSURE", 0))
+    admit_max_memory_pressure: float = float(os.environ.get("LQTS_ADMIT_MAX_MEMORY_PRESSURE", 0))
+    admit_max_io_pressure: float = float(os.environ.get("LQTS_ADMIT_MAX_IO_PRESSURE", 0))
+    admit_min_available_mb: float = float(os.environ.get("LQTS_ADMIT_MIN_AVAILABLE_MB", 0))
+    admit_autoscale: bool = parse_bool(os.environ.get("LQTS_ADMIT_AUTOSCALE", False))
+
+    py_preload: str = os.environ.get("LQTS_PY_PRELOAD", "")
+    py_worker_max_tasks: int = int(os.environ.get("LQTS_PY_WORKER_MAX_TASKS", 100))
+    py_worker_max_memory_mb: float = float(os.environ.get("LQTS_PY_WORKER_MAX_MEMORY_MB", 2048))
+    py_worker_prestart: int = int(os.environ.get("LQTS_PY_WORKER_PRESTART", 0))
 
     @property
     def url(self):
@@ -10,17 +10,26 @@ job queues.
     * JobSpec
     * JobStats
     * Job
+    * ArrayGroup
     * JobQueue
 """
 
+import bisect
 import enum
+import getpass
+import heapq
 import itertools
+import time
+from fnmatch import fnmatchcase
 from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Any, Dict, List, Tuple, Union
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, PrivateAttr, field_serializer, field_validator
 
+from lqts import metrics
 from lqts.core.config import Configuration
+from lqts.profiling import timed
 from lqts.simple_logging import Level, getLogger
 
 DEBUG = False
@@ -108,18 +117,83 @@ class JobStatus(enum.Enum):
     WalltimeExceeded = "X"
 
 
+def _current_user() -> str:
+    try:
+        return getpass.getuser()
+    except Exception:
+        return ""
+
+
 class JobSpec(BaseModel):
     command: str
     working_dir: str
+    user: str = Field(default_factory=_current_user, description="User who submitted the job")
     log_file: Union[None, str] = Field(None, description="Log file for the job")
     priority: int = Field(10, description="Priority level.  Default is 10")
     cores: int = 1  # number of cores required by the job
     alternate_runner: bool = False
-    depends: list[JobID] = Field(default_factory=list)
+    depends: list[JobID] = Field(
+        default_factory=list,
+        description="Jobs that must finish (in any state) before this one runs (afterany)",
+    )
+    depends_ok: list[JobID] = Field(
+        default_factory=list,
+        description="Jobs that must complete successfully before this one runs (afterok)",
+    )
+    depends_notok: list[JobID] = Field(
+        default_factory=list,
+        description="Jobs that must fail or be deleted before this one runs (afternotok)",
+    )
+    depends_corr: list[int] = Field(
+        default_factory=list,
+        description="Job groups whose member with the same index must complete successfully first (aftercorr)",
+    )
     walltime: Union[timedelta, float, str, None] = Field(
         None,
         description="Max time a job is allowed to run",
     )
+    threads: Union[None, int] = Field(
+        None,
+        description="Thread count exported to the job (OMP_NUM_THREADS etc.).  Defaults to the number of cores",
+    )
+    env: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Environment variables for the job.  These override the ones LQTS sets",
+    )
+    cache: bool = Field(
+        False,
+        description="Reuse the outputs of an earlier identical run instead of running again",
+    )
+    inputs: list[str] = Field(
+        default_factory=list,
+        description="Input files (relative to working_dir) that are part of the cache key",
+    )
+    outputs: list[str] = Field(
+        default_factory=list,
+        description="Output files (relative to working_dir) saved in and restored from the cache",
+    )
+    cache_env: list[str] = Field(
+        default_factory=list,
+        description="Environment variables that are part of the cache key",
+    )
+    resources: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Named resources the job holds while it runs, e.g. {'abaqus_lic': 2}",
+    )
+    pack: int = Field(
+        0,
+        description="Run up to this many jobs of the group back to back in one worker slot",
+    )
+    function: Union[None, str] = Field(
+        None,
+        description="Importable 'module:function' to call in a warm python worker instead of running command",
+    )
+    function_args: list = Field(default_factory=list)
+    function_kwargs: dict = Field(default_factory=dict)
+    function_pickle: Union[None, str] = Field(
+        None,
+        description="base64 encoded pickle of (args, kwargs), used instead of function_args/function_kwargs",
+    )
 
     def __lt__(self, other: "JobSpec"):
         return self.priority > other.priority
@@ -143,6 +217,20 @@ class JobSpec(BaseModel):
             return val
 
 
+# Steps of a job's life whose times are recorded in Job.phases, in order
+PHASES = (
+    "submitted",  # added to the queue
+    "ready",  # its dependencies were met (the submission time for jobs without any)
+    "selected",  # picked by the pool to start next
+    "allocated",  # given its cores and resources
+    "spawned",  # its process was started
+    "first_output",  # its log file first grew past the header
+    "exited",  # the pool saw its process had exited
+    "reaped",  # the pool freed its cores and reported it finished
+    "persisted",  # written to the history database
+)
+
+
 class Job(BaseModel):
     job_id: JobID = JobID(group=1, index=0)
     status: JobStatus = JobStatus.Queued
@@ -155,6 +243,25 @@ class Job(BaseModel):
 
     cores: list[int] | None = Field(default_factory=list)
 
+    returncode: int | None = None
+
+    agent: str | None = None  # name of the remote agent running the job
+    lease_expires: datetime | None = None  # when a remote agent's hold on the job runs out
+    retries: int = 0  # number of times the job was requeued after its lease expired
+
+    cached: bool = False  # the job's results were restored from the result cache
+
+    predicted_runtime: float | None = None  # seconds, learned from similar finished jobs (lqts.predictor)
+
+    preempted: datetime | None = None  # when the job was suspended to make room for urgent work
+    suspended_seconds: float = 0.0  # time spent suspended by earlier preemptions
+
+    phases: Dict[str, float] = Field(default_factory=dict)  # time.time() of each of PHASES reached
+
+    def mark(self, phase: str, when: float | None = None):
+        """Records the time (now unless given) the job reached one of PHASES"""
+        self.phases[phase] = time.time() if when is None else when
+
     @field_validator("cores")
     @classmethod
     def parse_walltime(cls, val: list[int] | None):
@@ -166,18 +273,24 @@ class Job(BaseModel):
     @property
     def walltime(self) -> float:
         """
-        Returns the walltime for a job in seconds elapsed
+        Returns the walltime for a job in seconds elapsed, not counting the time
+        it was suspended
         """
         try:
             if self.completed is not None:
-                return self.completed - self.started
+                elapsed = self.completed - self.started
             elif self.started is not None:
-                return datetime.now() - self.started
+                elapsed = datetime.now() - self.started
             else:
                 return timedelta(0.0)
         except TypeError:
             return timedelta(0.0)
 
+        suspended = self.suspended_seconds
+        if self.preempted is not None:
+            suspended += ((self.completed or datetime.now()) - self.preempted).total_seconds()
+        return elapsed - timedelta(seconds=suspended)
+
     def _should_prune(self) -> bool:
         now = datetime.now()
         if JobStatus.Completed:
@@ -240,6 +353,180 @@ class JobGroup(BaseModel):
         return JobID(group=self.group_number, index=len(self.jobs))
 
 
+# Array members that have no Job yet are marked Initialized.  A member becomes
+# Queued when its Job is made and added to the queue.
+UNFINISHED_STATES = b"IQRP"
+
+# outcomes of finished jobs kept after they leave completed_jobs, for their dependents
+OUTCOME_LIMIT = 100_000
+
+
+def _timestamp(value: datetime | str | None) -> float:
+    """Seconds since the epoch of a datetime (or a json iso string).  None is 0"""
+    if value is None:
+        return 0.0
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+class ArrayGroup(BaseModel):
+    """
+    A large job group whose members only differ by their command (and log
+    file).  The group holds one template JobSpec, the table of commands and one
+    status letter per member.  A Job object is only made for a member when it
+    is next in line to run (or when the member it depends on with aftercorr
+    succeeds), so a group of 100,000 commands costs little more than the
+    commands themselves.
+    """
+
+    group_number: int = 0
+    template: JobSpec
+    commands: list[str]
+    log_files: Union[None, list[Union[None, str]]] = None
+    submitted: datetime | None = None
+
+    states: Any = Field(default_factory=bytearray)  # a JobStatus letter per member
+    next_index: int = 0  # members before this have been looked at by next_member
+    unfinished: int = 0  # members that are waiting, queued, paused or running
+
+    @field_validator("states", mode="before")
+    @classmethod
+    def parse_states(cls, val):
+        return bytearray(val.encode() if isinstance(val, str) else val)
+
+    @field_serializer("states")
+    def serialize_states(self, states: bytearray) -> str:
+        return states.decode()
+
+    @classmethod
+    def from_specs(cls, group_number: int, job_specs: List[JobSpec]) -> "ArrayGroup":
+        log_files = [job_spec.log_file for job_spec in job_specs]
+        return cls(
+            group_number=group_number,
+            template=job_specs[0],
+            commands=[job_spec.command for job_spec in job_specs],
+            log_files=log_files if any(log_files) else None,
+            submitted=datetime.now(),
+            states=bytearray(JobStatus.Initialized.value.encode() * len(job_specs)),
+            unfinished=len(job_specs),
+        )
+
+    @staticmethod
+    def can_hold(job_specs: List[JobSpec]) -> bool:
+        """True if the job specs only differ by their command and log file"""
+        first = job_specs[0]
+        if first.pack > 1 or first.function:
+            return False
+
+        def settings(job_spec: JobSpec):
+            return {key: value for key, value in job_spec.__dict__.items() if key not in ("command", "log_file")}
+
+        first_settings = settings(first)
+        return all(settings(job_spec) == first_settings for job_spec in job_specs)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def job_id(self, index: int) -> JobID:
+        return JobID(group=self.group_number, index=index)
+
+    def make_job(self, index: int) -> Job | None:
+        """
+        Makes the Job for one member and marks it as queued.  Returns None if
+        the member already has a Job or has finished.
+        """
+        if not 0 <= index < len(self) or self.states[index] != ord(JobStatus.Initialized.value):
+            return None
+
+        self.states[index] = ord(JobStatus.Queued.value)
+        update = {"command": self.commands[index]}
+        if self.log_files is not None:
+            update["log_file"] = self.log_files[index]
+        return Job(
+            job_id=self.job_id(index),
+            job_spec=self.template.model_copy(update=update),
+            submitted=self.submitted,
+        )
+
+    def make_prototype(self) -> Job:
+        """A Job like the members of the array, e.g. to predict their runtime.  It doesn't change any states"""
+        return Job(job_id=self.job_id(0), job_spec=self.template, submitted=self.submitted)
+
+    def next_member(self) -> Job | None:
+        """Makes the Job for the next waiting member, or returns None if there are none left"""
+        while self.next_index < len(self):
+            job = self.make_job(self.next_index)
+            self.next_index += 1
+            if job is not None:
+                return job
+        return None
+
+    def set_state(self, index: int, status: JobStatus):
+        was_unfinished = self.states[index] in UNFINISHED_STATES
+        self.states[index] = ord(status.value)
+        if was_unfinished and status.value.encode() not in UNFINISHED_STATES:
+            self.unfinished -= 1
+
+    def state(self, index: int) -> JobStatus | None:
+        if 0 <= index < len(self):
+            return JobStatus(chr(self.states[index]))
+        return None
+
+    def is_unfinished(self, index: int) -> bool:
+        return 0 <= index < len(self) and self.states[index] in UNFINISHED_STATES
+
+    def pending_count(self) -> int:
+        """Members that don't have a Job yet"""
+        return self.states.count(JobStatus.Initialized.value.encode())
+
+    def counts(self) -> Dict[str, int]:
+        """Number of members with each status.  Members without a Job yet count as queued"""
+        counts = {}
+        for status in JobStatus:
+            count = self.states.count(status.value.encode())
+            if count:
+                name = JobStatus.Queued.name if status == JobStatus.Initialized else status.name
+                counts[name] = counts.get(name, 0) + count
+        return counts
+
+    def unfinished_ranges(self) -> list[list[int]]:
+        """[start, stop) index ranges of the members that have not finished"""
+        ranges = []
+        start = None
+        for index, state in enumerate(self.states):
+            if state in UNFINISHED_STATES:
+                if start is None:
+                    start = index
+            elif start is not None:
+                ranges.append([start, index])
+                start = None
+        if start is not None:
+            ranges.append([start, len(self)])
+        return ranges
+
+    def summary(self) -> str:
+        """e.g. 12.000-12.999: 400 done, 64 running, 536 queued"""
+        counts = self.counts()
+        done = sum(counts.get(status.name, 0) for status in (JobStatus.Completed, JobStatus.Deleted, JobStatus.Error, JobStatus.WalltimeExceeded))
+        parts = [f"{done} done"]
+        for status in (JobStatus.Running, JobStatus.Queued, JobStatus.Paused, JobStatus.Error, JobStatus.Deleted):
+            if counts.get(status.name):
+                parts.append(f"{counts[status.name]} {status.name.lower()}")
+        return f"{self.job_id(0)}-{self.job_id(len(self) - 1)}: " + ", ".join(parts)
+
+
+class AgentReport(BaseModel):
+    """
+    Sent by a remote agent to renew the leases of its running jobs and report
+    the jobs it has finished, all in one request
+    """
+
+    agent: str = ""
+    running: list[JobID] = Field(default_factory=list)
+    completed: list[Job] = Field(default_factory=list)
+
+
 class JobQueue(BaseModel):
     """
     The JobQueue keeps track of all jobs and their states.
@@ -251,6 +538,9 @@ class JobQueue(BaseModel):
     queue_file: str = ""
     completed_limit: int = 500
 
+    lease_ttl: float = 60.0  # seconds an agent has to renew the lease of a job it runs
+    lease_max_retries: int = 2  # times a job with an expired lease is requeued before it fails
+
     queued_jobs: Dict[JobID, Job] = {}
     running_jobs: Dict[JobID, Job] = {}
     completed_jobs: Dict[JobID, Job] = {}
@@ -258,6 +548,8 @@ class JobQueue(BaseModel):
     pruned_jobs: Dict[JobID, Job] = {}
 
     job_groups: Dict[int, JobGroup] = {}
+    array_groups: Dict[int, ArrayGroup] = {}
+    array_threshold: int = 100  # groups with at least this many similar jobs are stored as ArrayGroups
     # deleted_jobs: List[Job] = []
 
     next_group_number: int = 1
@@ -269,6 +561,34 @@ class JobQueue(BaseModel):
 
     config: Configuration = Configuration()
 
+    # lqts.history.JobHistory that finished jobs are written to
+    history: Any = Field(None, exclude=True)
+    # optional callable that is handed each job evicted from completed_jobs
+    on_evict: Any = Field(None, exclude=True)
+    # lqts.predictor.RuntimePredictor that learns runtimes from finished jobs
+    predictor: Any = Field(None, exclude=True)
+    shortest_first: bool = False  # among jobs of equal priority run the shortest predicted first
+    priority_aging: float = 0.0  # priority points a queued job gains per hour it waits
+
+    # lqts.fairshare.FairShare that interleaves users and groups by their recent usage
+    fairshare: Any = Field(None, exclude=True)
+    # lqts.resources.ResourceManager of the named resources (licenses etc.) jobs request
+    resources: Any = Field(None, exclude=True)
+
+    # queued jobs in the order they are started: a sorted list of (key, job_id) for
+    # each (user, group) and the current key of each indexed job.  Entries whose
+    # key no longer matches are stale and skipped.
+    _index: dict = PrivateAttr(default_factory=dict)
+    _index_keys: dict = PrivateAttr(default_factory=dict)
+    _index_stale: int = PrivateAttr(default=0)
+    _index_settings: tuple = PrivateAttr(default=())
+    # "ok"/"failed" of jobs evicted from completed_jobs or looked up in the history,
+    # oldest first, so a dependency costs at most one history lookup
+    _outcomes: dict = PrivateAttr(default_factory=dict)
+    # number of leading dependencies of a waiting job known to be satisfied.  A
+    # finished dependency stays finished, so they aren't looked at again.
+    _dependency_progress: dict = PrivateAttr(default_factory=dict)
+
     def start_up(self):
         """Start up the queue"""
         self.start()
@@ -309,6 +629,10 @@ class JobQueue(BaseModel):
         Submits a list of job specs to the queue.  The result
         is a list of jobs.  So a JobSpec gets submitted and turns into a Job
         """
+        self.check_resources(job_specs)
+        if len(job_specs) >= self.array_threshold and ArrayGroup.can_hold(job_specs):
+            return self.submit_array(job_specs)
+
         group = JobGroup(group_number=self.next_group_number)
         self.job_groups[group.group_number] = group
         self.next_group_number += 1
@@ -318,7 +642,8 @@ class JobQueue(BaseModel):
             job = Job(job_id=job_id, job_spec=job_spec)
             group.jobs[job_id] = job
             job.submitted = datetime.now()
-            self.queued_jobs[job_id] = job
+            self.predict(job)
+            self._enqueue(job)
 
         if len(job_specs) == 1:
             LOGGER.info(
@@ -331,9 +656,77 @@ class JobQueue(BaseModel):
                 + f"{group.jobs[first_job_id].submitted.isoformat()}"
             )
 
+        metrics.JOBS_SUBMITTED.inc(len(job_specs))
         self.on_queue_change()
         return list(group.jobs.keys())
 
+    def submit_array(self, job_specs: List[JobSpec]) -> List[JobID]:
+        """
+        Submits similar job specs as an ArrayGroup.  Only the first member is
+        made into a Job now.  The rest are made one at a time as the members
+        ahead of them start.  Members of an aftercorr array are made when their
+        partners in the groups they depend on finish.
+        """
+        array = ArrayGroup.from_specs(self.next_group_number, job_specs)
+        self.array_groups[array.group_number] = array
+        self.next_group_number += 1
+
+        if array.template.depends_corr:
+            # members are made as their partners finish
+            for index in range(len(array)):
+                if not any(self.dependency_state(JobID(group=group, index=index)) == "waiting" for group in array.template.depends_corr):
+                    self._queue_member(array, index)
+        else:
+            self._line_up_next(array)
+
+        LOGGER.info(
+            f"+++ Assimilated jobs {array.job_id(0)} - {array.job_id(len(array) - 1)} at "
+            + f"{array.submitted.isoformat()}"
+        )
+
+        metrics.JOBS_SUBMITTED.inc(len(job_specs))
+        self.on_queue_change()
+        return [array.job_id(index) for index in range(len(array))]
+
+    def queued_count(self) -> int:
+        """Number of queued jobs, including array members that aren't Jobs yet"""
+        return len(self.queued_jobs) + sum(array.pending_count() for array in self.array_groups.values())
+
+    def user_summary(self) -> List[dict]:
+        """
+        Running and queued job counts of each user, with their fair-share, decayed
+        usage and factor when fair-share is on
+        """
+        counts: Dict[str, Dict[str, int]] = {}
+        active: Dict[str, set] = {}
+        for name, jobs in (("running", self.running_jobs.values()), ("queued", self.queued_jobs.values())):
+            for job in list(jobs):
+                user = job.job_spec.user or ""
+                counts.setdefault(user, {"running": 0, "queued": 0})[name] += 1
+                active.setdefault(user, set()).add(job.job_id.group)
+        for array in self.array_groups.values():
+            user = array.template.user or ""
+            counts.setdefault(user, {"running": 0, "queued": 0})["queued"] += array.pending_count()
+            active.setdefault(user, set()).add(array.group_number)
+
+        if self.fairshare is None:
+            return [{"user": user, **counts[user]} for user in sorted(counts)]
+
+        return [
+            {**item, **counts.get(item["user"], {"running": 0, "queued": 0})}
+            for item in self.fairshare.summary(active)
+        ]
+
+    def unfinished_ids(self, group_number: int) -> List[JobID]:
+        """Ids of the jobs in a group that have not finished"""
+        if group_number in self.array_groups:
+            array = self.array_groups[group_number]
+            return [array.job_id(index) for start, stop in array.unfinished_ranges() for index in range(start, stop)]
+        elif group_number in self.job_groups:
+            return list(self.job_groups[group_number].jobs.keys())
+        else:
+            return []
+
     def running_count(self) -> int:
         """
         Gets the current nuber of running jobs sum (ncores_each_job * njobs).
@@ -343,34 +736,498 @@ class JobQueue(BaseModel):
 
         n = 0
         for job in self.running_jobs.values():
-            n += job.job_spec.cores
+            if job.preempted is None:
+                n += job.job_spec.cores
 
         return n
 
+    def schedule_key(self, job: Job) -> tuple:
+        """
+        Sort key for the order queued jobs are started in: highest effective
+        priority first, then (with shortest_first) the shortest predicted runtime,
+        then oldest first.  Jobs without a prediction go ahead so their runtime
+        gets measured.
+
+        The effective priority is priority + priority_aging * hours waited.  All
+        jobs age at the same rate, so ordering by priority - priority_aging *
+        (submission time in hours) gives the same order at any moment and the
+        key never has to change while a job waits.
+        """
+        aged = job.job_spec.priority - self.priority_aging * _timestamp(job.submitted) / 3600
+        if self.shortest_first:
+            return (-aged, job.predicted_runtime or 0.0, job.job_id)
+        return (-aged, 0.0, job.job_id)
+
+    def effective_priority(self, job: Job, now: datetime | None = None) -> float:
+        """The priority of a job including what it has gained by waiting"""
+        if not self.priority_aging:
+            return job.job_spec.priority
+        now = datetime.now() if now is None else now
+        waited = max(now.timestamp() - _timestamp(job.submitted), 0.0)
+        return job.job_spec.priority + self.priority_aging * waited / 3600
+
+    def _enqueue(self, job: Job):
+        """Adds a job to queued_jobs and the index"""
+        if "submitted" not in job.phases:
+            job.mark("submitted", _timestamp(job.submitted) or None)
+            spec = job.job_spec
+            if not (spec.depends or spec.depends_ok or spec.depends_notok or spec.depends_corr):
+                job.mark("ready", job.phases["submitted"])
+        self.queued_jobs[job.job_id] = job
+        self._index_add(job)
+
+    def _dequeue(self, job_id: JobID) -> Job:
+        """Removes a job from queued_jobs.  Its index entry becomes stale"""
+        self._index_forget(job_id)
+        self._dependency_progress.pop(job_id, None)
+        return self.queued_jobs.pop(job_id)
+
+    @staticmethod
+    def _bucket(job: Job) -> tuple:
+        return (job.job_spec.user or "", job.job_id.group)
+
+    def _index_add(self, job: Job):
+        key = self.schedule_key(job)
+        self._index_keys[job.job_id] = key
+        bisect.insort(self._index.setdefault(self._bucket(job), []), (key, job.job_id))
+
+    def _index_forget(self, job_id: JobID):
+        if self._index_keys.pop(job_id, None) is not None:
+            self._index_stale += 1
+
+    def _rebuild_index(self):
+        self._index_keys = {}
+        self._index = {}
+        for job_id, job in self.queued_jobs.items():
+            key = self.schedule_key(job)
+            self._index_keys[job_id] = key
+            self._index.setdefault(self._bucket(job), []).append((key, job_id))
+        for bucket in self._index.values():
+            bucket.sort()
+        self._index_stale = 0
+        self._index_settings = (self.priority_aging, self.shortest_first)
+
+    def _check_index(self):
+        """
+        Rebuilds the index if the settings changed, if jobs were added to or
+        removed from queued_jobs without going through it, or if it is mostly
+        stale entries
+        """
+        if (
+            self._index_settings != (self.priority_aging, self.shortest_first)
+            or len(self._index_keys) != len(self.queued_jobs)
+            or self._index_stale > len(self._index_keys) + 64
+        ):
+            self._rebuild_index()
+
+    def _valid_jobs(self, entries):
+        for key, job_id in entries:
+            if self._index_keys.get(job_id) != key:
+                continue
+            job = self.queued_jobs.get(job_id)
+            if job is not None:
+                yield job
+
+    def ordered_queued(self):
+        """Yields the queued jobs in the order they should start, without sorting them"""
+        self._check_index()
+        yield from self._valid_jobs(heapq.merge(*self._index.values()))
+
+    def _pick(self, accept=None) -> Job | None:
+        """
+        Gets the next job to start that *accept* (if given) allows and is
+        runnable.  Without fair-share that is the first in index order.  With
+        fair-share the first runnable job of each user and group competes on its
+        effective priority plus the fair-share boost of its user and group.
+        """
+        while True:
+            # jobs found to be unrunnable are cancelled after the scan, since
+            # cancelling one can line up others in the index being scanned
+            cancelled = []
+            try:
+                job = self._scan(accept, cancelled)
+            finally:
+                for cancelled_job, dependency, state in cancelled:
+                    self._cancel(cancelled_job, dependency, state)
+            # the cancellations may have lined up jobs that can run
+            if job is not None or not cancelled:
+                return job
+
+    def _scan(self, accept, cancelled: list) -> Job | None:
+        if self.fairshare is None or not self.fairshare.weight:
+            for job in self.ordered_queued():
+                if (accept is None or accept(job)) and self.check_can_job_run(job.job_id, cancelled):
+                    return job
+            return None
+
+        self._check_index()
+        heads = []
+        for bucket in list(self._index.values()):
+            for job in self._valid_jobs(bucket):
+                if (accept is None or accept(job)) and self.check_can_job_run(job.job_id, cancelled):
+                    heads.append(job)
+                    break
+        if len(heads) <= 1:
+            return heads[0] if heads else None
+
+        active: Dict[str, set] = {}
+        for job in itertools.chain(heads, self.running_jobs.values()):
+            active.setdefault(job.job_spec.user or "", set()).add(job.job_id.group)
+        factors = self.fairshare.factors(active)
+
+        def score(job: Job):
+            key = self._index_keys[job.job_id]
+            # -key[0] is the aged priority, which orders like the effective priority
+            return (key[0] - self.fairshare.weight * factors[self._bucket(job)], key)
+
+        return min(heads, key=score)
+
+    def set_priority(
+        self,
+        priority: int,
+        job_ids: List[JobID] | None = None,
+        group: int | None = None,
+        status: str | None = None,
+        command: str | None = None,
+    ) -> int:
+        """
+        Sets the priority of the queued and running jobs that match all of the
+        filters: *job_ids*, *group*, *status* (a letter or name) and *command* (a
+        glob pattern such as "*solver*").  The queued jobs are re-indexed in one go.
+        Array members that aren't Jobs yet follow their array's template, which
+        changes when the whole group is selected without a command pattern.
+
+        An explicit *job_ids* list, even an empty one, limits the change to
+        those jobs.  Returns the number of jobs changed.
+        """
+        if job_ids is not None:
+            jobs = [job for job, _ in map(self.find_job, job_ids) if job is not None]
+        else:
+            jobs = list(itertools.chain(self.running_jobs.values(), self.queued_jobs.values()))
+
+        def matches(job: Job) -> bool:
+            return (
+                (group is None or job.job_id.group == group)
+                and (not status or status in (job.status.value, job.status.name))
+                and (not command or fnmatchcase(job.job_spec.command, command))
+            )
+
+        jobs = [job for job in jobs if matches(job)]
+        for job in jobs:
+            self._index_forget(job.job_id)
+            job.job_spec = job.job_spec.model_copy(update={"priority": priority})
+
+        changed = len(jobs)
+        if group is not None and job_ids is None and not command and status in (None, "", "Q", "Queued"):
+            array = self.array_groups.get(group)
+            if array is not None:
+                array.template = array.template.model_copy(update={"priority": priority})
+                changed += array.pending_count()
+
+        queued = [job for job in jobs if job.job_id in self.queued_jobs]
+        if len(queued) > 64:
+            self._rebuild_index()
+        else:
+            for job in queued:
+                self._index_add(job)
+
+        if changed:
+            self.on_queue_change()
+            if LOGGER is not None:
+                LOGGER.info(f"*** Set priority of {changed} jobs to {priority}")
+        return changed
+
+    def predict(self, job: Job):
+        """Sets the predicted runtime of a job.  A walltime limit caps the prediction"""
+        predicted = self.predictor.predict(job.job_spec) if self.predictor is not None else None
+        walltime = job.job_spec.walltime
+        if isinstance(walltime, (int, float)) and walltime > 0:
+            predicted = walltime if predicted is None else min(predicted, walltime)
+        job.predicted_runtime = predicted
+
+    def predict_all(self):
+        """Updates the predicted runtime of every queued and running job"""
+        for job in list(self.queued_jobs.values()) + list(self.running_jobs.values()):
+            self.predict(job)
+        self._rebuild_index()
+
+    def estimate_completion(self, job_ids: List[JobID], cores: int) -> dict:
+        """
+        Estimates when the jobs *job_ids* will all have finished by playing the
+        queue forward on *cores* cores using the predicted runtimes.  Running jobs
+        take the rest of their prediction, then queued jobs start in scheduling
+        order (dependencies are ignored) as cores come free.  Jobs without a
+        prediction take the median prediction of the others.
+
+        Returns {"seconds": ..., "jobs": <number still unfinished>, "unpredicted": <number>}
+        """
+        targets = set(job_ids)
+        remaining = {job_id for job_id in targets if self.dependency_state(job_id) == "waiting"}
+        result = {"seconds": 0.0, "jobs": len(remaining), "unpredicted": 0}
+        if not remaining:
+            return result
+
+        queued = list(self.ordered_queued())
+        for array in self.array_groups.values():
+            # members without a Job yet run after the queued ones
+            if array.pending_count():
+                prototype = array.make_prototype()
+                self.predict(prototype)
+                queued.extend(
+                    (array.job_id(index), prototype)
+                    for index, state in enumerate(array.states)
+                    if state == ord(JobStatus.Initialized.value)
+                )
+
+        predictions = [job.predicted_runtime for job in self.running_jobs.values() if job.predicted_runtime]
+        predictions += [job.predicted_runtime for job in self.queued_jobs.values() if job.predicted_runtime]
+        fallback = sorted(predictions)[len(predictions) // 2] if predictions else 0.0
+
+        def runtime_of(job_id: JobID, job: Job) -> float:
+            if job.predicted_runtime is None:
+                if job_id in targets:
+                    result["unpredicted"] += 1
+                return fallback
+            return job.predicted_runtime
+
+        cores = max(cores, 1)
+        free_at = [0.0] * cores  # when each core comes free, as a heap
+        now = datetime.now()
+        finish = 0.0
+
+        def place(job_id: JobID, job: Job, duration: float):
+            nonlocal finish
+            needed = min(max(job.job_spec.cores, 1), cores)
+            start = max(heapq.heappop(free_at) for _ in range(needed))
+            for _ in range(needed):
+                heapq.heappush(free_at, start + duration)
+            if job_id in remaining:
+                remaining.discard(job_id)
+                finish = max(finish, start + duration)
+
+        for job in self.running_jobs.values():
+            elapsed = (now - job.started).total_seconds() if isinstance(job.started, datetime) else 0.0
+            place(job.job_id, job, max(runtime_of(job.job_id, job) - elapsed, 0.0))
+
+        for item in queued:
+            if not remaining:
+                break
+            job_id, job = (item.job_id, item) if isinstance(item, Job) else item
+            place(job_id, job, runtime_of(job_id, job))
+
+        result["seconds"] = finish
+        return result
+
+    def check_resources(self, job_specs: List[JobSpec]):
+        """Raises ValueError if a job requests resources the server doesn't have enough of"""
+        if self.resources is None:
+            return
+        for job_spec in job_specs:
+            self.resources.check(job_spec.resources)
+
+    def resources_available(self, job: Job) -> bool:
+        """True if the resources *job* requests are free now"""
+        return self.resources is None or not job.job_spec.resources or self.resources.available(job.job_spec.resources)
+
+    def allocate_resources(self, job: Job, force: bool = False) -> bool:
+        """
+        Allocates the resources *job* requests, all of them or none.  Returns
+        False if some are in use.
+        """
+        if self.resources is None or not job.job_spec.resources:
+            return True
+        return self.resources.allocate(job.job_id, job.job_spec.resources, force=force)
+
+    def release_resources(self, job_id: JobID):
+        if self.resources is not None:
+            self.resources.release(job_id)
+
+    def resource_status(self) -> Dict[str, dict]:
+        """
+        Capacity and use of each resource, the jobs holding it and the queued jobs
+        waiting for it
+        """
+        if self.resources is None:
+            return {}
+        status = self.resources.status()
+        for item in status.values():
+            item["waiting"] = []
+            item["waiting_count"] = 0
+        for job in self.queued_jobs.values():
+            for name in job.job_spec.resources:
+                if name in status:
+                    status[name]["waiting"].append(str(job.job_id))
+                    status[name]["waiting_count"] += 1
+        for array in self.array_groups.values():
+            # members that aren't Jobs yet
+            pending = array.pending_count()
+            for name in array.template.resources:
+                if name in status:
+                    status[name]["waiting_count"] += pending
+        return status
+
+    @timed("next_job")
     def next_job(self) -> Job:
         """
-        Gets the next runnable job
+        Gets the next runnable job whose resources are free
         """
         if not self.queued_jobs:
             return None
 
-        for job in sorted(self.queued_jobs.values()):
-            if self.check_can_job_run(job.job_id):
-                return job
+        return self._pick(self.resources_available)
+
+    def next_pack(self, first_job: Job) -> List[Job]:
+        """
+        Gets a chunk of runnable jobs from the same group as *first_job* to run back
+        to back in one worker slot.  The chunk is at most ``first_job.job_spec.pack``
+        jobs long and always starts with *first_job*.
+        """
+        pack_size = first_job.job_spec.pack
+        jobs = [first_job]
+        group = self.job_groups.get(first_job.job_id.group)
+        if group is None or pack_size <= 1:
+            return jobs
+
+        for job_id, job in list(group.jobs.items()):
+            if len(jobs) >= pack_size:
+                break
+            if job is first_job or job.job_spec.cores != first_job.job_spec.cores:
+                continue
+            # each job of the chunk holds its resources until it finishes
+            if self.check_can_job_run(job_id) and self.allocate_resources(job):
+                jobs.append(self.queued_jobs[job_id])
+
+        return jobs
+
+    def request_job(self, cores: int, agent: str = "") -> Job | None:
+        """
+        Hands the next runnable job that needs no more than *cores* cores to a
+        remote agent and marks it as running.  Function jobs need the server's
+        python workers, so they are never handed out.
+        """
+        job = self._pick(
+            lambda job: job.job_spec.cores <= cores and not job.job_spec.function and self.resources_available(job)
+        )
+        if job is not None:
+            if not self.allocate_resources(job):
+                return None
+            job.agent = agent
+            self.on_job_started(job)
+            job.lease_expires = job.started + timedelta(seconds=self.lease_ttl)
+        return job
+
+    def agent_report(self, report: "AgentReport") -> List[JobID]:
+        """
+        Renews the leases of the jobs an agent is running and finishes the jobs it
+        has completed.  Returns the ids of reported running jobs the agent no
+        longer holds (their lease expired or they were deleted), which the agent
+        should stop.
+        """
+        lost = []
+        expires = datetime.now() + timedelta(seconds=self.lease_ttl)
+        for job_id in report.running:
+            job = self.running_jobs.get(job_id)
+            if job is None or job.agent != report.agent:
+                lost.append(job_id)
+            else:
+                job.lease_expires = expires
+
+        for completed_job in report.completed:
+            job = self.running_jobs.get(completed_job.job_id)
+            # a late report for a job that has since been handed to another agent is ignored
+            if job is not None and job.agent == report.agent:
+                self.on_job_finished(completed_job)
+
+        return lost
+
+    def expire_leases(self) -> List[JobID]:
+        """
+        Requeues jobs whose agent has stopped renewing their lease, or marks them
+        as errored once they have been requeued *lease_max_retries* times.
+        Returns the ids of the expired jobs.
+        """
+        now = datetime.now()
+        expired = [
+            job
+            for job in list(self.running_jobs.values())
+            if job.lease_expires is not None and job.lease_expires < now
+        ]
+
+        for job in expired:
+            self.running_jobs.pop(job.job_id)
+            self.release_resources(job.job_id)
+            if job.retries < self.lease_max_retries:
+                LOGGER.warning(f"!!! Lease of job {job.job_id} on agent {job.agent} expired.  Requeuing it")
+                job.retries += 1
+                job.status = JobStatus.Queued
+                job.started = None
+                job.agent = None
+                job.lease_expires = None
+                array = self.array_groups.get(job.job_id.group)
+                if array is not None:
+                    array.set_state(job.job_id.index, JobStatus.Queued)
+                self._enqueue(job)
+            else:
+                LOGGER.error(f"!!! Lease of job {job.job_id} on agent {job.agent} expired {job.retries + 1} times")
+                job.status = JobStatus.Error
+                job.completed = now
+                job.lease_expires = None
+                self.add_completed(job)
+
+        if expired:
+            self.on_queue_change()
+
+        return [job.job_id for job in expired]
 
     def on_job_started(self, started_job: Job):
         """
         Call this when a job is about to start
         """
-        job = self.queued_jobs.pop(started_job.job_id)
+        job = self._dequeue(started_job.job_id)
         job.status = JobStatus.Running
         job.started = datetime.now()
         self.running_jobs[job.job_id] = job
+
+        array = self.array_groups.get(job.job_id.group)
+        if array is not None:
+            array.set_state(job.job_id.index, JobStatus.Running)
+            self._line_up_next(array)
+
+        metrics.JOBS_DISPATCHED.inc()
+        if job.submitted:
+            metrics.JOB_WAIT.observe(max(job.started.timestamp() - _timestamp(job.submitted), 0.0))
         self.on_queue_change()
 
         if LOGGER is not None:
             LOGGER.info(f">>> Started     job {job.job_id} at {job.started.isoformat()}.  cores={job.cores}")
 
+    def on_job_preempted(self, job: Job, by: JobID | None = None):
+        """
+        Call this when a running job has been suspended and its cores handed to
+        another job.  It stays in running_jobs, marked Paused.
+        """
+        job.status = JobStatus.Paused
+        job.preempted = datetime.now()
+        job.cores = []
+        self.on_queue_change()
+
+        if LOGGER is not None:
+            LOGGER.info(f"||| Preempted   job {job.job_id} at {job.preempted.isoformat()}" + (f" for job {by}" if by else ""))
+
+    def on_job_resumed(self, job: Job, cores: list[int]):
+        """
+        Call this when a preempted job has been given cores again and continued
+        """
+        if job.preempted is not None:
+            job.suspended_seconds += (datetime.now() - job.preempted).total_seconds()
+        job.status = JobStatus.Running
+        job.preempted = None
+        job.cores = cores
+        self.on_queue_change()
+
+        if LOGGER is not None:
+            LOGGER.info(f">>> Resumed     job {job.job_id} at {datetime.now().isoformat()}.  cores={job.cores}")
+
     def on_job_finished(self, completed_job: Job):
         """
         Call this when a job is done
@@ -379,8 +1236,14 @@ class JobQueue(BaseModel):
             job = self.running_jobs.pop(completed_job.job_id)
             job.status = completed_job.status
             job.completed = completed_job.completed
-            self.completed_jobs[job.job_id] = job
+            if isinstance(job.completed, str):
+                # jobs reported by remote agents come in as json
+                job.completed = datetime.fromisoformat(job.completed)
+            job.returncode = completed_job.returncode
+            self.add_completed(job)
             duration = job.completed - job.started
+            metrics.JOBS_COMPLETED.inc(1, job.status.value)
+            metrics.JOB_RUNTIME.observe(max(duration.total_seconds() - job.suspended_seconds, 0.0))
             if LOGGER is not None:
                 LOGGER.info(
                     f"--- Completed   job {job.job_id} at {job.completed.isoformat()}. " + f"Duration = {duration}"
@@ -390,12 +1253,96 @@ class JobQueue(BaseModel):
 
         self.on_queue_change()
 
-    def check_can_job_run(self, job_id: JobID) -> bool:
+    def add_completed(self, job: Job):
+        """
+        Adds a finished job to completed_jobs, which is kept in the order jobs
+        finish.  The oldest entry is evicted as soon as there are more than
+        *completed_limit*, so the queue never has to rescan the completed jobs.
+        """
+        # a job finishing again (e.g. deleted after an error) moves to the end
+        self.completed_jobs.pop(job.job_id, None)
+        self.completed_jobs[job.job_id] = job
+        self.release_resources(job.job_id)
+        self.add_to_history(job)
+        if self.predictor is not None:
+            self.predictor.observe(job)
+        if self.fairshare is not None:
+            self.fairshare.charge_finished(job)
+        self._forget_in_group(job.job_id, job.status)
+
+        while len(self.completed_jobs) > self.completed_limit:
+            self._evict_oldest()
+
+    def _forget_in_group(self, job_id: JobID, status: JobStatus):
+        """
+        Records that a job has finished in its group.  Groups with no unfinished
+        jobs are dropped.
+        """
+        self._release_correlated(job_id)
+
+        array = self.array_groups.get(job_id.group)
+        if array is not None:
+            array.set_state(job_id.index, status)
+            if array.unfinished == 0:
+                self.array_groups.pop(job_id.group)
+            return
+
+        group = self.job_groups.get(job_id.group)
+        if group is not None:
+            group.jobs.pop(job_id, None)
+            if not group.jobs:
+                self.job_groups.pop(job_id.group)
+
+    def _line_up_next(self, array: ArrayGroup):
+        """Makes the next waiting member of an array a queued Job"""
+        if array.template.depends_corr:
+            return
+        job = array.next_member()
+        if job is not None:
+            self.predict(job)
+            self._enqueue(job)
+
+    def _queue_member(self, array: ArrayGroup, index: int):
+        job = array.make_job(index)
+        if job is not None:
+            self.predict(job)
+            self._enqueue(job)
+
+    def _release_correlated(self, job_id: JobID):
+        """
+        Queues the members of aftercorr arrays whose partner *job_id* has just
+        finished.  check_can_job_run decides whether they run or are cancelled.
+        """
+        if job_id.index is None:
+            return
+        for array in list(self.array_groups.values()):
+            if job_id.group in array.template.depends_corr:
+                self._queue_member(array, job_id.index)
+
+    def _evict_oldest(self):
+        job = self.completed_jobs.pop(next(iter(self.completed_jobs)))
+        self._remember_outcome(job.job_id, self._outcome(job))
+        if self.on_evict is not None:
+            self.on_evict(job)
+
+    def add_to_history(self, job: Job):
+        """Records a finished job in the history database, if there is one"""
+        if self.history is not None:
+            try:
+                self.history.add(job)
+            except Exception:
+                LOGGER.error(f"Could not add job {job.job_id} to the history")
+
+    def check_can_job_run(self, job_id: JobID, cancelled: list | None = None) -> bool:
         """
         Checks to see if a job is able to run.  Three conditions must be met:
         1. The job must be in self.queued_jobs
-        2. No dependencies must be in self.queued_jobs
-        3. No depencencies must be in self.running_jobs
+        2. The job must not be paused
+        3. All of its dependencies must be satisfied
+
+        A job whose dependencies can no longer be satisfied (e.g. an afterok
+        dependency failed) is deleted, or, if a *cancelled* list is given,
+        added to it as (job, dependency, state) for the caller to delete.
         """
         if job_id not in self.queued_jobs:
             return False
@@ -405,43 +1352,112 @@ class JobQueue(BaseModel):
         if job.status == JobStatus.Paused:
             return False
 
-        if job.job_spec.depends:
-            waiting_on: List[JobID] = [
-                id_ for id_ in job.job_spec.depends if ((id_ in self.running_jobs) or (id_ in self.queued_jobs))
-            ]
-        else:
-            waiting_on: List[JobID] = []
+        spec = job.job_spec
+        if not (spec.depends or spec.depends_ok or spec.depends_notok or spec.depends_corr):
+            return True
 
-        if len(waiting_on) > 0:
-            if DEBUG:
-                print(f">w<{job.job_id} waiting on running jobs: {waiting_on}")
+        # (dependency, the states that satisfy it)
+        dependencies = [(id_, ("ok", "failed")) for id_ in spec.depends]
+        dependencies += [(id_, ("ok",)) for id_ in spec.depends_ok]
+        dependencies += [(id_, ("failed",)) for id_ in spec.depends_notok]
+        if job_id.index is not None:
+            dependencies += [(JobID(group=group, index=job_id.index), ("ok",)) for group in spec.depends_corr]
+
+        progress = self._dependency_progress
+        for position in range(progress.get(job_id, 0), len(dependencies)):
+            id_, satisfied_by = dependencies[position]
+            state = self.dependency_state(id_)
+            if state == "waiting":
+                # the rest are looked at once this one has finished
+                progress[job_id] = position
+                if DEBUG:
+                    print(f">w<{job.job_id} waiting on job: {id_}")
+                return False
+            elif state not in satisfied_by:
+                if cancelled is not None:
+                    cancelled.append((job, id_, state))
+                else:
+                    self._cancel(job, id_, state)
+                return False
 
-            return False
-        else:
-            return True
+        progress.pop(job_id, None)
+        if "ready" not in job.phases:
+            job.mark("ready")
+        return True
 
-    def prune(self):
+    def _cancel(self, job: Job, dependency: JobID, state: str):
+        """Deletes a queued job whose *dependency* can't be satisfied"""
+        if job.job_id not in self.queued_jobs:
+            return
+        if LOGGER is not None:
+            LOGGER.info(f"--- Cancelled   job {job.job_id}.  Its dependency on {dependency} can't be satisfied ({state})")
+        self.pop_job(job, self.queued_jobs)
+        self.on_queue_change()
+
+    def dependency_state(self, job_id: JobID) -> str:
         """
-        Keeps the list of completed jobs to a defined size
+        The state of a job as a dependency: "waiting" if it hasn't finished,
+        "ok" if it completed successfully and "failed" otherwise.  Jobs the queue
+        knows nothing about count as "ok".
         """
-        # completed_limit = DEFAULT_CONFIG.prune_job_limt
+        if job_id in self.running_jobs or job_id in self.queued_jobs or self._is_array_member_waiting(job_id):
+            return "waiting"
 
-        completed_jobs = len(self.completed_jobs)
-        if completed_jobs <= self.completed_limit:
-            LOGGER.debug("Pruning - nothing pruned")
-            return
+        job = self.completed_jobs.get(job_id)
+        if job is not None:
+            return self._outcome(job)
 
-        prune_count = completed_jobs - self.completed_limit  # int(self.completed_limit / 2)
-        LOGGER.debug(f"Pruning - will prune {prune_count} completed jobs")
-        self.pruned_jobs = {}
-        for ij, job in enumerate(list(self.completed_jobs.values())):
-            if ij >= prune_count:
-                return
-            if job.job_id not in self.running_jobs:
-                self.completed_jobs.pop(job.job_id)
-                # self.pruned_jobs[job.job_id] = job
+        array = self.array_groups.get(job_id.group)
+        if array is not None and job_id.index is not None and array.state(job_id.index) is not None:
+            return "ok" if array.state(job_id.index) == JobStatus.Completed else "failed"
 
-        self.on_queue_change()
+        outcome = self._outcomes.get(job_id)
+        if outcome is None:
+            job = self.history.get(job_id) if self.history is not None else None
+            outcome = self._outcome(job) if job is not None else "ok"
+            self._remember_outcome(job_id, outcome)
+        return outcome
+
+    @staticmethod
+    def _outcome(job: Job) -> str:
+        if job.status == JobStatus.Completed and job.returncode in (None, 0):
+            return "ok"
+        return "failed"
+
+    def _remember_outcome(self, job_id: JobID, outcome: str):
+        self._outcomes[job_id] = outcome
+        if len(self._outcomes) > OUTCOME_LIMIT:
+            self._outcomes.pop(next(iter(self._outcomes)))
+
+    def _is_array_member_waiting(self, job_id: JobID) -> bool:
+        """True for an array member that hasn't been made into a Job and hasn't finished"""
+        array = self.array_groups.get(job_id.group)
+        return array is not None and job_id.index is not None and array.is_unfinished(job_id.index)
+
+    @timed("prune")
+    def prune(self):
+        """
+        Evicts completed jobs that are older than the configured
+        prune_time_limit, and any over *completed_limit* (if the limit was
+        lowered).  Only the oldest entries are looked at, so this costs nothing
+        when there is nothing to prune.
+        """
+        pruned = 0
+        while len(self.completed_jobs) > self.completed_limit:
+            self._evict_oldest()
+            pruned += 1
+
+        cutoff = datetime.now() - self.config.prune_time_limit
+        while self.completed_jobs:
+            oldest = next(iter(self.completed_jobs.values()))
+            if not isinstance(oldest.completed, datetime) or oldest.completed >= cutoff:
+                break
+            self._evict_oldest()
+            pruned += 1
+
+        if pruned:
+            LOGGER.debug(f"Pruning - pruned {pruned} completed jobs")
+            self.on_queue_change()
 
     def _runloop(self):
         """
@@ -451,17 +1467,23 @@ class JobQueue(BaseModel):
         import time
 
         while True:
+            self.expire_leases()
             self.prune()
+            if self.fairshare is not None:
+                self.fairshare.charge_running(self.running_jobs.values())
             if self.is_dirty:
                 self.save()
-
-            time.sleep(5)
-            # for __ in range(15):
-            #     time.sleep(2)
-            #     if "abort" in self.flags:
-            #         LOGGER.debug("Aborting and shutting down")
-            #         self.flags.remove("abort")
-            #         return
+            if self.history is not None:
+                self.history.flush()
+
+            for __ in range(10):
+                time.sleep(0.5)
+                if "abort" in self.flags:
+                    LOGGER.debug("Aborting and shutting down")
+                    self.flags.remove("abort")
+                    if self.history is not None:
+                        self.history.flush()
+                    return
 
     def start(self):
         """
@@ -474,15 +1496,17 @@ class JobQueue(BaseModel):
         """
         import threading
 
-        t = threading.Thread(target=self._runloop)
+        t = threading.Thread(target=self._runloop, name="lqts-queue")
         t.start()
         return t
 
     def shutdown(self):
         self.flags.append("abort")
 
+    @timed("save")
     def save(self):
         # return
+        t0 = time.perf_counter()
         with open(self.queue_file, "w") as fid:
             fid.write("[running_jobs]\n")
             for job_id, job in self.running_jobs.items():
@@ -496,11 +1520,21 @@ class JobQueue(BaseModel):
             # for job_id, job in self.completed_jobs.items():
             #     fid.write(f"{job_id}: {job.model_dump_json()}\n")
 
+            fid.write("[array_groups]\n")
+            for group_number, array in self.array_groups.items():
+                fid.write(f"{group_number}: {array.model_dump_json()}\n")
+            size = fid.tell()
+
+        metrics.QUEUE_SAVE.observe(time.perf_counter() - t0)
+        metrics.QUEUE_FILE_BYTES.set(size)
         self.is_dirty = False
 
     def load(self):
         # return
         max_job_group = 0
+        if not Path(self.queue_file).exists():
+            return
+
         with open(self.queue_file, "r") as fid:
             reading_queue = self.queued_jobs
             # was_running = False
@@ -511,9 +1545,18 @@ class JobQueue(BaseModel):
                 elif "[queued_jobs]" in line:
                     reading_queue = self.queued_jobs
                     # was_running = False
+                elif "[array_groups]" in line:
+                    reading_queue = self.array_groups
                 # elif "[completed_jobs]" in line:
                 #     reading_queue = self.completed_jobs
                 #     was_running = False
+                elif reading_queue is self.array_groups:
+                    *_, str_array = line.partition(":")
+                    array = ArrayGroup.model_validate_json(str_array)
+                    # members that were running were saved as jobs and are loaded paused
+                    array.states = array.states.replace(b"R", b"Q")
+                    max_job_group = max(array.group_number, max_job_group)
+                    self.array_groups[array.group_number] = array
                 else:
                     *_, str_job = line.partition(":")
                     job = Job.model_validate_json(str_job)
@@ -541,10 +1584,18 @@ class JobQueue(BaseModel):
         if job is None:
             return None
         else:
-            queue.pop(job.job_id)
+            if queue is self.queued_jobs:
+                self._dequeue(job.job_id)
+            else:
+                queue.pop(job.job_id)
+            if job.status != JobStatus.Running:
+                array = self.array_groups.get(job.job_id.group)
+                if array is not None and array.next_index <= job.job_id.index + 1:
+                    # it was the array's next member in line
+                    self._line_up_next(array)
             job.status = JobStatus.Deleted
             job.completed = datetime.now()
-            self.completed_jobs[job.job_id] = job
+            self.add_completed(job)
             return job
 
     def qdel(self, job_ids: List[JobID]) -> List[JobID]:
@@ -556,16 +1607,25 @@ class JobQueue(BaseModel):
 
         for job_id in list(job_ids):
             if job_id.index is None:
-                for job_id2 in self.job_groups[job_id.group]:
-                    job, queue = self.find_job(job_id2)
-                    if job is not None:
-                        job = self.pop_job(job, queue)
-                        deleted_job_ids.append(job.job_id)
+                group_job_ids = self.unfinished_ids(job_id.group)
             else:
-                job, queue = self.find_job(job_id)
+                group_job_ids = [job_id]
+
+            found = []
+            for job_id2 in group_job_ids:
+                job, queue = self.find_job(job_id2)
                 if job is not None:
-                    job = self.pop_job(job, queue)
-                    deleted_job_ids.append(job.job_id)
+                    found.append((job, queue))
+                elif self._is_array_member_waiting(job_id2):
+                    # the member was never made into a Job, so just mark it.  This
+                    # is done first so deleting the queued members doesn't line
+                    # these up
+                    self._forget_in_group(job_id2, JobStatus.Deleted)
+                    deleted_job_ids.append(job_id2)
+
+            for job, queue in found:
+                job = self.pop_job(job, queue)
+                deleted_job_ids.append(job.job_id)
 
         self.on_queue_change()
 
@@ -575,7 +1635,7 @@ class JobQueue(BaseModel):
         for job_id in list(self.running_jobs.keys()):
             job = self.running_jobs.pop(job_id)
             job.status = JobStatus.Deleted
-            self.completed_jobs[job_id] = job
+            self.add_completed(job)
 
     def resume(self, job_ids: list[JobID]) -> list[JobID]:
         """
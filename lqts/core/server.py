@@ -1,11 +1,21 @@
+import time
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 
 # from lqts.job_runner import run_command
+from lqts import metrics
+from lqts.admission import AdmissionController
+from lqts.autotune import WorkerAutotuner
 from lqts.core.config import Configuration, config
 from lqts.core.schema import JobQueue
+from lqts.fairshare import FairShare, parse_shares
+from lqts.history import JobHistory
 from lqts.mp_pool2 import DEFAULT_WORKERS, DynamicProcessPool
+from lqts.predictor import RuntimePredictor
+from lqts.py_workers import PythonWorkerPool
+from lqts.resources import ResourceManager, parse_counts
+from lqts.result_cache import ResultCache
 from lqts.simple_logging import Level, getLogger
 from lqts.version import VERSION
 
@@ -26,6 +36,8 @@ class Application(FastAPI):
 
         self._start_worker_pool(self.config.nworkers)
 
+        self._setup_metrics()
+
         self.log.info(f"Visit {self.config.url}/qstatus to view the queue status")
 
     def _configure(self):
@@ -51,9 +63,28 @@ class Application(FastAPI):
             name="default_queue",
             queue_file=self.config.queue_file,
             completed_limit=self.config.completed_limit,
+            array_threshold=self.config.array_threshold,
+            lease_ttl=self.config.lease_ttl,
+            lease_max_retries=self.config.lease_max_retries,
+            shortest_first=self.config.shortest_first,
+            priority_aging=self.config.priority_aging,
             config=self.config,
         )
+        self.queue.predictor = RuntimePredictor()
+        self.queue.fairshare = FairShare(
+            weight=self.config.fairshare_weight,
+            half_life_hours=self.config.fairshare_half_life_hours,
+            shares=parse_shares(self.config.fairshare_shares),
+        )
+        self.queue.resources = ResourceManager(parse_counts(self.config.resources))
+        if self.config.history_file:
+            self.queue.history = JobHistory(self.config.history_file)
+            # learn runtimes from the most recent jobs
+            self.queue.predictor.learn_from(
+                self.queue.history.query(limit=self.config.predictor_warmup, status="C")
+            )
         self.queue.load()
+        self.queue.predict_all()
         self.queue.start()
         self.log.info(f"Starting up LoQuTuS server - {VERSION}")
 
@@ -66,12 +97,69 @@ class Application(FastAPI):
             number of workers
         """
         self.pool = DynamicProcessPool(
-            queue=self.queue, max_workers=self.config.nworkers, feed_delay=0.05, manager_delay=2.0
+            queue=self.queue,
+            max_workers=self.config.nworkers,
+            feed_delay=0.05,
+            manager_delay=2.0,
+            use_launcher=self.config.use_launcher,
+            py_pool=PythonWorkerPool(
+                preload=self.config.py_preload,
+                max_tasks=self.config.py_worker_max_tasks,
+                max_memory_mb=self.config.py_worker_max_memory_mb,
+                prestart=self.config.py_worker_prestart,
+            ),
+            state_dir=self.config.state_dir if self.config.supervise else None,
+            result_cache=ResultCache(
+                self.config.cache_dir,
+                max_bytes=int(self.config.cache_max_mb * 2**20),
+                content_hash=self.config.cache_content_hash,
+            ),
+            admission=AdmissionController(
+                max_load=self.config.admit_max_load,
+                max_cpu_pressure=self.config.admit_max_cpu_pressure,
+                max_memory_pressure=self.config.admit_max_memory_pressure,
+                max_io_pressure=self.config.admit_max_io_pressure,
+                min_available_mb=self.config.admit_min_available_mb,
+                autoscale=self.config.admit_autoscale,
+            ),
+            autotuner=WorkerAutotuner(
+                min_workers=self.config.autotune_min_workers,
+                max_workers=self.config.autotune_max_workers or self.config.nworkers,
+                interval=self.config.autotune_interval,
+                hysteresis=self.config.autotune_hysteresis,
+                enabled=self.config.autotune,
+            ),
+            preempt_priority=self.config.preempt_priority,
         )
+        reattached = self.pool.reattach()
+        if reattached:
+            self.log.info(f"Found {len(reattached)} jobs started by a previous server")
         self.pool.start()
+        if not self.config.local_execution:
+            # jobs are only run by remote agents
+            self.pool.pause()
         self.log.info("Worker pool started with {} workers.".format(nworkers))
         self.log.info(f"Total number of CPUs available is {self.pool.CPUManager._system_cpu_count}.")
 
+    def _setup_metrics(self):
+        """
+        Registers the queue and pool gauges and times every request by the
+        route it matched, served at /metrics
+        """
+        metrics.REGISTRY.clear_collectors()
+        metrics.REGISTRY.add_collector(metrics.queue_collector(self.queue))
+        metrics.REGISTRY.add_collector(metrics.pool_collector(self.pool))
+
+        @self.middleware("http")
+        async def time_request(request: Request, call_next):
+            t0 = time.perf_counter()
+            response = await call_next(request)
+            route = request.scope.get("route")
+            metrics.HTTP_REQUESTS.observe(
+                time.perf_counter() - t0, request.method, getattr(route, "path", "unmatched")
+            )
+            return response
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -88,5 +176,5 @@ app = None
 def get_app():
     global app
     if app is None:
-        app = Application()
+        app = Application(lifespan=lifespan)
     return app
@@ -0,0 +1,170 @@
+"""
+fairshare Module
+================
+
+Tracks how many core-seconds each user, and each job group of a user, has used
+recently so the scheduler can interleave them instead of running whoever
+submitted first to completion.
+
+Usage decays exponentially with a half life (a day by default), so only recent
+usage counts.  A user's fair-share factor is
+
+    F = 2 ** -(usage fraction / share fraction)
+
+taken over the users that currently have jobs, so a user who has used exactly
+their share gets 0.5, an idle user 1 and a heavy user close to 0.  Within a user
+the job groups get equal shares and a factor of their own the same way.  The
+queue adds ``weight * F_user * F_group`` to each candidate's priority, so
+priorities that differ by more than *weight* are always honored.
+"""
+
+import math
+import threading
+from datetime import datetime
+
+from lqts.core.schema import Job
+
+
+def parse_shares(text: str) -> dict[str, float]:
+    """Parses "alice=2,bob=1" into {"alice": 2.0, "bob": 1.0}"""
+    shares = {}
+    for item in text.split(","):
+        user, sep, share = item.partition("=")
+        if sep:
+            shares[user.strip()] = float(share)
+    return shares
+
+
+class DecayingUsage:
+    """Core-seconds per key, decayed with a half life"""
+
+    def __init__(self, half_life: float):
+        self.half_life = half_life
+        self._values: dict = {}  # key -> (core-seconds, timestamp)
+
+    def add(self, key, core_seconds: float, now: float):
+        self._values[key] = (self.get(key, now) + core_seconds, now)
+
+    def get(self, key, now: float) -> float:
+        value, timestamp = self._values.get(key, (0.0, now))
+        if not value:
+            return 0.0
+        return value * 2 ** (-(now - timestamp) / self.half_life)
+
+    def items(self, now: float):
+        return [(key, self.get(key, now)) for key in list(self._values)]
+
+    def forget_below(self, threshold: float, now: float):
+        for key, value in self.items(now):
+            if value < threshold:
+                self._values.pop(key, None)
+
+
+class FairShare:
+    """
+    Parameters
+    ----------
+    weight: float
+        Priority points added for a factor of 1.  0 turns fair-share off (usage is
+        still tracked)
+    half_life_hours: float
+        Time for recorded usage to decay to half
+    shares: dict
+        Share of each user.  Users not listed have a share of 1
+    """
+
+    def __init__(self, weight: float = 5.0, half_life_hours: float = 24.0, shares: dict | None = None):
+        self.weight = weight
+        self.shares = shares or {}
+        self.users = DecayingUsage(half_life_hours * 3600)
+        self.groups = DecayingUsage(half_life_hours * 3600)  # keyed on (user, group)
+
+        self._charged_until: dict = {}  # job id -> time its usage was recorded up to
+        self._lock = threading.Lock()
+
+    def share(self, user: str) -> float:
+        return self.shares.get(user, 1.0)
+
+    def _charge(self, job: Job, until: datetime):
+        started = job.started
+        if isinstance(started, str):
+            started = datetime.fromisoformat(started)
+        if started is None:
+            return
+        since = max(self._charged_until.get(job.job_id, started), started)
+        seconds = (until - since).total_seconds()
+        if seconds > 0:
+            core_seconds = seconds * max(job.job_spec.cores, 1)
+            now = until.timestamp()
+            user = job.job_spec.user or ""
+            self.users.add(user, core_seconds, now)
+            self.groups.add((user, job.job_id.group), core_seconds, now)
+        self._charged_until[job.job_id] = until
+
+    def charge_running(self, running_jobs, now: datetime | None = None):
+        """Records the usage of running jobs since they were last charged"""
+        now = now or datetime.now()
+        with self._lock:
+            for job in list(running_jobs):
+                self._charge(job, now)
+
+    def charge_finished(self, job: Job):
+        """Records the rest of the usage of a job that has finished"""
+        completed = job.completed
+        if isinstance(completed, str):
+            completed = datetime.fromisoformat(completed)
+        with self._lock:
+            if job.started is not None and completed is not None:
+                self._charge(job, completed)
+            self._charged_until.pop(job.job_id, None)
+            # keep the tables from growing with long gone users and groups
+            if len(self.groups._values) > 1000:
+                now = datetime.now().timestamp()
+                self.groups.forget_below(1.0, now)
+                self.users.forget_below(1.0, now)
+
+    def factors(self, active: dict[str, set], now: datetime | None = None) -> dict[tuple, float]:
+        """
+        Fair-share factors (F_user * F_group) of the active users and groups.
+        *active* maps each user that has jobs to the groups they have jobs in.
+        """
+        now = (now or datetime.now()).timestamp()
+        with self._lock:
+            usage = {user: self.users.get(user, now) for user in active}
+            group_usage = {(user, group): self.groups.get((user, group), now) for user, groups in active.items() for group in groups}
+
+        total_usage = sum(usage.values())
+        total_share = sum(self.share(user) for user in active) or 1.0
+
+        factors = {}
+        for user, groups in active.items():
+            user_factor = _factor(usage[user], total_usage, self.share(user) / total_share)
+            for group in groups:
+                group_factor = _factor(group_usage[(user, group)], usage[user], 1 / len(groups))
+                factors[(user, group)] = user_factor * group_factor
+        return factors
+
+    def summary(self, active: dict[str, set], now: datetime | None = None) -> list[dict]:
+        """Share, decayed usage and factor of each user with jobs or recent usage"""
+        now_ts = (now or datetime.now()).timestamp()
+        with self._lock:
+            users = {user for user, value in self.users.items(now_ts) if value >= 1.0} | set(active)
+            usage = {user: self.users.get(user, now_ts) for user in users}
+
+        total_usage = sum(usage.values())
+        total_share = sum(self.share(user) for user in users) or 1.0
+        return [
+            {
+                "user": user,
+                "share": self.share(user),
+                "usage_core_hours": usage[user] / 3600,
+                "factor": _factor(usage[user], total_usage, self.share(user) / total_share),
+            }
+            for user in sorted(users)
+        ]
+
+
+def _factor(usage: float, total_usage: float, share_fraction: float) -> float:
+    if total_usage <= 0 or share_fraction <= 0:
+        return 1.0
+    return math.pow(2.0, -(usage / total_usage) / share_fraction)
@@ -0,0 +1,221 @@
+"""
+history Module
+==============
+
+Keeps every finished job in an SQLite database so the history reaches back
+further than the few completed jobs the queue holds in memory.
+
+Finished jobs are buffered and written in batches (when *batch_size* jobs are
+waiting, or when the queue's run loop calls *flush*).  The database runs in WAL
+mode, so ``qhist`` and the API can read it while the server writes to it.  It is
+indexed by group, status, completion time and command.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from lqts.core.schema import Job, JobStatus
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    grp         INTEGER,
+    idx         INTEGER,
+    status      TEXT,
+    priority    INTEGER,
+    cores       INTEGER,
+    command     TEXT,
+    working_dir TEXT,
+    agent       TEXT,
+    returncode  INTEGER,
+    submitted   TEXT,
+    started     TEXT,
+    completed   TEXT,
+    walltime    REAL,
+    job_json    TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_grp ON jobs (grp);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_completed ON jobs (completed);
+CREATE INDEX IF NOT EXISTS jobs_command ON jobs (command);
+"""
+
+# columns a summary can be grouped by
+SUMMARY_KEYS = {
+    "status": "status",
+    "group": "grp",
+    "command": "command",
+    "agent": "agent",
+    "day": "substr(completed, 1, 10)",
+}
+
+
+def _isoformat(value) -> str | None:
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+class JobHistory:
+    """
+    Parameters
+    ----------
+    db_file: str
+        The SQLite database file.  It is created if needed
+    batch_size: int
+        Number of finished jobs buffered before they are written
+    """
+
+    def __init__(self, db_file: str, batch_size: int = 200):
+        self.db_file = str(db_file)
+        self.batch_size = batch_size
+
+        self._pending: list[tuple[tuple, Job]] = []
+        self._lock = threading.Lock()
+
+        Path(self.db_file).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.db_file, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def add(self, job: Job):
+        """Queues a finished job to be written.  It is serialized when it is written"""
+        walltime = job.walltime
+        row = (
+            str(job.job_id),
+            job.job_id.group,
+            job.job_id.index,
+            job.status.value,
+            job.job_spec.priority,
+            job.job_spec.cores,
+            job.job_spec.command,
+            job.job_spec.working_dir,
+            job.agent,
+            job.returncode,
+            _isoformat(job.submitted),
+            _isoformat(job.started),
+            _isoformat(job.completed),
+            walltime.total_seconds() if walltime is not None else None,
+        )
+        with self._lock:
+            self._pending.append((row, job))
+            full = len(self._pending) >= self.batch_size
+
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Writes the queued jobs in one transaction"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if pending:
+                now = time.time()
+                rows = []
+                for row, job in pending:
+                    job.mark("persisted", now)
+                    rows.append(row + (job.model_dump_json(),))
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                    )
+
+    def _where(
+        self,
+        group: int | None = None,
+        status: str | None = None,
+        command: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> tuple[str, list]:
+        clauses, params = [], []
+        if group is not None:
+            clauses.append("grp = ?")
+            params.append(group)
+        if status:
+            clauses.append("status = ?")
+            params.append(parse_status(status).value)
+        if command:
+            clauses.append("command LIKE ?")
+            params.append(f"%{command}%")
+        if since is not None:
+            clauses.append("completed >= ?")
+            params.append(since.isoformat())
+        if until is not None:
+            clauses.append("completed < ?")
+            params.append(until.isoformat())
+
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        return where, params
+
+    def query(self, limit: int = 100, **filters) -> list[Job]:
+        """
+        Gets finished jobs, most recently completed first.  The filters are
+        *group*, *status*, *command* (a substring), *since* and *until*.
+        """
+        self.flush()
+        where, params = self._where(**filters)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT job_json FROM jobs{where} ORDER BY completed DESC LIMIT ?", params + [limit]
+            ).fetchall()
+        return [Job.model_validate_json(row[0]) for row in rows]
+
+    def get(self, job_id) -> Job | None:
+        """
+        Gets one finished job by its id, or None if it is not in the history.
+        Jobs waiting to be written are looked up in memory, without a flush.
+        """
+        key = str(job_id)
+        with self._lock:
+            for row, job in reversed(self._pending):
+                if row[0] == key:
+                    return job
+            row = self._db.execute("SELECT job_json FROM jobs WHERE job_id = ?", (key,)).fetchone()
+        return Job.model_validate_json(row[0]) if row else None
+
+    def summary(self, by: str = "status", **filters) -> list[dict]:
+        """
+        Counts the finished jobs and totals their walltimes, grouped *by* one of
+        status, group, command, agent or day.  Takes the same filters as *query*.
+        """
+        if by not in SUMMARY_KEYS:
+            raise ValueError(f"Can't summarize by {by}.  Choose from {', '.join(SUMMARY_KEYS)}")
+        key = SUMMARY_KEYS[by]
+        self.flush()
+        where, params = self._where(**filters)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {key}, COUNT(*), SUM(walltime), AVG(walltime), MIN(walltime), MAX(walltime) "
+                f"FROM jobs{where} GROUP BY {key} ORDER BY {key}",
+                params,
+            ).fetchall()
+
+        return [
+            {
+                by: value,
+                "count": count,
+                "total_walltime": total,
+                "mean_walltime": mean,
+                "min_walltime": minimum,
+                "max_walltime": maximum,
+            }
+            for value, count, total, mean, minimum, maximum in rows
+        ]
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._db.close()
+
+
+def parse_status(status: str) -> JobStatus:
+    """Accepts a status letter ("C") or name ("Completed")"""
+    for member in JobStatus:
+        if status in (member.value, member.name) or status.lower() == member.name.lower():
+            return member
+    raise ValueError(f"Unknown job status {status}")
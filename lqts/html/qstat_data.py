@@ -0,0 +1,131 @@
+"""
+qstat_data Module
+=================
+
+Serves the rows of the qstatus page's job table to DataTables' server-side
+processing, so the browser only ever holds one page of a large queue.
+
+The jobs, their search text and an ordering for each column that has been
+sorted on are built once per version of the queue (JobQueue.last_changed) and
+reused until the queue changes.  Recent search results are kept too.  Only the
+rows of the requested page are formatted, so walltimes of running jobs are
+always current.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from lqts.core.schema import Job, JobQueue, JobStatus
+
+STATUS_SORT_ORDER = {"R": 1, "P": 2, "Q": 3, "C": 4, "X": 5, "D": 6, "E": 7, "I": 8}
+
+COLUMNS = ["ID", "St", "Pr", "Command", "Walltime", "WorkingDir", "Deps", "Cmplt"]
+
+
+def _completed(job: Job) -> str:
+    completed = job.completed
+    if isinstance(completed, datetime):
+        return completed.isoformat()
+    return completed or ""
+
+
+# sort key of each column
+SORT_KEYS = [
+    lambda job: (job.job_id.group, job.job_id.index or 0),
+    lambda job: STATUS_SORT_ORDER.get(job.status.value, 9),
+    lambda job: job.job_spec.priority,
+    lambda job: job.job_spec.command,
+    lambda job: job.walltime.total_seconds(),
+    lambda job: job.job_spec.working_dir,
+    lambda job: " ".join(str(d) for d in job.job_spec.depends),
+    _completed,
+]
+
+
+def table_row(job: Job) -> list:
+    """The cells of a job's row, as shown in the table"""
+    return [str(item) for item in job.as_table_row()]
+
+
+class QstatTableData:
+    """
+    Parameters
+    ----------
+    max_searches: int
+        Number of filtered and sorted results kept for the current version
+    """
+
+    def __init__(self, max_searches: int = 16):
+        self.max_searches = max_searches
+        self._lock = threading.Lock()
+        self._version = None
+        self._jobs: list[Job] = []
+        self._text: list[str] = []  # lower case search text of each job
+        self._orders: dict = {}  # column -> job indices in ascending order
+        self._results: OrderedDict = OrderedDict()  # (search, column, descending) -> job indices
+        self.rebuilds = 0
+
+    def _refresh(self, queue: JobQueue, include_complete: bool):
+        version = (queue.last_changed, include_complete)
+        if version == self._version:
+            return
+
+        jobs = [job for job in queue.all_jobs if include_complete or job.status is not JobStatus.Completed]
+        jobs.sort(key=SORT_KEYS[0])
+        self._jobs = jobs
+        self._text = [" ".join(table_row(job)).lower() for job in jobs]
+        self._orders = {0: list(range(len(jobs)))}
+        self._results.clear()
+        self._version = version
+        self.rebuilds += 1
+
+    def _order(self, column: int) -> list[int]:
+        if column not in self._orders:
+            key = SORT_KEYS[column]
+            # sorted() is stable, so ties stay in job id order
+            self._orders[column] = sorted(range(len(self._jobs)), key=lambda i: key(self._jobs[i]))
+        return self._orders[column]
+
+    def _result(self, search: str, column: int, descending: bool) -> list[int]:
+        cache_key = (search, column, descending)
+        if cache_key in self._results:
+            self._results.move_to_end(cache_key)
+            return self._results[cache_key]
+
+        order = self._order(column)
+        if descending:
+            order = order[::-1]
+        if search:
+            words = search.lower().split()
+            order = [i for i in order if all(word in self._text[i] for word in words)]
+
+        self._results[cache_key] = order
+        while len(self._results) > self.max_searches:
+            self._results.popitem(last=False)
+        return order
+
+    def query(
+        self,
+        queue: JobQueue,
+        draw: int = 0,
+        start: int = 0,
+        length: int = 50,
+        search: str = "",
+        order_column: int = 1,
+        order_dir: str = "asc",
+        include_complete: bool = False,
+    ) -> dict:
+        """
+        Gets one page of the table in the form DataTables expects: the draw
+        counter echoed back, the total and filtered row counts and the rows
+        """
+        column = order_column if 0 <= order_column < len(SORT_KEYS) else 0
+        with self._lock:
+            self._refresh(queue, include_complete)
+            result = self._result(search.strip(), column, order_dir == "desc")
+            page = result[max(start, 0) :] if length < 0 else result[max(start, 0) : max(start, 0) + length]
+            rows = [table_row(self._jobs[i]) for i in page]
+            total = len(self._jobs)
+
+        return {"draw": draw, "recordsTotal": total, "recordsFiltered": len(result), "data": rows}
@@ -0,0 +1,76 @@
+"""
+qtop_data Module
+================
+
+The state of every core for the qtop view: the job it is assigned to, whether
+it is one of the pool's workers and how busy it is, grouped by socket and NUMA
+node.  The page renders it once and then updates the cells from the same data
+as JSON.
+"""
+
+from typing import Iterable
+
+from lqts.core.schema import Job
+
+BUSY_THRESHOLD = 0.5  # utilization above which a core counts as busy
+
+
+def core_owners(jobs: Iterable[Job]) -> dict[int, str]:
+    """The id of the job each core is assigned to.  Jobs on remote agents and suspended jobs hold none"""
+    owners = {}
+    for job in jobs:
+        if job.cores and not job.completed and job.agent is None and job.preempted is None:
+            for core in job.cores:
+                owners[core] = str(job.job_id)
+    return owners
+
+
+def qtop_snapshot(
+    jobs: Iterable[Job],
+    worker_cores: Iterable[int],
+    cpu_count: int,
+    topology: dict[int, tuple[int, int]],
+    utilization: dict[int, float],
+) -> dict:
+    """
+    Parameters
+    ----------
+    jobs: the running jobs
+    worker_cores: the cores the pool may run jobs on
+    cpu_count: the number of logical cpus in the machine
+    topology: (socket, NUMA node) of each cpu
+    utilization: busy fraction of each cpu
+
+    Returns
+    -------
+    {"groups": [{"socket", "node", "cores": [{"core", "job", "state", "utilization", "busy"}]}]}
+    where state is "job" (assigned to a job), "free" (a worker core without a
+    job) or "unused" (not one of the pool's cores)
+    """
+    owners = core_owners(jobs)
+    worker_cores = set(worker_cores)
+
+    groups: dict = {}
+    for core in range(cpu_count):
+        socket, node = topology.get(core, (0, 0))
+        if core in owners:
+            state = "job"
+        elif core in worker_cores:
+            state = "free"
+        else:
+            state = "unused"
+        busy = utilization.get(core)
+        groups.setdefault((socket, node), []).append(
+            {
+                "core": core,
+                "job": owners.get(core),
+                "state": state,
+                "utilization": None if busy is None else round(busy, 3),
+                "busy": busy is not None and busy >= BUSY_THRESHOLD,
+            }
+        )
+
+    return {
+        "cpu_count": cpu_count,
+        "groups": [{"socket": socket, "node": node, "cores": cores} for (socket, node), cores in sorted(groups.items())],
+    }
@@ -5,6 +5,9 @@ from jinja2 import Environment, PackageLoader, select_autoescape
 
 from lqts.core.schema import Job, JobID, JobSpec, JobStatus
 from lqts.core.server import app
+from lqts.html.qstat_data import COLUMNS
+from lqts.html.qtop_data import qtop_snapshot
+from lqts.topology import CpuUtilization, read_topology
 
 # import jinja2
 # import lqts.displaytable as dt
@@ -13,21 +16,30 @@ from lqts.core.server import app
 
 env = Environment(loader=PackageLoader("lqts", "html"), autoescape=select_autoescape(["html", "xml"]))
 
-STATUS_SORT_ORDER = {"R": 1, "P": 2, "Q": 3, "C": 4, "X": 5, "D": 6, "E": 7, "I": 8}
+# rendered fragments and the queue version they were rendered from
+_fragments: dict = {}
 
 
-def render_qstat_table(jobs: List[Job], include_complete: bool = False):
-    header = ["ID", "St", "Pr", "Command", "Walltime", "WorkingDir", "Deps", "Cmplt"]
-    rows = (
-        job.as_table_row()
-        for job in sorted(jobs, key=lambda job: STATUS_SORT_ORDER[job.status.value], reverse=True)
-        if include_complete or job.status is not JobStatus.Completed
-    )
+def cached_fragment(name: str, version, render) -> str:
+    """Calls *render* only if the fragment hasn't been rendered for *version* yet"""
+    entry = _fragments.get(name)
+    if entry is None or entry[0] != version:
+        entry = (version, render())
+        _fragments[name] = entry
+    return entry[1]
+
+
+def render_qstat_table(jobs: List[Job] = None, include_complete: bool = False):
+    """
+    Renders the job table without rows.  DataTables fetches the rows a page at a
+    time from /page_fragments/qstat_data.
+    """
 
-    table_template = env.get_template("table_template.jinja")
-    table_text = table_template.render(header=header, rows=rows)
+    def render():
+        table_template = env.get_template("table_template.jinja")
+        return table_template.render(header=COLUMNS, rows=[])
 
-    return table_text
+    return cached_fragment("qstat_table", None, render)
 
 
 def render_qstat_table_only(include_complete: bool = False):
@@ -36,69 +48,60 @@ def render_qstat_table_only(include_complete: bool = False):
     return render_qstat_table(jobs, include_complete=include_complete)
 
 
-def render_qtop_table(jobs: List[Job]):
+utilization = CpuUtilization()
+_topology: dict = {}
+
+
+def qtop_data() -> dict:
+    """The state of every core and of the named resources, for the qtop view"""
+    cpu_count = app.pool.CPUManager._system_cpu_count
+    if len(_topology) != cpu_count:
+        _topology.update(read_topology(cpu_count))
+
+    snapshot = qtop_snapshot(
+        list(app.queue.running_jobs.values()),
+        list(app.pool.CPUManager.processors.keys()),
+        cpu_count,
+        _topology,
+        utilization.sample(),
+    )
+    snapshot["resources"] = app.queue.resource_status()
+    return snapshot
+
+
+def render_qtop_table() -> str:
     """
-    Renders a table showing which processor cores are being used
+    Renders the cores grouped by socket and NUMA node, each showing the job it
+    is assigned to and how busy it is, and a table of the named resources and
+    their holders.  The page keeps it up to date from /page_fragments/qtop_data.
     """
-    proc_map = {}
-    for job in jobs:
-        if (job.cores) and (not job.completed):
-            for core in job.cores:
-                proc_map[core] = job
-                # print(job.job_id, core)
-
-    # print(
-    #     list(app.pool.CPUManager.processors.keys()), len(app.pool.CPUManager.processors)
-    # )
-    rows = []
-    for i in range(0, 8):
-        if len(rows) * 8 >= app.pool.CPUManager._system_cpu_count:
-            break
-        row = []
-        for j in range(0, 8):
-            proc = i * 8 + j
-            if proc in proc_map:
-                job: Job = proc_map[proc]
-                row.append(str(job.job_id))
-            # elif proc in (0, 1):
-            #     row.append("#")  # do not use first two processors ever
-            elif proc >= app.pool.CPUManager._system_cpu_count:
-                row.append("#")  # these are none existing cpus
-                # print(f"    #  {proc},{i}. {j}")
-            elif proc not in app.pool.CPUManager.processors.keys():
-                # print(f"    {proc},{i}. {j}")
-                row.append("-")  # existing cpus not being used as workers
-            else:
-                row.append("")
-        rows.append(row)
-
     table_template = env.get_template("qtop.jinja")
-    table_text = table_template.render(rows=rows)
+    return table_template.render(snapshot=qtop_data())
 
-    return table_text
 
+def render_summary() -> str:
+    def render():
+        c = Counter([job.status.value for job in app.queue.all_jobs])
+        for letter in "QDRC":
+            if letter not in c:
+                c[letter] = 0
+        return "  ".join(f"{s}:{c}" for s, c in c.items())
 
-def render_qstat_page(include_complete: bool = False):
-    jobs = app.queue.all_jobs
+    return cached_fragment("summary", app.queue.last_changed, render)
 
+
+def render_qstat_page(include_complete: bool = False):
     page_template = env.get_template("page_template.jinja")
     buttonbar = env.get_template("button_bar.jinja").render(workercount=app.pool.max_workers)
-    script_block = env.get_template("js_script_template.jinja").render()
-
-    c = Counter([job.status.value for job in jobs])
-    for letter in "QDRC":
-        if letter not in c:
-            c[letter] = 0
-
-    summary_text = "  ".join(f"{s}:{c}" for s, c in c.items())
+    script_block = env.get_template("js_script_template.jinja").render(complete="yes" if include_complete else "no")
 
     page_text = page_template.render(
         page_title="Queue Status",
         navbar="",
         buttonbar=buttonbar,
-        summary=summary_text,
-        qstat_table=render_qstat_table(jobs, include_complete),
-        qtop_table=render_qtop_table(jobs),
+        summary=render_summary(),
+        qstat_table=render_qstat_table(include_complete=include_complete),
+        qtop_table=render_qtop_table(),
         script_block=script_block,
     )
 
@@ -0,0 +1,264 @@
+"""
+launcher Module
+===============
+
+The launcher is a small helper process that starts job processes on behalf of
+the server.  Forking the server itself is comparatively expensive because the
+server has FastAPI, pydantic and jinja loaded, and after the fork the parent still
+has to call nice, ionice and cpu_affinity on the new process.
+
+The helper only imports the standard library (and psutil for ionice).  It runs
+at low priority itself and pins itself to a job's cores just before starting it,
+so the job process inherits its working directory, cpu affinity and priority
+when it is created rather than having them changed after it is already running.
+The job writes its output straight into its log file.
+
+Requests and replies are single lines of JSON sent over the helper's stdin/stdout:
+
+    request:  {"id": 1, "command": [...], "cwd": "...", "cores": [0, 1],
+               "env": {...}, "log_file": "..."}
+    reply:    {"id": 1, "pid": 12345}  or  {"id": 1, "error": "...", "errno": 2}
+    event:    {"event": "exit", "pid": 12345, "returncode": 0}
+
+The helper reaps its children and reports their exit codes, so the server sees
+them disappear exactly as it would for processes it started itself.
+"""
+
+import json
+import os
+import select
+import shlex
+import subprocess
+import sys
+import threading
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+LAUNCHER_NICE = 10
+
+ALL_CORES = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+
+
+class LauncherError(RuntimeError):
+    pass
+
+
+def _lower_priority():
+    """
+    Lowers the helper's own priority.  Job processes inherit it, so they start
+    out at low priority without any calls after they are running.
+    """
+    os.nice(LAUNCHER_NICE)
+    if psutil is not None and psutil.LINUX:
+        try:
+            psutil.Process().ionice(psutil.IOPRIO_CLASS_BE, value=5)
+        except Exception:
+            pass
+
+
+def _spawn(request: dict, children: dict) -> dict:
+    """
+    Starts one job.  The helper pins itself to the job's cores first so the
+    child inherits the affinity from the moment it is created, which lets
+    subprocess use its fast vfork path instead of a preexec function.
+    """
+    reply = {"id": request.get("id")}
+
+    cores = request.get("cores") or ALL_CORES
+    os.sched_setaffinity(0, cores)
+
+    log_file = request.get("log_file")
+    if log_file:
+        output = open(log_file, "ab", buffering=0)
+    else:
+        output = subprocess.DEVNULL
+
+    try:
+        p = subprocess.Popen(
+            request["command"],
+            cwd=request["cwd"],
+            env={**os.environ, **request["env"]} if request.get("env") else None,
+            stdin=subprocess.DEVNULL,
+            stdout=output,
+            stderr=subprocess.STDOUT,
+        )
+        children[p.pid] = p
+        reply["pid"] = p.pid
+    except OSError as ex:
+        reply["error"] = str(ex)
+        reply["errno"] = ex.errno
+    finally:
+        if log_file:
+            output.close()
+
+    return reply
+
+
+def _write(message: dict):
+    os.write(1, (json.dumps(message) + "\n").encode())
+
+
+def _reap(children: dict):
+    """Reports the exit codes of any children that have finished"""
+    for pid, p in list(children.items()):
+        returncode = p.poll()
+        if returncode is not None:
+            children.pop(pid)
+            _write({"event": "exit", "pid": pid, "returncode": returncode})
+
+
+def serve(poll_interval: float = 0.02):
+    """
+    The helper's main loop.  Reads spawn requests from stdin and reaps children
+    until stdin is closed.
+    """
+    _lower_priority()
+
+    children: dict[int, subprocess.Popen] = {}
+    buffer = b""
+    while True:
+        ready, _, _ = select.select([0], [], [], poll_interval)
+        if ready:
+            data = os.read(0, 65536)
+            if not data:
+                break
+            buffer += data
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                if line.strip():
+                    _write(_spawn(json.loads(line), children))
+        _reap(children)
+
+
+class Launcher:
+    """
+    Server side handle for the launcher helper process.
+
+    Call *spawn* to start a job process.  It blocks until the helper reports the
+    new pid.  Exit codes reported by the helper are available from *returncode*.
+    """
+
+    def __init__(self):
+        self._proc: subprocess.Popen = None
+        self._reader: threading.Thread = None
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._replies: dict[int, dict] = {}
+        self._waiting: dict[int, threading.Event] = {}
+        self._returncodes: dict[int, int] = {}
+
+    def start(self):
+        """Starts the helper process"""
+        self._proc = subprocess.Popen(
+            [sys.executable, "-m", "lqts.launcher"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        self._reader = threading.Thread(target=self._read_replies, daemon=True)
+        self._reader.start()
+        return self
+
+    def is_alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def _read_replies(self):
+        for line in self._proc.stdout:
+            message = json.loads(line)
+            if message.get("event") == "exit":
+                self._returncodes[message["pid"]] = message["returncode"]
+            else:
+                self._replies[message["id"]] = message
+                event = self._waiting.pop(message["id"], None)
+                if event is not None:
+                    event.set()
+
+        # the helper went away - release anyone still waiting
+        for event in list(self._waiting.values()):
+            event.set()
+
+    def spawn(
+        self,
+        command: str | list,
+        cwd: str,
+        cores: list | None = None,
+        env: dict | None = None,
+        log_file: str | None = None,
+        timeout: float = 30.0,
+    ) -> int:
+        """
+        Starts *command* in *cwd* pinned to *cores*.  The variables in *env* are
+        added to the helper's environment.  Output is appended to *log_file* (or
+        discarded).
+
+        Returns
+        -------
+        pid: int
+            The process id of the new job process
+
+        Raises
+        ------
+        FileNotFoundError
+            If the command could not be found
+        LauncherError
+            If the helper is not running or the process could not be started
+        """
+        if not self.is_alive():
+            raise LauncherError("The launcher process is not running")
+
+        if isinstance(command, str):
+            command = shlex.split(command.strip())
+
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            event = threading.Event()
+            self._waiting[request_id] = event
+
+            request = {
+                "id": request_id,
+                "command": command,
+                "cwd": cwd,
+                "cores": list(cores) if cores else [],
+                "env": env,
+                "log_file": log_file,
+            }
+            self._proc.stdin.write((json.dumps(request) + "\n").encode())
+            self._proc.stdin.flush()
+
+        if not event.wait(timeout):
+            self._waiting.pop(request_id, None)
+            raise LauncherError(f"Timed out waiting for the launcher to start {command}")
+
+        reply = self._replies.pop(request_id, None)
+        if reply is None:
+            raise LauncherError("The launcher process exited")
+        elif "error" in reply:
+            if reply.get("errno") == 2:
+                raise FileNotFoundError(reply["error"])
+            raise LauncherError(reply["error"])
+
+        return reply["pid"]
+
+    def returncode(self, pid: int) -> int | None:
+        """Gets the exit code of a finished process, or None if it hasn't exited"""
+        return self._returncodes.get(pid)
+
+    def forget(self, pid: int):
+        """Discards the exit code of a process that has been cleaned up"""
+        self._returncodes.pop(pid, None)
+
+    def shutdown(self):
+        """Stops the helper.  Job processes that are still running are not affected"""
+        if self._proc is not None:
+            try:
+                self._proc.stdin.close()
+                self._proc.wait(timeout=5)
+            except Exception:
+                self._proc.kill()
+
+
+if __name__ == "__main__":
+    serve()
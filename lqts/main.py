@@ -1,6 +1,6 @@
 import lqts.environment
 from lqts.core.server import get_app
-from lqts.api import api_v1
+from lqts.api import api_v1, debug
 from lqts.views import views_v1
 
 
@@ -0,0 +1,269 @@
+"""
+metrics Module
+==============
+
+Counters and histograms of the scheduler and worker pool, served at /metrics in
+the Prometheus text format so they can be scraped or just read with curl.
+
+The instruments are module level, like prometheus_client's default registry.
+The queue and the pool update them as jobs move through, without taking a
+lock: a counter is one dict update and a histogram one bucket increment.  Two
+threads updating the same series at the same instant can lose one of the
+increments, which doesn't matter for graphs.  Values that are cheaper to read
+than to track (queue depth, cores in use, cache and admission statistics) are
+gathered when the metrics are rendered by collectors the server registers.
+"""
+
+import math
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+# seconds, from a scheduling decision to a day long job
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600, 14400, 86400)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    items = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        items.append(extra)
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A total that only goes up, optionally split by labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        # a series without labels is there from the start, at 0
+        self._values: dict[tuple, float] = {} if self.labels else {(): 0}
+
+    def inc(self, amount: float = 1, *label_values):
+        key = tuple(str(label) for label in label_values)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(tuple(str(label) for label in label_values), 0)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram:
+    """Counts of observations in cumulative buckets, with their sum and count"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label values: a count for each bucket plus +Inf, then the sum
+        self._series: dict[tuple, list] = {}
+        if not self.labels:
+            self._new_series(())
+
+    def _new_series(self, key: tuple) -> list:
+        return self._series.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+
+    def observe(self, value: float, *label_values):
+        key = tuple(str(label) for label in label_values)
+        series = self._series.get(key)
+        if series is None:
+            series = self._new_series(key)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *label_values) -> int:
+        series = self._series.get(tuple(str(label) for label in label_values))
+        return sum(series[:-1]) if series else 0
+
+    def sum(self, *label_values) -> float:
+        series = self._series.get(tuple(str(label) for label in label_values))
+        return series[-1] if series else 0.0
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, series in sorted(self._series.items()):
+            series = list(series)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series[:-1]):
+                cumulative += count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    A value that can go up and down.  It is either set as things change or,
+    returned by a collector, made with its current values when the metrics are
+    rendered.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), values: dict | float | None = None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        if values is None:
+            values = {}
+        elif not isinstance(values, dict):
+            values = {(): values}
+        self._values = {(key if isinstance(key, tuple) else (key,)): value for key, value in values.items()}
+
+    def set(self, value: float, *label_values):
+        self._values[tuple(str(label) for label in label_values)] = value
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class CounterValue(Gauge):
+    """A total kept by something else, like the result cache's hit count, read by a collector"""
+
+    kind = "counter"
+
+
+class Registry:
+    def __init__(self):
+        self._instruments: dict[str, Counter | Histogram | Gauge] = {}
+        self._collectors: list[Callable[[], Iterable]] = []
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self._instruments.setdefault(name, Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._instruments.setdefault(name, Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, labels: Iterable[str] = ()) -> Gauge:
+        return self._instruments.setdefault(name, Gauge(name, help, labels))
+
+    def add_collector(self, collector: Callable[[], Iterable]):
+        """*collector* returns metrics (usually Gauges) each time the metrics are rendered"""
+        self._collectors.append(collector)
+
+    def clear_collectors(self):
+        self._collectors.clear()
+
+    def render(self) -> str:
+        """All the metrics in the Prometheus text exposition format"""
+        metrics = list(self._instruments.values())
+        for collector in self._collectors:
+            try:
+                metrics.extend(collector())
+            except Exception:
+                # a broken collector shouldn't take down the rest of the metrics
+                pass
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+JOBS_SUBMITTED = REGISTRY.counter("lqts_jobs_submitted_total", "Jobs submitted to the queue")
+JOBS_DISPATCHED = REGISTRY.counter("lqts_jobs_dispatched_total", "Jobs started")
+JOBS_COMPLETED = REGISTRY.counter("lqts_jobs_completed_total", "Jobs finished, by final status", ["status"])
+JOB_WAIT = REGISTRY.histogram("lqts_job_wait_seconds", "Time from submission to start")
+JOB_RUNTIME = REGISTRY.histogram("lqts_job_runtime_seconds", "Time from start to completion")
+JOB_REAP = REGISTRY.histogram(
+    "lqts_job_reap_seconds", "Time from a job's process being seen to exit to the pool freeing its cores"
+)
+QUEUE_SAVE = REGISTRY.histogram("lqts_queue_save_seconds", "Time taken to write the queue file")
+QUEUE_FILE_BYTES = REGISTRY.gauge("lqts_queue_file_bytes", "Size of the queue file when it was last written")
+HTTP_REQUESTS = REGISTRY.histogram(
+    "lqts_http_request_seconds", "Time taken to answer API and web requests", ["method", "route"]
+)
+
+
+def queue_collector(queue) -> Callable[[], list]:
+    """Gauges of the queue: jobs by status"""
+
+    def collect():
+        depth: dict[str, int] = {}
+        for jobs in (queue.running_jobs, queue.queued_jobs, queue.completed_jobs):
+            for job in list(jobs.values()):
+                depth[job.status.value] = depth.get(job.status.value, 0) + 1
+        pending = sum(array.pending_count() for array in list(queue.array_groups.values()))
+        if pending:
+            depth["Q"] = depth.get("Q", 0) + pending
+        return [Gauge("lqts_jobs", "Jobs in the queue, by status", ["status"], depth)]
+
+    return collect
+
+
+def pool_collector(pool) -> Callable[[], list]:
+    """Gauges of the pool: workers, cores, result cache and admission control"""
+
+    def collect():
+        busy = pool.busy_cores()
+        metrics = [
+            Gauge("lqts_workers", "Number of cores the pool may run jobs on", values=pool.max_workers),
+            Gauge(
+                "lqts_cores",
+                "Worker cores, by whether a job holds them",
+                ["state"],
+                {"allocated": busy, "idle": max(pool.max_workers - busy, 0)},
+            ),
+        ]
+
+        if pool.result_cache is not None:
+            stats = pool.result_cache.stats()
+            metrics += [
+                CounterValue(f"lqts_result_cache_{name}_total", f"Result cache {name}", values=stats[name])
+                for name in ("hits", "misses", "stores", "evictions")
+            ]
+            metrics += [
+                Gauge("lqts_result_cache_entries", "Results in the cache", values=stats["entries"]),
+                Gauge("lqts_result_cache_bytes", "Size of the cached results", values=stats["size_bytes"]),
+            ]
+
+        if pool.admission is not None:
+            admission = pool.admission.metrics()
+            metrics += [
+                Gauge("lqts_admission_holding", "1 while job starts are held back", values=int(admission["holding"])),
+                CounterValue("lqts_admission_admitted_total", "Job starts allowed", values=admission["admitted"]),
+                CounterValue("lqts_admission_held_total", "Job starts held back", values=admission["held"]),
+                CounterValue(
+                    "lqts_admission_held_seconds_total", "Time spent holding job starts", values=admission["held_seconds"]
+                ),
+                Gauge(
+                    "lqts_admission_reading",
+                    "Latest load, pressure and memory readings",
+                    ["reading"],
+                    {name: value for name, value in admission["readings"].items() if value is not None},
+                ),
+            ]
+        return metrics
+
+    return collect
@@ -11,9 +11,12 @@ job can also be tracked.
 
 """
 
+import json
 import multiprocessing as mp
 import os
+import shlex
 import subprocess
+import sys
 import threading
 import time
 
@@ -21,18 +24,48 @@ import time
 from dataclasses import dataclass
 from datetime import datetime
 
-# from pathlib import Path
+from pathlib import Path
 from textwrap import dedent
 
 import psutil
 
+from lqts import metrics
 from lqts.core.schema import Job, JobID, JobQueue, JobStatus
-from lqts.resources import CPUResourceManager
+from lqts.launcher import Launcher
+from lqts.profiling import timed
+from lqts.py_workers import PythonWorker, PythonWorkerPool
+from lqts.resources import CPUResourceManager, pin_process, thread_environment
+from lqts.supervisor import is_supervisor, read_state, start_supervisor, write_state
 from lqts.version import VERSION
 
 DEFAULT_WORKERS = max(mp.cpu_count() - 2, 1)
 
 
+def split_command(command: str) -> str | list[str]:
+    """
+    Windows takes the command line as a string.  Elsewhere it has to be split
+    into arguments because the command is not run through a shell.
+    """
+    if psutil.WINDOWS:
+        return command
+    else:
+        return shlex.split(command.strip())
+
+
+def log_path(job_spec) -> str | None:
+    """The job's log file, with a relative path taken from its working directory"""
+    if not job_spec.log_file:
+        return None
+    return os.path.join(job_spec.working_dir, job_spec.log_file)
+
+
+def _started(job: Job) -> float:
+    started = job.started
+    if isinstance(started, str):
+        started = datetime.fromisoformat(started)
+    return started.timestamp() if started is not None else time.time()
+
+
 @dataclass
 class WorkItem:
     """
@@ -41,25 +74,45 @@ class WorkItem:
         * cores: list of cpu cores assigned to this job
         * process: the process (in the system or cpu sense of the word) that the job executes as
         * logfile: handle to the logfile for writing
+        * launcher: optional launcher helper used to start the process
+        * preempted_cores: the cores the job had while it is suspended by preemption
     """
 
     job: Job
     cores: list = None
+    preempted_cores: list = None
 
     mark: int = 0
+    log_size: int = None  # size of the log file when the process started, for noticing its first output
 
     process: psutil.Process = None
 
+    launcher: Launcher = None
+
     logfile = None  # file handle
 
     _logging_thread = None
 
+    @property
+    def log_file(self) -> str | None:
+        return log_path(self.job.job_spec)
+
+    def environment(self) -> dict:
+        """
+        Gets the variables added to the job's environment: thread counts matched
+        to the assigned cores, LQTS_JOB_ID, LQTS_CORES and the job spec's own env
+        """
+        job_spec = self.job.job_spec
+        return thread_environment(self.job.job_id, self.cores, job_spec.threads, job_spec.env)
+
     def start_logging(self):
         """
         Opens the log file and writes the job header
         """
-        if self.job.job_spec.log_file:
-            self.logfile = open(self.job.job_spec.log_file, "w")
+        if self.log_file:
+            self.logfile = open(self.log_file, "w")
+
+            environment = "\n".join(f"    {key}={value}" for key, value in sorted(self.environment().items()))
 
             header = dedent(
                 f"""
@@ -70,76 +123,119 @@ class WorkItem:
                 WorkDir: {self.job.job_spec.working_dir}
                 Command: {self.job.job_spec.command}
                 Started: {self.job.started.isoformat()}
-                -----------------------------------------------
-
+                Environment:
                 """
             )
+            header += environment + "\n-----------------------------------------------\n\n"
 
             self.logfile.write(header)
+            self.logfile.flush()
 
     def start(self):
         """
         Starts the job.  The follow steps take place:
-            1. Change directory to the job's working dir
+            1. Change directory to the job's working dir (the launcher is
+               given the working dir instead, so the server's stays put)
             2. Optionally start logging
             3. Start the process
             4. Set the process priority low so desktop systems stay reponsive
             5. Set the cpu affinity for the process to the assigned cores
         """
 
-        # ================================================
-        # 1. Change directory to the job's working dir
-        # ================================================
-        os.chdir(self.job.job_spec.working_dir)
-
         self.job.started = datetime.now()
 
-        if self.job.job_spec.log_file:
+        if self.log_file:
             # ================================================
             # 2. Optionally start logging
             # ================================================
             self.start_logging()
 
         try:
+            if self.launcher is not None:
+                # ================================================
+                # 3-5. The launcher sets the priority and affinity in the
+                #      child before exec and logs straight to the log file
+                # ================================================
+                self._start_with_launcher()
+                return
+
+            # ================================================
+            # 1. Change directory to the job's working dir
+            # ================================================
+            os.chdir(self.job.job_spec.working_dir)
+
             # ================================================
             # 3. Start the process
             # ================================================
             self.process = psutil.Popen(
-                self.job.job_spec.command,
+                split_command(self.job.job_spec.command),
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 shell=False,
+                env={**os.environ, **self.environment()},
             )
 
             # ================================================
-            # 4. Set the process priority low so desktop systems stay reponsive
-            # ================================================
-            if psutil.WINDOWS:
-                self.process.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
-                self.process.ionice(psutil.IOPRIO_LOW)
-            elif psutil.LINUX:
-                self.process.nice(10)
-                self.process.ionice(psutil.IOPRIO_CLASS_BE, value=5)
-
-            # ================================================
-            # 5. Set the cpu affinity for the process to the assigned cores
+            # 4-5. Set the process priority and cpu affinity
             # ================================================
-            # Set the cpu affinity for the job so it doesn't hop all over the place
-            # This is very helpful on large core systems
-            self.process.cpu_affinity(self.cores)
+            self.set_priority_and_affinity()
             self.job.cores = self.cores
 
             self._logging_thread = threading.Thread(target=self.get_output)
             self._logging_thread.start()
 
         except FileNotFoundError:
-            self.logfile.write("\nERROR: Command not found.  Ensure the command is an executable file.\n")
-            self.logfile.write("Make sure you give the full path to the file or " "that it is on your system path.\n\n")
+            if self.log_file:
+                if self.logfile is None or self.logfile.closed:
+                    self.logfile = open(self.log_file, "a")
+                self.logfile.write("\nERROR: Command not found.  Ensure the command is an executable file.\n")
+                self.logfile.write("Make sure you give the full path to the file or " "that it is on your system path.\n\n")
             # ================================================
             # Flag the job as completed with an error status
             self.job.completed = datetime.now()
             self.job.status = JobStatus.Error
 
+    def set_priority_and_affinity(self):
+        """
+        Sets the priority of the process low and pins it to the assigned cores
+        """
+        # ================================================
+        # 4. Set the process priority low so desktop systems stay reponsive
+        # ================================================
+        if psutil.WINDOWS:
+            self.process.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
+            self.process.ionice(psutil.IOPRIO_LOW)
+        elif psutil.LINUX:
+            self.process.nice(10)
+            self.process.ionice(psutil.IOPRIO_CLASS_BE, value=5)
+
+        # ================================================
+        # 5. Set the cpu affinity for the process to the assigned cores
+        # ================================================
+        # Set the cpu affinity for the job so it doesn't hop all over the place
+        # This is very helpful on large core systems
+        self.process.cpu_affinity(self.cores)
+
+    def _start_with_launcher(self):
+        """
+        Starts the process through the launcher helper.  The child appends its
+        output to the log file itself, so no logging thread is needed.
+        """
+        if self.logfile is not None:
+            self.logfile.close()
+            self.logfile = None
+        self.watch_log_file()
+
+        pid = self.launcher.spawn(
+            self.job.job_spec.command,
+            cwd=self.job.job_spec.working_dir,
+            cores=self.cores,
+            env=self.environment(),
+            log_file=self.log_file,
+        )
+        self.process = psutil.Process(pid)
+        self.job.cores = self.cores
+
     def get_status(self) -> JobStatus:
         """
         Get the status of this work item
@@ -151,6 +247,8 @@ class WorkItem:
             JobStatus.WalltimeExceeded,
         ):
             try:
+                if self.has_exited():
+                    raise psutil.NoSuchProcess(self.process.pid)
                 # If we can query the process status, it is a live and running
                 status = self.process.status()
                 self.job.status = JobStatus.Running
@@ -166,21 +264,65 @@ class WorkItem:
 
         return self.job.status
 
+    def has_exited(self) -> bool:
+        """
+        Checks for an exit code.  A child that has exited stays around as a zombie
+        on POSIX systems until it is waited on, so its status alone can't be trusted.
+        """
+        if self.launcher is not None:
+            # the launcher reaps the process and reports its exit code
+            returncode = self.launcher.returncode(self.process.pid)
+        elif isinstance(self.process, psutil.Popen):
+            returncode = self.process.poll()
+        else:
+            return False
+
+        if returncode is None:
+            return False
+
+        self.job.returncode = returncode
+        return True
+
     def is_running(self) -> bool:
         """
         Convienience method to tell if job status is JobStatus.Running
         """
         return self.get_status() == JobStatus.Running
 
+    def watch_log_file(self):
+        """Notes the size of the log file before the process writes to it itself"""
+        if self.log_file:
+            try:
+                self.log_size = os.path.getsize(self.log_file)
+            except OSError:
+                self.log_size = 0
+
+    def check_output(self):
+        """
+        Records when the log file first grows past its header, for jobs whose
+        process writes to it directly
+        """
+        if self.log_size is None or "first_output" in self.job.phases:
+            return
+        try:
+            if os.path.getsize(self.log_file) > self.log_size:
+                self.job.mark("first_output")
+        except OSError:
+            pass
+
     def get_output(self):
         """
         Reads some output from the process and writes it to the logfile
         """
         # print(f"Work item logging jobid= {self.job.job_id}")
-        time.sleep(5)
         try:
             while True:
-                line = self.process.stdout.read(64)
+                # read1 returns what is there rather than waiting for a full block
+                line = self.process.stdout.read1(64)
+                if not line:
+                    break
+                if "first_output" not in self.job.phases:
+                    self.job.mark("first_output")
                 # line += self.process.stderr.read(256)
                 line = line.decode().replace("\r", "").replace("\n\n", "\n")
                 # print(f"{line=}")
@@ -200,7 +342,7 @@ class WorkItem:
 
         self.job.completed = datetime.now()
 
-        if not self.job.job_spec.log_file:
+        if not self.log_file:
             return
 
         footer = dedent(
@@ -216,12 +358,19 @@ class WorkItem:
         )
 
         try:
+            if self.logfile is None or self.logfile.closed:
+                # the launcher's child has been writing to the log file
+                self.logfile = open(self.log_file, "a")
+
             self.logfile.write(footer)
 
             self.logfile.close()
         except:
             pass
 
+        if self.launcher is not None and self.process is not None:
+            self.launcher.forget(self.process.pid)
+
     def kill(self, new_status):
         """
         Kill this job and set its status to deleted
@@ -233,6 +382,401 @@ class WorkItem:
             except psutil.NoSuchProcess:
                 self.job.status = new_status
 
+    @property
+    def jobs_in_item(self) -> list[Job]:
+        """The jobs this work item is running"""
+        return [self.job]
+
+    def processes(self) -> list[psutil.Process]:
+        """The job's processes: the one that was started and its children"""
+        if self.process is None:
+            return []
+        try:
+            return [self.process] + self.process.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return []
+
+    def suspend(self):
+        """
+        Stops the job's processes (SIGSTOP on POSIX) and gives up its cores.
+        They keep their memory and pick up where they were when resumed.
+        """
+        for process in self.processes():
+            try:
+                process.suspend()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        self.preempted_cores, self.cores = self.cores, []
+
+    def resume(self, cores: list):
+        """Pins the job's processes to *cores* and continues them (SIGCONT)"""
+        self.cores = cores
+        self.preempted_cores = None
+        for process in self.processes():
+            try:
+                pin_process(process, cores)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, AttributeError):
+                pass
+            try:
+                process.resume()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+
+
+@dataclass
+class PackedWorkItem(WorkItem):
+    """
+    A PackedWorkItem runs a chunk of jobs from one job group back to back in a
+    single long-lived runner process (see lqts.pack_runner) occupying one worker
+    slot.  The runner streams back when each job starts and finishes, so every
+    job keeps its own status, timings and exit code.
+        * jobs: the jobs in the chunk, in the order they are run
+    """
+
+    jobs: list = None
+
+    _events: list = None
+    _jobs_by_id: dict = None
+    _killed: bool = False
+
+    def start(self):
+        """
+        Starts the runner process and hands it the chunk of jobs
+        """
+        self._events = []
+        self._jobs_by_id = {str(job.job_id): job for job in self.jobs}
+
+        for job in self.jobs:
+            job.started = datetime.now()
+            job.cores = self.cores
+
+        self.process = psutil.Popen(
+            [sys.executable, "-m", "lqts.pack_runner"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        self.set_priority_and_affinity()
+
+        # Read the events before writing the commands so a large chunk can't
+        # fill up both pipes and deadlock
+        self._logging_thread = threading.Thread(target=self.get_output, daemon=True)
+        self._logging_thread.start()
+
+        for job in self.jobs:
+            task = {
+                "job_id": str(job.job_id),
+                "command": job.job_spec.command,
+                "working_dir": job.job_spec.working_dir,
+                "log_file": log_path(job.job_spec),
+                "walltime": job.job_spec.walltime,
+                "env": thread_environment(job.job_id, self.cores, job.job_spec.threads, job.job_spec.env),
+            }
+            self.process.stdin.write(json.dumps(task) + "\n")
+        # stdin stays open for skipping deleted jobs
+        self.process.stdin.write(json.dumps({"end": True}) + "\n")
+        self.process.stdin.flush()
+
+    def skip(self, job_id: JobID) -> bool:
+        """
+        Drops a job from the chunk.  The runner kills it if it is running and
+        otherwise never starts it.  The rest of the chunk carries on.  Returns
+        False if the job isn't an unfinished job of this chunk.
+        """
+        if self._jobs_by_id.pop(str(job_id), None) is None:
+            return False
+        try:
+            self.process.stdin.write(json.dumps({"skip": str(job_id)}) + "\n")
+            self.process.stdin.flush()
+        except (OSError, ValueError):
+            # the runner has already finished
+            pass
+        return True
+
+    def get_output(self):
+        """
+        Collects the events written by the runner
+        """
+        for line in self.process.stdout:
+            self._events.append(json.loads(line))
+
+    def finished_jobs(self) -> list[Job]:
+        """
+        Applies the events received from the runner so far and returns the jobs
+        that have finished since the last call.
+        """
+        finished = []
+        while self._events:
+            event = self._events.pop(0)
+            job = self._jobs_by_id.get(event["job_id"])
+            if job is None:
+                continue
+
+            if event["event"] == "started":
+                job.started = datetime.fromisoformat(event["time"])
+                job.mark("spawned", job.started.timestamp())
+            elif event["event"] == "done":
+                job.started = datetime.fromisoformat(event["started"])
+                job.completed = datetime.fromisoformat(event["completed"])
+                job.mark("exited", job.completed.timestamp())
+                job.returncode = event["returncode"]
+                if event["walltime_exceeded"]:
+                    job.status = JobStatus.WalltimeExceeded
+                elif job.returncode == 0:
+                    job.status = JobStatus.Completed
+                else:
+                    job.status = JobStatus.Error
+                self._jobs_by_id.pop(event["job_id"])
+                finished.append(job)
+
+        return finished
+
+    def unfinished_jobs(self) -> list[Job]:
+        """Jobs in the chunk that the runner has not reported as done"""
+        return list(self._jobs_by_id.values())
+
+    @property
+    def jobs_in_item(self) -> list[Job]:
+        return self.unfinished_jobs()
+
+    def get_status(self) -> JobStatus:
+        """
+        The chunk is running until the runner has exited and all of its events
+        have been read
+        """
+        if self._killed:
+            return JobStatus.Deleted
+
+        if self.process.poll() is None or self._logging_thread.is_alive():
+            return JobStatus.Running
+        else:
+            return JobStatus.Completed
+
+    def clean_up(self):
+        """
+        Jobs the runner never finished (because it was killed or died) are
+        flagged with an error
+        """
+        for job in self.unfinished_jobs():
+            if job.status == JobStatus.Running:
+                job.status = JobStatus.Error
+            job.completed = datetime.now()
+        try:
+            self.process.stdin.close()
+        except (OSError, ValueError):
+            pass
+
+    def kill(self, new_status):
+        """
+        Kill the runner and the job it is running.  Jobs in the chunk that
+        haven't finished get *new_status*
+        """
+        for process in reversed(self.processes()):
+            try:
+                process.kill()
+            except psutil.NoSuchProcess:
+                pass
+        self._killed = True
+        for job in self.unfinished_jobs():
+            job.status = new_status
+
+
+@dataclass
+class FunctionWorkItem(WorkItem):
+    """
+    A FunctionWorkItem runs a function job (JobSpec.function) in a warm python
+    worker from a PythonWorkerPool.  The worker is pinned to the assigned cores
+    for as long as it runs the job.
+        * py_pool: the pool the worker is borrowed from
+    """
+
+    py_pool: PythonWorkerPool = None
+
+    worker: PythonWorker = None
+
+    def start(self):
+        """
+        Borrows a worker, pins it to the assigned cores and sends it the job
+        """
+        self.job.started = datetime.now()
+
+        if self.log_file:
+            self.start_logging()
+            # the worker appends the function's output to the log file
+            self.logfile.close()
+            self.logfile = None
+            self.watch_log_file()
+
+        self.worker = self.py_pool.acquire()
+        self.process = self.worker.process
+        self.set_priority_and_affinity()
+        # threads started by preloaded modules or earlier jobs keep their own
+        # affinity, so pin every thread of the worker
+        pin_process(self.process, self.cores)
+        self.job.cores = self.cores
+
+        job_spec = self.job.job_spec
+        self.worker.submit(
+            {
+                "function": job_spec.function,
+                "args": job_spec.function_args,
+                "kwargs": job_spec.function_kwargs,
+                "pickle": job_spec.function_pickle,
+                "working_dir": job_spec.working_dir,
+                "log_file": self.log_file,
+                "env": self.environment(),
+            }
+        )
+
+    def get_status(self) -> JobStatus:
+        """
+        The job is running until the worker replies
+        """
+        if self.job.status not in (
+            JobStatus.Error,
+            JobStatus.Deleted,
+            JobStatus.Completed,
+            JobStatus.WalltimeExceeded,
+        ):
+            if not self.worker.is_done():
+                self.job.status = JobStatus.Running
+            elif self.worker.reply["ok"]:
+                self.job.status = JobStatus.Completed
+                self.job.returncode = 0
+            else:
+                self.job.status = JobStatus.Error
+                self.job.returncode = 1
+
+        if self.job.job_spec.walltime is not None and self.job.status == JobStatus.Running:
+            if self.job.walltime.total_seconds() > self.job.job_spec.walltime:
+                print(f"Walltime exceeded for job {self.job.job_id} - {self.job.job_spec.walltime}")
+                self.kill(JobStatus.WalltimeExceeded)
+
+        return self.job.status
+
+    def clean_up(self):
+        """
+        Writes the log footer and gives the worker back to the pool
+        """
+        super().clean_up()
+
+        if self.worker is not None:
+            self.py_pool.release(self.worker)
+            self.worker = None
+
+    def kill(self, new_status):
+        """
+        A running function can't be interrupted, so the worker is killed.  The
+        pool starts a fresh one when it is needed.
+        """
+        if self.worker is not None:
+            self.worker.kill()
+        self.job.status = new_status
+
+
+@dataclass
+class SupervisedWorkItem(WorkItem):
+    """
+    A SupervisedWorkItem runs its job under a detached supervisor process (see
+    lqts.supervisor) that keeps going if the server stops.  The supervisor owns
+    the log file after the header and records the job's pid and exit code in a
+    state file, which lets a restarted server reattach to the job.
+        * state_dir: directory holding the state files
+    """
+
+    state_dir: str = None
+
+    @property
+    def state_file(self) -> Path:
+        return Path(self.state_dir) / f"{self.job.job_id}.json"
+
+    def start(self):
+        """
+        Writes the log header and state file, then starts the supervisor
+        """
+        self.job.started = datetime.now()
+        self.job.cores = self.cores
+
+        if self.log_file:
+            self.start_logging()
+            self.logfile.close()
+            self.logfile = None
+            self.watch_log_file()
+
+        Path(self.state_dir).mkdir(parents=True, exist_ok=True)
+        write_state(
+            self.state_file,
+            {
+                "job": self.job.model_dump(mode="json"),
+                "command": self.job.job_spec.command,
+                "cwd": self.job.job_spec.working_dir,
+                "env": self.environment(),
+                "cores": self.cores,
+                "log_file": self.log_file,
+            },
+        )
+        self.process = start_supervisor(self.state_file)
+
+    def has_exited(self) -> bool:
+        """
+        The supervisor records the exit code.  If it went away without doing so
+        the job is treated as finished with an unknown exit code.
+        """
+        state = read_state(self.state_file)
+        if "returncode" in state:
+            self.job.returncode = state["returncode"]
+            return True
+
+        if isinstance(self.process, psutil.Popen):
+            return self.process.poll() is not None
+        else:
+            # reattached after a restart, so the supervisor isn't our child
+            return not is_supervisor(self.process.pid)
+
+    def clean_up(self):
+        """
+        The supervisor has already written the log footer, so this only records
+        the completion time and removes the state file
+        """
+        state = read_state(self.state_file)
+        if "completed" in state:
+            self.job.completed = datetime.fromisoformat(state["completed"])
+        else:
+            self.job.completed = datetime.now()
+
+        self.state_file.unlink(missing_ok=True)
+
+    def processes(self) -> list[psutil.Process]:
+        """
+        The job's process and its children.  The supervisor is left running so
+        it can still record the exit code.
+        """
+        pid = read_state(self.state_file).get("pid")
+        if not pid:
+            return []
+        try:
+            process = psutil.Process(pid)
+            return [process] + process.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return []
+
+    def kill(self, new_status):
+        """
+        Kills the job process and removes its state file, so the job isn't
+        picked up again after a restart.  The supervisor then stops.
+        """
+        state = read_state(self.state_file)
+        self.state_file.unlink(missing_ok=True)
+        try:
+            if state.get("pid"):
+                psutil.Process(state["pid"]).kill()
+            elif self.process is not None:
+                self.process.kill()
+        except psutil.NoSuchProcess:
+            pass
+        self.job.status = new_status
+
 
 @dataclass
 class Event:
@@ -264,10 +808,19 @@ class DynamicProcessPool:
         max_workers: int = DEFAULT_WORKERS,
         feed_delay: float = 0.0,
         manager_delay: float = 1.0,
+        use_launcher: bool = False,
+        py_pool: PythonWorkerPool = None,
+        state_dir: str = None,
+        result_cache=None,
+        admission=None,
+        autotuner=None,
+        preempt_priority: int = 0,
     ):
         self.job_queue: JobQueue = queue
 
         self.CPUManager = CPUResourceManager(min(max(max_workers, 1), mp.cpu_count() - 1))
+        # the worker count asked for.  Autoscaling may run fewer
+        self._worker_limit = self.CPUManager.cpu_count
 
         self.feed_delay = feed_delay  # delay between subsequent job start ups
 
@@ -291,6 +844,34 @@ class DynamicProcessPool:
         self.__paused: bool = False
         self.__manager_thread = None
 
+        # Warm python interpreters for function jobs, started when first needed
+        self.py_pool: PythonWorkerPool = py_pool
+
+        # Directory for the state files of supervised jobs.  If set, command jobs
+        # run under detached supervisors and survive a server restart.
+        self.state_dir = state_dir
+
+        # Optional lqts.result_cache.ResultCache for jobs submitted with caching on
+        self.result_cache = result_cache
+        self._cache_keys: dict[JobID, str] = {}
+
+        # Optional lqts.admission.AdmissionController that holds job starts while
+        # the machine is busy with other work
+        self.admission = admission
+
+        # Optional lqts.autotune.WorkerAutotuner that looks for the worker count
+        # that finishes the most work
+        self.autotuner = autotuner
+
+        # Jobs of at least this priority that don't fit suspend running jobs of
+        # lower priority and take their cores.  0 turns preemption off.
+        self.preempt_priority = preempt_priority
+
+        # Optional helper process that starts jobs (POSIX only)
+        self.launcher: Launcher = None
+        if use_launcher and os.name == "posix":
+            self.launcher = Launcher().start()
+
     @property
     def max_workers(self) -> int:
         return self.CPUManager.cpu_count
@@ -314,10 +895,12 @@ class DynamicProcessPool:
         more_capacity = max_workers > self.max_workers
         if max_workers is not None:
             self.CPUManager.resize(max_workers)
+            self._worker_limit = self.CPUManager.cpu_count
 
             if more_capacity:
                 self.feed_queue()
 
+    @timed("process_completions")
     def process_completions(self, timeout=2.0):
         """
         Handles getting the results when a job is done and cleaning up
@@ -334,9 +917,21 @@ class DynamicProcessPool:
 
         # see if any results are available
         for job_id, work_item in list(self._work_items.items()):
+            if work_item.preempted_cores is not None:
+                # suspended, it is looked at again once it is resumed
+                continue
+
+            if isinstance(work_item, PackedWorkItem):
+                self._process_packed_completions(job_id, work_item)
+                continue
+
+            work_item.check_output()
+
             if not work_item.is_running():
                 # the work_item has completed
                 work_item.mark += 1
+                if "exited" not in work_item.job.phases:
+                    work_item.job.mark("exited")
                 if work_item.mark > 1:
                     # clean it up
                     work_item.clean_up()
@@ -344,10 +939,122 @@ class DynamicProcessPool:
                     self.CPUManager.free_processors(work_item.cores)
 
                     job = work_item.job
+                    job.mark("reaped")
+                    metrics.JOB_REAP.observe(job.phases["reaped"] - job.phases["exited"])
 
                     self.log.info("Got result {} = {}".format(job.job_id, job))
+                    self._store_in_cache(job)
                     self.job_queue.on_job_finished(job)
                     self._work_items.pop(job_id)
+                    if self.autotuner is not None:
+                        self.autotuner.record(job)
+
+    def _complete_from_cache(self, job: Job) -> bool:
+        """
+        Completes *job* from the result cache if an identical run is cached.
+        On a miss the key is kept so the results can be stored when the job is
+        done.  A job is only looked up the first time it is picked, so one
+        waiting for cores or admission doesn't have its inputs hashed again on
+        every pass.
+        """
+        if job.job_id in self._cache_keys:
+            return False
+
+        try:
+            key = self.result_cache.key(job.job_spec)
+            hit = self.result_cache.restore(key, job.job_spec)
+        except Exception:
+            return False
+
+        if not hit:
+            self._cache_keys[job.job_id] = key
+            return False
+
+        self.job_queue.on_job_started(job)
+        job.status = JobStatus.Completed
+        job.returncode = 0
+        job.cached = True
+        job.completed = datetime.now()
+        self.job_queue.on_job_finished(job)
+        return True
+
+    def _store_in_cache(self, job: Job):
+        """Saves the results of a successful cacheable job"""
+        key = self._cache_keys.pop(job.job_id, None)
+        if key is None or job.status != JobStatus.Completed or job.returncode != 0:
+            return
+        try:
+            self.result_cache.store(key, job.job_spec)
+        except Exception:
+            pass
+
+    def _process_packed_completions(self, job_id: JobID, work_item: PackedWorkItem):
+        """
+        Reports the jobs of a packed work item as they finish.  The runner tells
+        us when each one is done, so no second look is needed.
+        """
+        running = work_item.is_running()
+
+        for job in work_item.finished_jobs():
+            job.mark("reaped")
+            metrics.JOB_REAP.observe(max(job.phases["reaped"] - job.phases["exited"], 0.0))
+            self.job_queue.on_job_finished(job)
+            if self.autotuner is not None:
+                self.autotuner.record(job)
+
+        if not running:
+            work_item.clean_up()
+            for job in work_item.unfinished_jobs():
+                self.job_queue.on_job_finished(job)
+            self.CPUManager.free_processors(work_item.cores)
+            self._work_items.pop(job_id)
+
+    def reattach(self) -> list[JobID]:
+        """
+        Picks up the supervised jobs that were running when the server last
+        stopped.  Jobs that are still running get their cores back and are
+        tracked as usual.  Jobs that finished while the server was down are
+        completed right away.  Returns the ids of the jobs found.
+        """
+        if not self.state_dir or not Path(self.state_dir).exists():
+            return []
+
+        found = []
+        for state_file in sorted(Path(self.state_dir).glob("*.json")):
+            state = read_state(state_file)
+            if "job" not in state:
+                continue
+
+            job = Job.model_validate(state["job"])
+            job.status = JobStatus.Running
+            for field in ("submitted", "started"):
+                if isinstance(getattr(job, field), str):
+                    setattr(job, field, datetime.fromisoformat(getattr(job, field)))
+            # the saved queue lists the job as waiting, so move it back to running
+            self.job_queue.queued_jobs.pop(job.job_id, None)
+            self.job_queue.running_jobs[job.job_id] = job
+            self.job_queue.next_group_number = max(self.job_queue.next_group_number, job.job_id.group + 1)
+            found.append(job.job_id)
+
+            work_item = SupervisedWorkItem(job=job, cores=state.get("cores") or [], state_dir=self.state_dir)
+            supervisor_pid = state.get("supervisor_pid")
+            if "returncode" not in state and is_supervisor(supervisor_pid):
+                work_item.process = psutil.Process(supervisor_pid)
+                self.CPUManager.reserve_processors(work_item.cores)
+                self.job_queue.allocate_resources(job, force=True)
+                # it may have been suspended by preemption when the server stopped
+                work_item.resume(work_item.cores)
+                self._work_items[job.job_id] = work_item
+                self.log.info(f"Reattached to running job {job.job_id}")
+            else:
+                work_item.has_exited()
+                work_item.clean_up()
+                job.status = JobStatus.Completed
+                self.job_queue.on_job_finished(job)
+                self.log.info(f"Job {job.job_id} finished while the server was down")
+
+        self.job_queue.on_queue_change()
+        return found
 
     def get_log_output(self):
         """
@@ -369,42 +1076,216 @@ class DynamicProcessPool:
                 print(f"-->Getting output {work_item.job.job_id}")
                 work_item.get_output()
 
+    def submit_packed_jobs(self, jobs: list[Job], cores: list) -> tuple[bool, WorkItem]:
+        """Start a chunk of jobs running back to back in one slot of the pool"""
+
+        work_item = PackedWorkItem(job=jobs[0], jobs=jobs, cores=cores)
+        try:
+            work_item.start()
+
+            for job in jobs:
+                self.job_queue.on_job_started(job)
+
+            return True, work_item
+        except Exception as ex:
+            self.log.error(f"Error starting packed jobs {jobs[0].job_id} - {jobs[-1].job_id}: {ex!r}")
+            self._abandon(work_item)
+            return False, None
+
     def submit_one_job(self, job: Job, cores: list) -> tuple[bool, WorkItem]:
         """Start one job running in the pool"""
 
-        try:
-            work_item = WorkItem(job=job, cores=cores)
+        if job.job_spec.function:
+            if self.py_pool is None:
+                self.py_pool = PythonWorkerPool()
+            work_item = FunctionWorkItem(job=job, cores=cores, py_pool=self.py_pool)
+        elif self.state_dir:
+            work_item = SupervisedWorkItem(job=job, cores=cores, state_dir=self.state_dir)
+        else:
+            work_item = WorkItem(job=job, cores=cores, launcher=self.launcher)
 
+        try:
             work_item.start()
+            job.mark("spawned")
 
             self.job_queue.on_job_started(job)
 
             return True, work_item
+        except Exception as ex:
+            self.log.error(f"Error starting job {job.job_id}: {ex!r}")
+            self._abandon(work_item)
+            return False, None
+
+    def _abandon(self, work_item: WorkItem):
+        """Stops whatever a work item that failed to start got running"""
+        try:
+            work_item.kill(new_status=JobStatus.Error)
+            work_item.clean_up()
         except Exception:
-            print(f"Error starting job {work_item.job.job_id}")
-            self.kill_job(work_item.job.job_id)
+            pass
 
+    def busy_cores(self) -> int:
+        """Number of cores in use by jobs"""
+        return self.CPUManager.cpu_count - self.CPUManager.cpu_avalaible_count()
+
+    def autoscale(self):
+        """Lets the admission controller shrink or grow the worker count with the load on the machine"""
+        if self.admission is None:
+            return
+        target = self.admission.target_workers(self.CPUManager.cpu_count, self._worker_limit, self.busy_cores())
+        if target != self.CPUManager.cpu_count:
+            self.CPUManager.resize(target)
+
+    def autotune(self):
+        """Lets the autotuner move the worker count towards the one that finishes the most work"""
+        if self.autotuner is None:
+            return
+        saturated = len(self.job_queue.queued_jobs) > 0
+        target = self.autotuner.update(self.max_workers, saturated)
+        if target != self.max_workers:
+            self.resize(target)
+
+    def is_urgent(self, job: Job) -> bool:
+        """True if *job* may preempt running jobs"""
+        return bool(self.preempt_priority) and job.job_spec.priority >= self.preempt_priority
+
+    def select_victims(self, job: Job) -> list[WorkItem] | None:
+        """
+        Picks the running jobs to suspend so *job* fits, or None if suspending
+        every running job of lower priority isn't enough.  Jobs of the lowest
+        priority that started most recently go first: they have done the least
+        work that is put on hold.  Jobs picked along the way that turn out not
+        to be needed are left running.
+        """
+        needed = job.job_spec.cores - self.CPUManager.cpu_avalaible_count()
+        candidates = [
+            work_item
+            for work_item in self._work_items.values()
+            if work_item.preempted_cores is None
+            and work_item.cores
+            and work_item.job.job_spec.priority < job.job_spec.priority
+        ]
+        candidates.sort(key=lambda work_item: (work_item.job.job_spec.priority, -_started(work_item.job)))
+
+        victims, freed = [], 0
+        for work_item in candidates:
+            if freed >= needed:
+                break
+            victims.append(work_item)
+            freed += len(work_item.cores)
+        if freed < needed:
+            return None
+
+        for work_item in reversed(list(victims)):
+            if freed - len(work_item.cores) >= needed:
+                victims.remove(work_item)
+                freed -= len(work_item.cores)
+        return victims
+
+    def preempt(self, job: Job) -> bool:
+        """
+        Suspends lower priority jobs to free enough cores for the urgent *job*.
+        Returns False if *job* isn't urgent or can't be made to fit.
+        """
+        if not self.is_urgent(job):
+            return False
+        victims = self.select_victims(job)
+        if not victims:
+            return False
+
+        for work_item in victims:
+            cores = work_item.cores
+            work_item.suspend()
+            self.CPUManager.free_processors(cores)
+            for victim in work_item.jobs_in_item:
+                self.job_queue.on_job_preempted(victim, by=job.job_id)
+        return True
+
+    def resume_preempted(self):
+        """
+        Continues suspended jobs, highest priority first, as cores free up.  They
+        go ahead of queued jobs, except urgent ones of higher priority.
+        """
+        preempted = [work_item for work_item in self._work_items.values() if work_item.preempted_cores is not None]
+        if not preempted:
+            return
+
+        waiting = self.job_queue.next_job()
+        preempted.sort(key=lambda work_item: (-work_item.job.job_spec.priority, _started(work_item.job)))
+        for work_item in preempted:
+            if waiting is not None and self.is_urgent(waiting) and waiting.job_spec.priority > work_item.job.job_spec.priority:
+                break
+            some_available, cores = self.CPUManager.get_processors(
+                count=len(work_item.preempted_cores), prefer=work_item.preempted_cores
+            )
+            if not some_available:
+                break
+            work_item.resume(cores)
+            for job in work_item.jobs_in_item:
+                self.job_queue.on_job_resumed(job, cores)
+
+    @timed("feed_queue")
     def feed_queue(self):
         """
         Starts up jobs while there are jobs in the queue and there are workers
         available.
         """
 
+        self.resume_preempted()
+
         while len(self.job_queue.queued_jobs) > 0:
             job = self.job_queue.next_job()
 
             if job is None:
                 # no jobs available
                 break
+            job.mark("selected")
+
+            if job.job_spec.cache and self.result_cache is not None and self._complete_from_cache(job):
+                continue
+
+            if self.admission is not None and not self.admission.admit(self.busy_cores()):
+                # the machine is busy with other work
+                break
 
             some_available, cores = self.CPUManager.get_processors(count=job.job_spec.cores)
 
+            if not some_available and self.preempt(job):
+                some_available, cores = self.CPUManager.get_processors(count=job.job_spec.cores)
+
             if not some_available:
                 # not enough cores are available to run this job
                 break
 
+            if not self.job_queue.allocate_resources(job):
+                # its resources were taken since it was picked
+                self.CPUManager.free_processors(cores)
+                break
+
             # while there is work to do and workers available, start up new jobs
-            job_was_submitted, work_item = self.submit_one_job(job, cores)
+            job.mark("allocated")
+            jobs = [job]
+            if job.job_spec.pack > 1:
+                jobs = self.job_queue.next_pack(job)
+                for packed_job in jobs[1:]:
+                    packed_job.mark("selected", job.phases["selected"])
+                    packed_job.mark("allocated", job.phases["allocated"])
+                job_was_submitted, work_item = self.submit_packed_jobs(jobs, cores)
+            else:
+                job_was_submitted, work_item = self.submit_one_job(job, cores)
+
+            if work_item is None:
+                self.CPUManager.free_processors(cores)
+                for unstarted_job in jobs:
+                    if unstarted_job.job_id in self.job_queue.queued_jobs:
+                        self.job_queue.release_resources(unstarted_job.job_id)
+                        # flag it like a command that can't be found, so it isn't retried on every pass
+                        self.job_queue.on_job_started(unstarted_job)
+                        unstarted_job.status = JobStatus.Error
+                        unstarted_job.completed = datetime.now()
+                        self.job_queue.on_job_finished(unstarted_job)
+                break
+
             self._work_items[job.job_id] = work_item
 
             if job_was_submitted:
@@ -418,6 +1299,16 @@ class DynamicProcessPool:
     def unpause(self):
         self.__paused = False
 
+    def find_work_item(self, job_id: JobID) -> WorkItem | None:
+        """The work item running *job_id*, which may be one job of a packed chunk"""
+        work_item = self._work_items.get(job_id)
+        if work_item is not None:
+            return work_item
+        for work_item in list(self._work_items.values()):
+            if isinstance(work_item, PackedWorkItem) and str(job_id) in work_item._jobs_by_id:
+                return work_item
+        return None
+
     def kill_job(self, job_id_to_kill, kill_all=False, kill_due_to_error=False) -> int:
         """
         Kills the job with ID *job_id_to_kill*
@@ -432,20 +1323,38 @@ class DynamicProcessPool:
             True if the job was found and killed, False is the job was not found.
         """
 
+        new_status = JobStatus.Error if kill_due_to_error else JobStatus.Deleted
+
         if kill_all:
             job_ids_to_kill = list(self._work_items.keys())
         else:
+            work_item = self.find_work_item(job_id_to_kill)
+            if work_item is None:
+                return False
+            if isinstance(work_item, PackedWorkItem):
+                # only this job of the chunk, the runner carries on with the rest
+                job = work_item._jobs_by_id.get(str(job_id_to_kill))
+                if job is not None and work_item.skip(job_id_to_kill):
+                    job.status = new_status
+                    print(f"killing running job {job_id_to_kill}")
+                    return True
+                return False
             job_ids_to_kill = [job_id_to_kill]
 
         killed_jobs = []
         for jid in job_ids_to_kill:
             try:
                 work_item = self._work_items.pop(jid)
-                if kill_due_to_error:
-                    work_item.kill(new_status=JobStatus.Error)
-                else:
-                    work_item.kill(new_status=JobStatus.Deleted)
+                if work_item.preempted_cores is not None:
+                    # continue the suspended processes so none are left stopped
+                    work_item.resume([])
+                work_item.kill(new_status=new_status)
                 print(f"killing running job {jid}")
+                if isinstance(work_item, PackedWorkItem):
+                    # killing everything, so the rest of the chunk goes down with the runner
+                    for job in work_item.unfinished_jobs():
+                        job.completed = datetime.now()
+                        self.job_queue.on_job_finished(job)
                 self.CPUManager.free_processors(work_item.cores)
                 killed_jobs.append(jid)
             except psutil.NoSuchProcess:
@@ -469,6 +1378,10 @@ class DynamicProcessPool:
                 if self.__exiting:
                     if len(self._work_items) == 0:
                         # we are done
+                        if self.launcher is not None:
+                            self.launcher.shutdown()
+                        if self.py_pool is not None:
+                            self.py_pool.shutdown()
                         return
                     else:
                         # we still have some clean up to do
@@ -481,6 +1394,8 @@ class DynamicProcessPool:
                 else:
                     # start up new jobs
                     try:
+                        self.autotune()
+                        self.autoscale()
                         self.feed_queue()
                     except Exception:
                         print("Server error")
@@ -511,9 +1426,19 @@ class DynamicProcessPool:
         self.__exiting = True
 
         if not wait:
-            for work_item in self._work_items.values():
+            for job_id, work_item in list(self._work_items.items()):
+                if isinstance(work_item, SupervisedWorkItem):
+                    # leave it running.  The next server will reattach to it
+                    self._work_items.pop(job_id)
+                    continue
                 # kill running jobs
-                work_item.kill()
+                work_item.kill(JobStatus.Deleted)
+
+            if self.launcher is not None:
+                self.launcher.shutdown()
+
+            if self.py_pool is not None:
+                self.py_pool.shutdown()
 
     def start(self) -> threading.Thread:
         """
@@ -524,7 +1449,7 @@ class DynamicProcessPool:
         t: threading.Thread
             The management thread
         """
-        t = threading.Thread(target=self._runloop)
+        t = threading.Thread(target=self._runloop, name="lqts-pool")
         t.start()
         self.__manager_thread = t
         return t
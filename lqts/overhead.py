@@ -0,0 +1,93 @@
+"""
+overhead Module
+===============
+
+Breaks the times recorded in Job.phases into the intervals between them and
+sums them up per job group, to show where the time between submitting a job
+and having its results on record goes.
+
+Some intervals are the job itself (running) or waiting for others (dependencies,
+free cores).  The rest are the scheduler's own overhead: picking the job and
+giving it cores, starting its process, noticing it has finished and recording
+it.
+"""
+
+from typing import Iterable
+
+from lqts.core.schema import Job
+
+# (name, from phase, to phase)
+INTERVALS = (
+    ("dependency_wait", "submitted", "ready"),
+    ("queue_wait", "ready", "selected"),
+    ("allocation", "selected", "allocated"),
+    ("spawn", "allocated", "spawned"),
+    ("dispatch", "selected", "spawned"),  # allocation and spawn together
+    ("first_output", "spawned", "first_output"),
+    ("run", "spawned", "exited"),
+    ("reap", "exited", "reaped"),
+    ("persist", "reaped", "persisted"),
+)
+
+# the intervals that are time spent by LQTS rather than by or for the job
+OVERHEAD_INTERVALS = ("allocation", "spawn", "reap", "persist")
+
+
+def job_intervals(job: Job) -> dict[str, float]:
+    """Seconds spent in each interval whose two phases the job has reached"""
+    phases = job.phases
+    return {
+        name: max(phases[end] - phases[start], 0.0)
+        for name, start, end in INTERVALS
+        if start in phases and end in phases
+    }
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted *values*"""
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def _stats(values: list[float]) -> dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": _percentile(values, 0.5),
+        "p95": _percentile(values, 0.95),
+        "max": values[-1],
+    }
+
+
+def overhead_report(jobs: Iterable[Job], by_group: bool = True) -> list[dict]:
+    """
+    For each job group: the number of jobs, count/mean/p50/p95/max seconds of
+    each interval, and the scheduler overhead (the sum of OVERHEAD_INTERVALS)
+    per job.  Without *by_group* all the jobs are reported together, as group
+    None.
+    """
+    groups: dict[int, dict] = {}
+    for job in jobs:
+        intervals = job_intervals(job)
+        key = job.job_id.group if by_group else None
+        group = groups.setdefault(key, {"jobs": 0, "intervals": {}, "overhead": []})
+        group["jobs"] += 1
+        for name, seconds in intervals.items():
+            group["intervals"].setdefault(name, []).append(seconds)
+        overhead = [intervals[name] for name in OVERHEAD_INTERVALS if name in intervals]
+        if overhead:
+            group["overhead"].append(sum(overhead))
+
+    report = []
+    for group_number, group in sorted(groups.items(), key=lambda item: item[0] or 0):
+        report.append(
+            {
+                "group": group_number,
+                "jobs": group["jobs"],
+                "intervals": {
+                    name: _stats(group["intervals"][name]) for name, *_ in INTERVALS if name in group["intervals"]
+                },
+                "overhead": _stats(group["overhead"]) if group["overhead"] else None,
+            }
+        )
+    return report
@@ -0,0 +1,147 @@
+"""
+pack_runner Module
+==================
+
+Runs a chunk of short commands back to back in a single process.  This is used
+for job groups submitted with packing turned on (e.g. ``qsub-argfile --pack 100``),
+where starting a separate process, logging thread and log header for every
+command would take longer than the commands themselves.
+
+The server writes one JSON line per command to the runner's stdin:
+
+    {"job_id": "12.003", "command": "...", "working_dir": "...",
+     "log_file": null, "walltime": null, "env": {"OMP_NUM_THREADS": "1", ...}}
+
+followed by ``{"end": true}`` once the whole chunk has been written.  The
+server keeps stdin open after that, so it can still skip a job of the chunk
+that was deleted:
+
+    {"skip": "12.005"}
+
+A skipped job that hasn't started is never run, and one that is running is
+killed.  The runner writes one JSON line per event to its stdout:
+
+    {"job_id": "12.003", "event": "started", "time": "..."}
+    {"job_id": "12.003", "event": "done", "returncode": 0,
+     "started": "...", "completed": "...", "walltime_exceeded": false}
+    {"job_id": "12.005", "event": "skipped"}
+"""
+
+import json
+import os
+import queue
+import shlex
+import subprocess
+import sys
+import threading
+from datetime import datetime
+
+
+def _split(command: str):
+    if sys.platform == "win32":
+        return command.strip()
+    else:
+        return shlex.split(command.strip())
+
+
+def _emit(message: dict):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+class Runner:
+    """
+    Runs the tasks in the order they were written, while a thread reads stdin
+    so skip messages are seen as soon as they arrive
+    """
+
+    def __init__(self):
+        self.tasks = queue.Queue()
+        self.skipped = set()
+        self.current = None  # (job id, process) of the running task
+        self._lock = threading.Lock()
+
+    def read(self, stream):
+        for line in stream:
+            if not line.strip():
+                continue
+            message = json.loads(line)
+            if "skip" in message:
+                self.skip(message["skip"])
+            elif message.get("end"):
+                self.tasks.put(None)
+            else:
+                self.tasks.put(message)
+        # stdin closed without an end message
+        self.tasks.put(None)
+
+    def skip(self, job_id: str):
+        with self._lock:
+            self.skipped.add(job_id)
+            if self.current is not None and self.current[0] == job_id:
+                self.current[1].kill()
+
+    def run(self):
+        while (task := self.tasks.get()) is not None:
+            if task["job_id"] in self.skipped:
+                _emit({"job_id": task["job_id"], "event": "skipped"})
+            else:
+                _emit(self.run_one(task))
+
+    def run_one(self, task: dict) -> dict:
+        """Runs one command and returns its 'done' event"""
+        started = datetime.now()
+        _emit({"job_id": task["job_id"], "event": "started", "time": started.isoformat()})
+
+        returncode = None
+        walltime_exceeded = False
+
+        log_file = task.get("log_file")
+        output = open(log_file, "w") if log_file else subprocess.DEVNULL
+        try:
+            with self._lock:
+                p = subprocess.Popen(
+                    _split(task["command"]),
+                    cwd=task["working_dir"],
+                    env={**os.environ, **(task.get("env") or {})},
+                    stdin=subprocess.DEVNULL,
+                    stdout=output,
+                    stderr=subprocess.STDOUT,
+                )
+                self.current = (task["job_id"], p)
+                if task["job_id"] in self.skipped:
+                    # skipped while it was being started
+                    p.kill()
+            try:
+                returncode = p.wait(timeout=task.get("walltime"))
+            except subprocess.TimeoutExpired:
+                p.kill()
+                p.wait()
+                walltime_exceeded = True
+        except FileNotFoundError:
+            if log_file:
+                output.write("\nERROR: Command not found.  Ensure the command is an executable file.\n")
+            returncode = 127
+        finally:
+            self.current = None
+            if log_file:
+                output.close()
+
+        return {
+            "job_id": task["job_id"],
+            "event": "done",
+            "returncode": returncode,
+            "started": started.isoformat(),
+            "completed": datetime.now().isoformat(),
+            "walltime_exceeded": walltime_exceeded,
+        }
+
+
+def main():
+    runner = Runner()
+    threading.Thread(target=runner.read, args=(sys.stdin,), daemon=True).start()
+    runner.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+predictor Module
+================
+
+Learns how long jobs run from the jobs that have finished, so queued jobs get a
+predicted runtime even though few are submitted with a walltime.
+
+A job is described by three keys, from the most to the least specific
+
+    * its executable, the shape of its arguments and its working directory
+    * its executable and the shape of its arguments
+    * its executable
+
+The shape of the arguments keeps flags as they are and replaces everything else
+by its kind, so ``solver mesh12.inp --tol 1e-6`` and ``solver mesh7.inp --tol
+1e-8`` share the shape ``*.inp --tol #``.  The runtimes seen for each key are
+summarized by their median and 90th percentile, estimated incrementally with the
+P² algorithm (Jain & Chlamtac, 1985), which needs five numbers per quantile no
+matter how many jobs have been seen.  A prediction comes from the most specific
+key with enough samples.
+"""
+
+import math
+import os
+import re
+import shlex
+import threading
+from datetime import datetime
+from pathlib import PurePath
+
+from lqts.core.schema import Job, JobSpec, JobStatus
+
+NUMBER = re.compile(r"^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$")
+
+
+class P2Quantile:
+    """
+    Streaming estimate of the *p* quantile using the P² algorithm.  The first five
+    observations are kept as they are, after that only the five markers are.
+    """
+
+    def __init__(self, p: float):
+        self.p = p
+        self.count = 0
+        self.heights: list[float] = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x: float):
+        self.count += 1
+        if self.count <= 5:
+            self.heights.append(x)
+            self.heights.sort()
+            return
+
+        q, n = self.heights, self.positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if q[i] <= x < q[i + 1])
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # move the middle markers toward their desired positions
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = int(math.copysign(1, d))
+                height = self._parabolic(i, d)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> float | None:
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            # exact quantile of the few samples
+            return self.heights[min(int(self.p * self.count), self.count - 1)]
+        return self.heights[2]
+
+
+class RuntimeStats:
+    """Median and 90th percentile of the runtimes seen for one key"""
+
+    def __init__(self):
+        self.median = P2Quantile(0.5)
+        self.p90 = P2Quantile(0.9)
+
+    @property
+    def count(self) -> int:
+        return self.median.count
+
+    def add(self, seconds: float):
+        self.median.add(seconds)
+        self.p90.add(seconds)
+
+
+def runtime(job: Job) -> float | None:
+    """Seconds a finished job ran.  Jobs read back from json have string times"""
+    started, completed = job.started, job.completed
+    if not started or not completed:
+        return None
+    if isinstance(started, str):
+        started = datetime.fromisoformat(started)
+    if isinstance(completed, str):
+        completed = datetime.fromisoformat(completed)
+    seconds = (completed - started).total_seconds()
+    return seconds if seconds > 0 else None
+
+
+def argument_shape(arg: str) -> str:
+    """Flags are kept, numbers become # and anything else * plus its file suffix"""
+    if NUMBER.match(arg):
+        return "#"
+    if arg.startswith("-") and len(arg) > 1:
+        flag, sep, value = arg.partition("=")
+        return flag + (sep + argument_shape(value) if sep else "")
+    return "*" + PurePath(arg).suffix
+
+
+def job_keys(job_spec: JobSpec) -> tuple[str, str, str]:
+    """The keys of a job, most specific first"""
+    if job_spec.function:
+        executable, shape = job_spec.function, f"{len(job_spec.function_args)}:{','.join(sorted(job_spec.function_kwargs))}"
+    else:
+        try:
+            args = shlex.split(job_spec.command.strip(), posix=os.name != "nt")
+        except ValueError:
+            args = job_spec.command.split()
+        args = [arg.strip('"') for arg in args] or [""]
+        executable = PurePath(args[0]).name
+        shape = " ".join(argument_shape(arg) for arg in args[1:])
+
+    return (
+        f"{executable}|{shape}|{job_spec.working_dir}",
+        f"{executable}|{shape}",
+        executable,
+    )
+
+
+class RuntimePredictor:
+    """
+    Parameters
+    ----------
+    min_samples: int
+        Number of finished jobs a key needs before its predictions are used in
+        place of those of a less specific key
+    """
+
+    def __init__(self, min_samples: int = 3):
+        self.min_samples = min_samples
+        self._stats: dict[str, RuntimeStats] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._stats)
+
+    def observe(self, job: Job):
+        """Learns from a finished job.  Only jobs that ran and succeeded count"""
+        if job.status != JobStatus.Completed or job.returncode not in (None, 0) or job.cached:
+            return
+        seconds = runtime(job)
+        if not seconds:
+            return
+
+        with self._lock:
+            for key in job_keys(job.job_spec):
+                self._stats.setdefault(key, RuntimeStats()).add(seconds)
+
+    def learn_from(self, jobs):
+        """Learns from a batch of finished jobs (e.g. from the history database)"""
+        for job in jobs:
+            self.observe(job)
+
+    def stats(self, job_spec: JobSpec) -> RuntimeStats | None:
+        """The stats of the most specific key of *job_spec* with enough samples"""
+        keys = job_keys(job_spec)
+        with self._lock:
+            found = [self._stats.get(key) for key in keys]
+        for stats in found:
+            if stats is not None and stats.count >= self.min_samples:
+                return stats
+        # fall back to the key with the most samples, which is the least specific
+        return next((stats for stats in reversed(found) if stats is not None), None)
+
+    def predict(self, job_spec: JobSpec) -> float | None:
+        """Predicted (median) runtime in seconds, or None if nothing like it has run"""
+        stats = self.stats(job_spec)
+        if stats is None:
+            return None
+        with self._lock:
+            return stats.median.value()
+
+    def predict_p90(self, job_spec: JobSpec) -> float | None:
+        """90th percentile of the runtime in seconds, or None if nothing like it has run"""
+        stats = self.stats(job_spec)
+        if stats is None:
+            return None
+        with self._lock:
+            return stats.p90.value()
@@ -0,0 +1,139 @@
+"""
+profiling Module
+================
+
+Tools for finding out where a slow server spends its time without restarting
+it.
+
+* Timers around the scheduler's hot paths (next_job, feed_queue,
+  process_completions, prune, save and the qstat handlers).  They are always
+  on: each call costs two perf_counter reads and a few unlocked updates, and
+  the totals are served at /debug/timings.
+* A sampling profiler that records the stacks of every server thread (the
+  pool's manager loop, the queue's save loop, the web server's threads) for a
+  few seconds.  It is served at /debug/profile when LQTS_PROFILING is set, as
+  collapsed stacks that flamegraph.pl, speedscope or inferno read directly.
+"""
+
+import functools
+import inspect
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class TimerStats:
+    """Count, total, maximum and last duration of a timed function"""
+
+    __slots__ = ("count", "total", "max", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def report(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "last": self.last,
+        }
+
+
+class Timings:
+    def __init__(self):
+        self._stats: dict[str, TimerStats] = {}
+
+    def stats(self, name: str) -> TimerStats:
+        return self._stats.setdefault(name, TimerStats())
+
+    def report(self) -> dict[str, dict]:
+        """The statistics of every timer, in seconds"""
+        return {name: stats.report() for name, stats in sorted(self._stats.items())}
+
+    def reset(self):
+        for name in list(self._stats):
+            self._stats[name] = TimerStats()
+
+
+TIMINGS = Timings()
+
+
+def timed(name: str):
+    """
+    Decorator that adds the duration of each call to the timer *name*.  Works
+    on plain and async functions, so FastAPI handlers can be timed too.
+    """
+
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    TIMINGS.stats(name).add(time.perf_counter() - t0)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                TIMINGS.stats(name).add(time.perf_counter() - t0)
+
+        return wrapper
+
+    return decorate
+
+
+def _frame_name(frame) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}"
+
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> tuple[Counter, int]:
+    """
+    Records the stack of every thread but this one each *interval* for
+    *seconds*.  Returns the number of times each collapsed stack (thread name
+    first, outermost frame next, separated by ";") was seen, and the number of
+    samples taken.
+    """
+    me = threading.get_ident()
+    stacks = Counter()
+    samples = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(_frame_name(frame))
+                frame = frame.f_back
+            frames.append(names.get(ident, f"thread-{ident}"))
+            stacks[";".join(reversed(frames))] += 1
+        samples += 1
+        time.sleep(interval)
+    return stacks, samples
+
+
+def collapsed(stacks: Counter) -> str:
+    """Stacks in the collapsed format, one "frame;frame;frame count" per line"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,257 @@
+"""
+py_workers Module
+=================
+
+A pool of persistent Python interpreters that run "function" jobs.  A function
+job names an importable callable (``module:function``) and its arguments instead
+of a command line.  Running it in a warm interpreter skips the interpreter start
+up and the imports of heavy packages (e.g. numpy) that would otherwise be paid by
+every job.
+
+Workers import the modules listed in LQTS_PY_PRELOAD when they start.  A worker
+is recycled after it has run *max_tasks* jobs or when its memory use grows past
+*max_memory_mb*.
+
+The server and a worker talk with single lines of JSON.  The worker keeps its
+own copy of the original stdout for this, and points stdout/stderr at the job's
+log file (or /dev/null) while a function runs, so anything the function prints
+can't get mixed up with the replies.
+
+    task:   {"function": "pkg.mod:func", "args": [...], "kwargs": {...},
+             "pickle": null, "working_dir": "...", "log_file": null, "env": {}}
+    reply:  {"ok": true, "result": ...}  or  {"ok": false, "error": "..."}
+"""
+
+import base64
+import contextlib
+import importlib
+import json
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import traceback
+
+import psutil
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+
+def resolve_function(name: str):
+    """Imports and returns the callable named by 'module:function'"""
+    module_name, _, function_name = name.partition(":")
+    obj = importlib.import_module(module_name)
+    for attr in function_name.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _thread_limits(env: dict):
+    """
+    Limits the BLAS/OpenMP thread pools that are already running to the job's
+    thread count.  The thread count variables only size pools started after
+    they are set, and modules preloaded by the worker (or imported by earlier
+    jobs) have started theirs.  Needs threadpoolctl.  Without it, and for other
+    runtimes such as numexpr or numba, those pools keep the size they started
+    with.
+    """
+    threads = env.get("OMP_NUM_THREADS", "")
+    if threadpool_limits is None or not threads.isdigit():
+        return contextlib.nullcontext()
+    return threadpool_limits(limits=int(threads))
+
+
+def _run_task(task: dict) -> dict:
+    if task.get("pickle"):
+        args, kwargs = pickle.loads(base64.b64decode(task["pickle"]))
+    else:
+        args, kwargs = task.get("args") or [], task.get("kwargs") or {}
+
+    saved_environ = dict(os.environ)
+    try:
+        os.chdir(task["working_dir"])
+        env = task.get("env") or {}
+        os.environ.update(env)
+        with _thread_limits(env):
+            result = resolve_function(task["function"])(*args, **kwargs)
+    except BaseException:
+        traceback.print_exc()
+        return {"ok": False, "error": traceback.format_exc()}
+    finally:
+        # one job's variables must not leak into the next job
+        os.environ.clear()
+        os.environ.update(saved_environ)
+
+    try:
+        json.dumps(result)
+    except (TypeError, ValueError):
+        result = repr(result)
+
+    return {"ok": True, "result": result}
+
+
+def worker_main():
+    """
+    Main loop of a worker interpreter.  Runs tasks from stdin until stdin is closed.
+    """
+    replies = os.fdopen(os.dup(1), "w")
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+
+    for name in os.environ.get("LQTS_PY_PRELOAD", "").split(","):
+        if name.strip():
+            try:
+                importlib.import_module(name.strip())
+            except ImportError:
+                pass
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        task = json.loads(line)
+
+        if task.get("log_file"):
+            fd = os.open(task["log_file"], os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            os.dup2(fd, 1)
+            os.dup2(fd, 2)
+            os.close(fd)
+
+        reply = _run_task(task)
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+
+        replies.write(json.dumps(reply) + "\n")
+        replies.flush()
+
+
+class PythonWorker:
+    """
+    Server side handle for one worker interpreter
+    """
+
+    def __init__(self, preload: str = ""):
+        env = dict(os.environ)
+        env["LQTS_PY_PRELOAD"] = preload
+        self.process = psutil.Popen(
+            [sys.executable, "-m", "lqts.py_workers"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            env=env,
+        )
+        self.tasks_done = 0
+        self.reply: dict = None
+        self._reader: threading.Thread = None
+
+    def submit(self, task: dict):
+        """Sends a task to the worker.  The reply shows up in *self.reply*"""
+        self.reply = None
+        self.process.stdin.write(json.dumps(task) + "\n")
+        self.process.stdin.flush()
+        self._reader = threading.Thread(target=self._read_reply, daemon=True)
+        self._reader.start()
+
+    def _read_reply(self):
+        line = self.process.stdout.readline()
+        self.tasks_done += 1
+        if line:
+            self.reply = json.loads(line)
+        else:
+            self.reply = {"ok": False, "error": "The python worker exited"}
+
+    def is_done(self) -> bool:
+        return self.reply is not None
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def memory_mb(self) -> float:
+        try:
+            return self.process.memory_info().rss / 2**20
+        except psutil.NoSuchProcess:
+            return 0.0
+
+    def stop(self):
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except Exception:
+            self.kill()
+
+    def kill(self):
+        try:
+            self.process.kill()
+        except psutil.NoSuchProcess:
+            pass
+
+
+class PythonWorkerPool:
+    """
+    Keeps idle worker interpreters warm and hands them out to function jobs.
+
+    Parameters
+    ----------
+    preload: str
+        Comma separated modules every worker imports when it starts
+    max_tasks: int
+        Number of jobs a worker runs before it is replaced
+    max_memory_mb: float
+        A worker using more memory than this after a job is replaced
+    prestart: int
+        Number of workers to start right away
+    """
+
+    def __init__(self, preload: str = "", max_tasks: int = 100, max_memory_mb: float = 2048, prestart: int = 0):
+        self.preload = preload
+        self.max_tasks = max_tasks
+        self.max_memory_mb = max_memory_mb
+
+        self._idle: list[PythonWorker] = []
+        self._lock = threading.Lock()
+
+        for _ in range(prestart):
+            self._idle.append(PythonWorker(self.preload))
+
+    def acquire(self) -> PythonWorker:
+        """Gets an idle worker, starting a new one if needed"""
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.is_alive():
+                    return worker
+
+        return PythonWorker(self.preload)
+
+    def release(self, worker: PythonWorker):
+        """
+        Returns a worker to the pool, or replaces it if it has run too many
+        tasks or grown too large
+        """
+        if not worker.is_alive():
+            return
+
+        if worker.tasks_done >= self.max_tasks or worker.memory_mb() > self.max_memory_mb:
+            worker.stop()
+            # start the replacement now so it is warm when it is needed
+            worker = PythonWorker(self.preload)
+
+        with self._lock:
+            self._idle.append(worker)
+
+    def shutdown(self):
+        with self._lock:
+            for worker in self._idle:
+                worker.stop()
+            self._idle.clear()
+
+
+if __name__ == "__main__":
+    worker_main()
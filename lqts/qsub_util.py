@@ -32,6 +32,63 @@ def get_job_ids(job_id_str: str):
         return JobID.parse_obj(job_id_str)
 
 
+# dependency type -> JobSpec field
+DEPENDENCY_TYPES = {
+    "afterany": "depends",
+    "afterok": "depends_ok",
+    "afternotok": "depends_notok",
+    "aftercorr": "depends_corr",
+}
+
+
+def parse_dependencies(depends: list[str] | None) -> dict:
+    """
+    Turns qsub's --depends values into JobSpec fields.  Each value is a job id or
+    group ("12.003", "12", "12.*"), optionally prefixed with a dependency type
+    and followed by more ids:
+
+        afterany:12.003     run after 12.003 finishes (the default)
+        afterok:12:13.001   run after they complete successfully
+        afternotok:12.003   run after 12.003 fails or is deleted
+        aftercorr:12        run member i after member i of group 12 succeeds
+
+    e.g. ``{"depends": [...], "depends_ok": [...]}``
+    """
+    dependencies = {}
+    for value in depends or []:
+        kind, sep, ids = value.partition(":")
+        if not sep or kind not in DEPENDENCY_TYPES:
+            if sep and not kind.replace(".", "").isdigit():
+                raise ValueError(f"Unknown dependency type '{kind}'.  Use one of {', '.join(DEPENDENCY_TYPES)}")
+            kind, ids = "afterany", value
+
+        field = DEPENDENCY_TYPES[kind]
+        for id_str in ids.replace(",", ":").split(":"):
+            if not id_str:
+                continue
+            if field == "depends_corr":
+                dependencies.setdefault(field, []).append(int(id_str.partition(".")[0]))
+            else:
+                job_ids = get_job_ids(id_str)
+                dependencies.setdefault(field, []).extend(job_ids if isinstance(job_ids, list) else [job_ids])
+
+    return dependencies
+
+
+def parse_resources(resources: list[str] | tuple | None) -> dict[str, int]:
+    """
+    Turns qsub's --resource values ("abaqus_lic=2", or "nvme_io" for one) into
+    the JobSpec resources field
+    """
+    requested = {}
+    for value in resources or []:
+        for item in value.split(","):
+            name, sep, count = item.partition("=")
+            if name.strip():
+                requested[name.strip()] = requested.get(name.strip(), 0) + (int(count) if sep else 1)
+    return requested
+
+
 def parse_walltime(walltime):
     if ":" in walltime:
         hrs, minutes, sec = [int(x) for x in walltime.split(":")]
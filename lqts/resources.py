@@ -1,7 +1,11 @@
+import os
+import threading
 from enum import Enum
 from multiprocessing import cpu_count
 from typing import NamedTuple
 
+import psutil
+
 SYSTEM_CPU_COUNT = cpu_count()
 MAX_CPUS = SYSTEM_CPU_COUNT - 2
 
@@ -38,13 +42,17 @@ class CPUResourceManager:
         ]
         return len(available)
 
-    def get_processors(self, count=1) -> CPUResponse:
+    def get_processors(self, count=1, prefer: list | None = None) -> CPUResponse:
         """
-        Gets the number of free processors for the next job
+        Gets the number of free processors for the next job.  The processors in
+        *prefer* are used if they are all free, e.g. to give a resumed job back
+        the cores it had.
         """
         available = [
             p for p, state in self.processors.items() if state == ProcState.idle
         ]
+        if prefer and len(prefer) == count and all(p in available for p in prefer):
+            available = list(prefer)
 
         if len(available) >= count:
             cpus = available[:count]
@@ -54,6 +62,20 @@ class CPUResourceManager:
         else:
             return CPUResponse(False, [])
 
+    def reserve_processors(self, processors: list) -> bool:
+        """
+        Marks specific processors as busy, e.g. for a job that was already
+        running when the server started.  Returns False if any of them were
+        already busy.
+        """
+        all_idle = True
+        for p in processors:
+            if self.processors.get(p) == ProcState.busy:
+                all_idle = False
+            if p in self.processors:
+                self.processors[p] = ProcState.busy
+        return all_idle
+
     def free_processors(self, processors: list):
         """
         Returns processors to the pool and marks them as idle
@@ -92,3 +114,147 @@ class CPUResourceManager:
                 self.processors.pop(i)
 
         self.cpu_count = new_cpu_count
+
+
+def parse_counts(text: str) -> dict[str, int]:
+    """Parses "abaqus_lic=8,nvme_io=4" into {"abaqus_lic": 8, "nvme_io": 4}"""
+    counts = {}
+    for item in text.split(","):
+        name, sep, count = item.partition("=")
+        if sep and name.strip():
+            counts[name.strip()] = int(count)
+    return counts
+
+
+class ResourceManager:
+    """
+    Manages named counted resources, e.g. floating licenses or slots on a shared
+    scratch disk.  A job's request is allocated all at once or not at all.
+    """
+
+    def __init__(self, capacity: dict[str, int] | None = None) -> None:
+        self.capacity = dict(capacity or {})
+        self.in_use = {name: 0 for name in self.capacity}
+        self.holders: dict = {}  # job id -> {name: count}
+        self._lock = threading.Lock()
+
+    def check(self, request: dict[str, int]):
+        """Raises ValueError if *request* can never be met"""
+        for name, count in request.items():
+            if name not in self.capacity:
+                raise ValueError(f"Unknown resource {name!r} (configured: {', '.join(self.capacity) or 'none'})")
+            if count < 0 or count > self.capacity[name]:
+                raise ValueError(f"Can't request {count} of {name!r}, the server has {self.capacity[name]}")
+
+    def available(self, request: dict[str, int]) -> bool:
+        """True if all of *request* is free now"""
+        with self._lock:
+            return self._fits(request)
+
+    def _fits(self, request: dict[str, int]) -> bool:
+        return all(self.in_use.get(name, 0) + count <= self.capacity.get(name, 0) for name, count in request.items())
+
+    def allocate(self, job_id, request: dict[str, int], force: bool = False) -> bool:
+        """
+        Allocates all of *request* to *job_id*, or nothing if some of it is in use.
+        *force* allocates even over capacity, e.g. for a job that was already
+        running when the server started.
+        """
+        if not request:
+            return True
+        with self._lock:
+            if job_id in self.holders:
+                return True
+            if not force and not self._fits(request):
+                return False
+            for name, count in request.items():
+                self.in_use[name] = self.in_use.get(name, 0) + count
+            self.holders[job_id] = dict(request)
+            return True
+
+    def release(self, job_id):
+        """Returns the resources held by *job_id*, if any"""
+        with self._lock:
+            request = self.holders.pop(job_id, None)
+            for name, count in (request or {}).items():
+                self.in_use[name] = max(self.in_use.get(name, 0) - count, 0)
+
+    def status(self) -> dict[str, dict]:
+        """Capacity, use and holders of each resource"""
+        with self._lock:
+            return {
+                name: {
+                    "capacity": capacity,
+                    "in_use": self.in_use.get(name, 0),
+                    "holders": {str(job_id): request[name] for job_id, request in self.holders.items() if name in request},
+                }
+                for name, capacity in self.capacity.items()
+            }
+
+
+def pin_process(process: psutil.Process, cores: list):
+    """
+    Pins a running process to *cores*.  On Linux each of its threads is pinned,
+    since threads that already exist keep their own affinity.
+    """
+    process.cpu_affinity(list(cores))
+    if hasattr(os, "sched_setaffinity"):
+        for thread in process.threads():
+            try:
+                os.sched_setaffinity(thread.id, cores)
+            except OSError:
+                pass
+
+
+# Thread pool sizes of the common math/parallel runtimes.  Left unset, each of
+# these starts one thread per core on the machine, even in a job pinned to one core.
+THREAD_COUNT_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "NUMEXPR_MAX_THREADS",
+    "NUMBA_NUM_THREADS",
+    "TBB_NUM_THREADS",
+    "RAYON_NUM_THREADS",
+    "JULIA_NUM_THREADS",
+)
+
+
+def thread_environment(job_id, cores: list | None, threads: int | None = None, overrides: dict | None = None) -> dict:
+    """
+    Gets the environment variables that size a job's thread pools to the cores
+    it was given.
+
+    Parameters
+    ----------
+    job_id: JobID
+        Exported as LQTS_JOB_ID
+    cores: list[int]
+        The cores assigned to the job.  Exported as LQTS_CORES and used for the
+        OpenMP thread placement
+    threads: int
+        Thread count to use instead of the number of cores
+    overrides: dict
+        Variables that replace (or add to) the generated ones
+
+    Returns
+    -------
+    env: dict[str, str]
+        Only the variables to add to the job's environment
+    """
+    cores = list(cores or [])
+    nthreads = threads or max(len(cores), 1)
+
+    env = {name: str(nthreads) for name in THREAD_COUNT_VARIABLES}
+    env["LQTS_JOB_ID"] = str(job_id)
+    env["LQTS_CORES"] = ",".join(str(core) for core in cores)
+    if cores:
+        # keep OpenMP threads on the job's cores (the process is pinned to them already)
+        env["OMP_PLACES"] = ",".join(f"{{{core}}}" for core in cores)
+        env["OMP_PROC_BIND"] = "close"
+
+    env.update({key: str(value) for key, value in (overrides or {}).items()})
+    return env
@@ -0,0 +1,221 @@
+"""
+result_cache Module
+===================
+
+A content addressed cache of job results.  A job submitted with caching turned
+on (``JobSpec.cache``) gets a key made from
+
+    * its command and working directory
+    * the resolved executable (path, size and modification time)
+    * the environment variables named in ``JobSpec.cache_env``
+    * the files named in ``JobSpec.inputs`` (size and modification time, or a
+      hash of their contents if LQTS_CACHE_CONTENT_HASH is set)
+
+After a successful run its declared output files (``JobSpec.outputs``) and log
+file are copied into the cache under that key.  When a job with the same key
+comes up to run again the files are copied back and the job completes without
+running.
+
+Each entry is a directory named by its key holding the files and a meta.json.
+The cache is limited to a total size and the least recently used entries are
+removed first.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from lqts.core.schema import JobSpec
+from lqts.mp_pool2 import split_command
+
+
+class ResultCache:
+    """
+    Parameters
+    ----------
+    cache_dir: str
+        Directory the entries are kept in
+    max_bytes: int
+        Total size of the entries the cache may hold
+    content_hash: bool
+        Hash the contents of input files instead of using their size and
+        modification time
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2**30, content_hash: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.content_hash = content_hash
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        # key -> size in bytes, least recently used first
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self._load()
+
+    def _load(self):
+        """Indexes the entries already on disk, oldest use first"""
+        if not self.cache_dir.exists():
+            return
+
+        entries = []
+        for meta_file in self.cache_dir.glob("*/meta.json"):
+            try:
+                meta = json.loads(meta_file.read_text())
+            except (OSError, ValueError):
+                continue
+            entries.append((meta.get("last_used", 0), meta_file.parent.name, meta.get("size", 0)))
+
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._size += size
+
+    def _file_signature(self, file_name: Path) -> str:
+        if not file_name.exists():
+            return "missing"
+        if self.content_hash:
+            digest = hashlib.sha256()
+            with open(file_name, "rb") as fid:
+                for block in iter(lambda: fid.read(2**20), b""):
+                    digest.update(block)
+            return digest.hexdigest()
+        else:
+            stat = file_name.stat()
+            return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def key(self, job_spec: JobSpec) -> str:
+        """Gets the cache key for a job"""
+        working_dir = Path(job_spec.working_dir)
+        parts = [job_spec.command, str(working_dir)]
+
+        args = split_command(job_spec.command)
+        program = args[0] if isinstance(args, list) and args else job_spec.command
+        executable = shutil.which(program, path=os.pathsep.join([str(working_dir), os.environ.get("PATH", "")]))
+        if executable:
+            parts.append(f"{executable}={self._file_signature(Path(executable))}")
+
+        for name in sorted(job_spec.cache_env):
+            parts.append(f"{name}={job_spec.env.get(name, os.environ.get(name, ''))}")
+
+        for input_file in job_spec.inputs:
+            parts.append(f"{input_file}={self._file_signature(working_dir / input_file)}")
+
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def restore(self, key: str, job_spec: JobSpec) -> bool:
+        """
+        Copies the cached outputs and log of *key* back into place.  Returns
+        False on a miss.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return False
+            self._entries.move_to_end(key)
+
+        entry = self.cache_dir / key
+        working_dir = Path(job_spec.working_dir)
+        try:
+            meta = json.loads((entry / "meta.json").read_text())
+            for i, output_file in enumerate(meta["outputs"]):
+                destination = working_dir / output_file
+                destination.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(entry / f"output{i}", destination)
+
+            if job_spec.log_file:
+                log_file = working_dir / job_spec.log_file
+                if (entry / "log").exists():
+                    shutil.copyfile(entry / "log", log_file)
+                with open(log_file, "a") as fid:
+                    fid.write(f"\nRestored from the LQTS result cache ({key})\n")
+
+            meta["last_used"] = time.time()
+            (entry / "meta.json").write_text(json.dumps(meta))
+        except (OSError, ValueError, KeyError):
+            # the entry is broken, so run the job and let it be stored again
+            self._remove(key)
+            with self._lock:
+                self.misses += 1
+            return False
+
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key: str, job_spec: JobSpec) -> bool:
+        """
+        Copies the outputs and log of a finished job into the cache.  Returns
+        False if a declared output is missing.
+        """
+        working_dir = Path(job_spec.working_dir)
+        entry = self.cache_dir / key
+        tmp_entry = self.cache_dir / f"{key}.tmp"
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        tmp_entry.mkdir(parents=True)
+
+        size = 0
+        try:
+            for i, output_file in enumerate(job_spec.outputs):
+                shutil.copy2(working_dir / output_file, tmp_entry / f"output{i}")
+                size += (tmp_entry / f"output{i}").stat().st_size
+            if job_spec.log_file and (working_dir / job_spec.log_file).exists():
+                shutil.copyfile(working_dir / job_spec.log_file, tmp_entry / "log")
+                size += (tmp_entry / "log").stat().st_size
+        except OSError:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return False
+
+        meta = {"outputs": list(job_spec.outputs), "size": size, "last_used": time.time()}
+        (tmp_entry / "meta.json").write_text(json.dumps(meta))
+
+        self._remove(key)
+        os.replace(tmp_entry, entry)
+
+        with self._lock:
+            self._entries[key] = size
+            self._size += size
+            self.stores += 1
+
+        self.evict()
+        return True
+
+    def _remove(self, key: str):
+        with self._lock:
+            size = self._entries.pop(key, None)
+            if size is not None:
+                self._size -= size
+        shutil.rmtree(self.cache_dir / key, ignore_errors=True)
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits in max_bytes"""
+        while True:
+            with self._lock:
+                if self._size <= self.max_bytes or not self._entries:
+                    return
+                key = next(iter(self._entries))
+                self.evictions += 1
+            self._remove(key)
+
+    def stats(self) -> dict:
+        """Hit/miss counts and the size of the cache"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
@@ -74,6 +74,9 @@ class Logger:
     def debug(self, message):
         self.log(Level.DEBUG, message)
 
+    def warning(self, message):
+        self.log(Level.WARNING, message)
+
     def error(self, message):
         self.log(Level.ERROR, message)
 
@@ -0,0 +1,170 @@
+"""
+supervisor Module
+=================
+
+Runs one job under a small detached process that is independent of the server.
+The supervisor starts the job, appends its output and the closing "Job
+Performance" block to the log file, and records its progress in a state file:
+
+    <state dir>/<job id>.json
+
+    {"job": {...}, "command": "...", "cwd": "...", "env": {...}, "cores": [0, 1],
+     "log_file": "...", "supervisor_pid": 123, "pid": 124,
+     "returncode": 0, "completed": "..."}
+
+The server writes everything up to "log_file" before starting the supervisor.
+The supervisor adds the pids once the job is running, and the return code and
+completion time when it exits.  Because the supervisor is in its own session it
+keeps running when the server stops.  A restarted server reads the state files
+to pick its running jobs back up (see DynamicProcessPool.reattach) and deletes a
+state file once it has recorded the job as finished.
+
+    $ python -m lqts.supervisor ~/.lqts/jobs/12.003.json
+"""
+
+import json
+import os
+import shlex
+import signal
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from textwrap import dedent
+
+import psutil
+
+SUPERVISOR_NICE = 10
+
+
+def read_state(state_file: str | Path) -> dict:
+    """Reads a state file.  Returns an empty dict if it is missing or half written"""
+    try:
+        return json.loads(Path(state_file).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def write_state(state_file: str | Path, state: dict):
+    """Writes a state file atomically so a reader never sees part of it"""
+    state_file = Path(state_file)
+    tmp_file = state_file.with_name(state_file.name + ".tmp")
+    tmp_file.write_text(json.dumps(state))
+    os.replace(tmp_file, state_file)
+
+
+def is_supervisor(pid: int | None) -> bool:
+    """True if *pid* is a running supervisor process"""
+    if not pid:
+        return False
+    try:
+        process = psutil.Process(pid)
+        return process.status() != psutil.STATUS_ZOMBIE and "lqts.supervisor" in " ".join(process.cmdline())
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return False
+
+
+def start_supervisor(state_file: str | Path) -> psutil.Popen:
+    """Starts a detached supervisor for the job described by *state_file*"""
+    if psutil.WINDOWS:
+        detach = {"creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        detach = {"start_new_session": True}
+
+    return psutil.Popen(
+        [sys.executable, "-m", "lqts.supervisor", str(state_file)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        **detach,
+    )
+
+
+def _lower_priority_and_pin(cores: list):
+    """
+    Sets the supervisor's own priority and affinity so the job inherits them
+    when it starts
+    """
+    me = psutil.Process()
+    if psutil.WINDOWS:
+        me.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
+    else:
+        me.nice(SUPERVISOR_NICE)
+        if psutil.LINUX:
+            me.ionice(psutil.IOPRIO_CLASS_BE, value=5)
+    if cores:
+        me.cpu_affinity(cores)
+
+
+def supervise(state_file: str | Path) -> int:
+    """
+    Runs the job described by *state_file* to completion.  Returns its exit code.
+    """
+    state = read_state(state_file)
+    started = datetime.now()
+
+    try:
+        _lower_priority_and_pin(state.get("cores"))
+    except Exception:
+        pass
+
+    command = state["command"]
+    if not psutil.WINDOWS:
+        command = shlex.split(command.strip())
+
+    log_file = state.get("log_file")
+    output = open(log_file, "ab", buffering=0) if log_file else subprocess.DEVNULL
+
+    try:
+        child = subprocess.Popen(
+            command,
+            cwd=state["cwd"],
+            env={**os.environ, **(state.get("env") or {})},
+            stdin=subprocess.DEVNULL,
+            stdout=output,
+            stderr=subprocess.STDOUT,
+        )
+    except OSError as ex:
+        if log_file:
+            output.write(f"\nERROR: Could not start the command.  {ex}\n".encode())
+        returncode = 127
+    else:
+        state["supervisor_pid"] = os.getpid()
+        state["pid"] = child.pid
+        write_state(state_file, state)
+
+        def forward(signum, frame):
+            # stopping the supervisor stops its job too
+            child.kill()
+
+        signal.signal(signal.SIGTERM, forward)
+        returncode = child.wait()
+
+    completed = datetime.now()
+    if log_file:
+        footer = dedent(
+            f"""
+            -----------------------------------------------
+            Job Performance
+            -----------------------------------------------
+            Started: {started.isoformat()}
+            Ended:   {completed.isoformat()}
+            Elapsed: {completed - started}
+            -----------------------------------------------
+            """
+        )
+        output.write(footer.encode())
+        output.close()
+
+    if Path(state_file).exists():
+        # the server removes the state file when it deletes the job
+        state["supervisor_pid"] = os.getpid()
+        state["returncode"] = returncode
+        state["completed"] = completed.isoformat()
+        write_state(state_file, state)
+
+    return returncode
+
+
+if __name__ == "__main__":
+    supervise(sys.argv[1])
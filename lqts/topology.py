@@ -0,0 +1,112 @@
+"""
+topology Module
+===============
+
+Where each logical cpu sits (socket and NUMA node) and how busy it is, for the
+qtop view.
+
+Busy fractions come from the per-cpu counters in /proc/stat: the share of the
+time since the previous sample that the cpu spent neither idle nor waiting on
+io.  Where /proc/stat doesn't exist psutil's per-cpu percentages are used.  The
+topology is read from /sys/devices/system; without it every cpu is put on
+socket 0, node 0.
+"""
+
+import threading
+import time
+from pathlib import Path
+
+import psutil
+
+SYS_DIR = Path("/sys/devices/system")
+PROC_STAT = Path("/proc/stat")
+
+
+def parse_cpulist(text: str) -> list[int]:
+    """Parses a kernel cpu list like "0-3,8,10-11" """
+    cpus = []
+    for item in text.strip().split(","):
+        if not item:
+            continue
+        first, sep, last = item.partition("-")
+        cpus.extend(range(int(first), int(last) + 1) if sep else [int(first)])
+    return cpus
+
+
+def read_topology(cpu_count: int, sys_dir: Path = SYS_DIR) -> dict[int, tuple[int, int]]:
+    """The (socket, NUMA node) of each cpu"""
+    sys_dir = Path(sys_dir)
+    nodes = {}
+    for node_dir in sys_dir.glob("node/node[0-9]*"):
+        try:
+            for cpu in parse_cpulist((node_dir / "cpulist").read_text()):
+                nodes[cpu] = int(node_dir.name[4:])
+        except (OSError, ValueError):
+            pass
+
+    topology = {}
+    for cpu in range(cpu_count):
+        try:
+            socket = int((sys_dir / "cpu" / f"cpu{cpu}" / "topology" / "physical_package_id").read_text())
+        except (OSError, ValueError):
+            socket = 0
+        topology[cpu] = (max(socket, 0), nodes.get(cpu, 0))
+    return topology
+
+
+def read_proc_stat(stat_file: Path = PROC_STAT) -> dict[int, tuple[int, int]] | None:
+    """(busy, total) jiffies of each cpu, or None if the file can't be read"""
+    try:
+        lines = Path(stat_file).read_text().splitlines()
+    except OSError:
+        return None
+
+    counters = {}
+    for line in lines:
+        if not line.startswith("cpu") or line.startswith("cpu "):
+            continue
+        name, *fields = line.split()
+        # user nice system idle iowait irq softirq steal (guest time is already in user)
+        values = [int(value) for value in fields[:8]]
+        total = sum(values)
+        idle = values[3] + (values[4] if len(values) > 4 else 0)
+        counters[int(name[3:])] = (total - idle, total)
+    return counters
+
+
+class CpuUtilization:
+    """
+    Busy fraction of each cpu between samples.  Samples are reused for
+    *interval* seconds so any number of viewers cost one read per interval.
+    """
+
+    def __init__(self, interval: float = 1.0, stat_file: Path = PROC_STAT):
+        self.interval = interval
+        self.stat_file = stat_file
+        self._lock = threading.Lock()
+        self._counters = None
+        self._values: dict[int, float] = {}
+        self._sampled = 0.0
+
+    def sample(self, now: float | None = None) -> dict[int, float]:
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._values and now - self._sampled < self.interval:
+                return self._values
+
+            counters = read_proc_stat(self.stat_file)
+            if counters is None:
+                values = {cpu: percent / 100 for cpu, percent in enumerate(psutil.cpu_percent(percpu=True))}
+            else:
+                values = {}
+                for cpu, (busy, total) in counters.items():
+                    previous_busy, previous_total = (self._counters or {}).get(cpu, (0, 0))
+                    if total > previous_total:
+                        values[cpu] = min(max((busy - previous_busy) / (total - previous_total), 0.0), 1.0)
+                    else:
+                        values[cpu] = 0.0
+                self._counters = counters
+
+            self._values = values
+            self._sampled = now
+            return values
@@ -1,15 +1,20 @@
 from starlette.responses import HTMLResponse
 
 from lqts.core import server
+from lqts.html.qstat_data import QstatTableData
 from lqts.html.render_qstat import (
     render_doc_page,
     render_qstat_page,
     render_qstat_table,
+    qtop_data,
     render_qtop_table,
 )
+from lqts.profiling import timed
 
 app = server.get_app()
 
+qstat_data = QstatTableData()
+
 
 @app.get("/")
 async def root():
@@ -17,6 +22,7 @@ async def root():
 
 
 @app.get("/qstatus")
+@timed("qstatus_page")
 async def qstat_html(complete: str = "no"):
     complete = complete == "yes"
     return HTMLResponse(render_qstat_page(complete))
@@ -30,9 +36,46 @@ async def qstat_table_html(complete: str = "no"):
     return HTMLResponse(html_text)
 
 
+@app.get("/page_fragments/qstat_data")
+@timed("qstat_data")
+async def qstat_table_data(
+    draw: int = 0,
+    start: int = 0,
+    length: int = 50,
+    search: str = "",
+    order_column: int = 1,
+    order_dir: str = "asc",
+    complete: str = "no",
+) -> dict:
+    """
+    One page of the job table for DataTables' server-side processing, sorted
+    on *order_column* and filtered to the rows containing all words of *search*
+    """
+    return qstat_data.query(
+        app.queue,
+        draw=draw,
+        start=start,
+        length=length,
+        search=search,
+        order_column=order_column,
+        order_dir=order_dir,
+        include_complete=complete == "yes",
+    )
+
+
+@app.get("/page_fragments/qtop_data")
+@timed("qtop_data")
+async def qtop_table_data() -> dict:
+    """
+    The job, state and utilization of every core, grouped by socket and NUMA
+    node, and the named resources
+    """
+    return qtop_data()
+
+
 @app.get("/page_fragments/qtop_table")
 async def qstat_table_html():
-    html_text = render_qtop_table(app.queue.all_jobs)
+    html_text = render_qtop_table()
     # print(html_text)
     return HTMLResponse(html_text)
 
@@ -0,0 +1,139 @@
+"""
+Local multi-agent harness
+
+Starts an LQTS server that does not run jobs itself, a few lqts-agent processes
+pointed at it, submits a batch of jobs, and waits for the agents to run them all.
+It prints which agent ran each job.
+
+    $ python lqts_tests/agent_harness.py --agents 3 --jobs 12
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import click
+import requests
+
+import lqts
+
+REPO_ROOT = str(Path(lqts.__file__).parent.parent)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_server(url: str, timeout: float = 30.0):
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        try:
+            requests.get(f"{url}/api_v1/qsummary", timeout=1)
+            return
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def run_harness(agents: int = 3, cores: int = 1, jobs: int = 12, duration: float = 0.5, timeout: float = 120.0) -> dict:
+    """
+    Runs the harness and returns {job id: agent name} for the finished jobs
+    """
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.update(
+            LQTS_PORT=str(port),
+            LQTS_QUEUE_FILE=str(Path(tmp) / "lqts.queue.txt"),
+            LQTS_HISTORY_FILE=str(Path(tmp) / "lqts.history.db"),
+            LQTS_LOCAL_EXECUTION="false",
+            PYTHONPATH=REPO_ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+        )
+
+        procs = [
+            subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "lqts.main:app", "--port", str(port), "--log-level", "warning"],
+                cwd=tmp,
+                env=env,
+                stdout=subprocess.DEVNULL,
+            )
+        ]
+        try:
+            wait_for_server(url)
+
+            for i in range(agents):
+                procs.append(
+                    subprocess.Popen(
+                        [
+                            sys.executable,
+                            "-m",
+                            "lqts.commands.qagent",
+                            "--cores",
+                            str(cores),
+                            "--name",
+                            f"agent-{i}",
+                            "--interval",
+                            "0.2",
+                            "--port",
+                            str(port),
+                        ],
+                        cwd=tmp,
+                        env=env,
+                        stdout=subprocess.DEVNULL,
+                    )
+                )
+
+            command = f'"{sys.executable}" -c "import time; time.sleep({duration})"'
+            job_specs = [{"command": command, "working_dir": tmp} for _ in range(jobs)]
+            response = requests.post(f"{url}/api_v1/qsub", json=job_specs)
+            job_ids = {f"{item['group']}.{item['index']:0>3}" for item in response.json()}
+
+            t0 = time.time()
+            finished = {}
+            while time.time() - t0 < timeout:
+                response = requests.get(f"{url}/api_v1/qstat", json={"running": False, "queued": False, "completed": True})
+                for item in response.json():
+                    job = lqts.core.schema.Job.model_validate_json(item)
+                    finished[str(job.job_id)] = job.agent
+                if job_ids.issubset(finished):
+                    break
+                time.sleep(0.5)
+
+            return {job_id: finished.get(job_id) for job_id in sorted(job_ids)}
+
+        finally:
+            for p in procs:
+                p.kill()
+                p.wait()
+
+
+@click.command()
+@click.option("--agents", default=3, type=int, help="Number of agents to start")
+@click.option("--cores", default=1, type=int, help="Cores per agent")
+@click.option("--jobs", default=12, type=int, help="Number of jobs to submit")
+@click.option("--duration", default=0.5, type=float, help="Run time of each job in seconds")
+def main(agents, cores, jobs, duration):
+    """Runs jobs on several local agents and shows which agent ran each job"""
+    t0 = time.time()
+    results = run_harness(agents=agents, cores=cores, jobs=jobs, duration=duration)
+    elapsed = time.time() - t0
+
+    for job_id, agent in results.items():
+        print(f"{job_id}: {agent}")
+    print(Counter(results.values()))
+    print(f"{len(results)} jobs in {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    import lqts.core.schema
+
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark of how many jobs per second can be started
+
+Compares starting jobs the way WorkItem.start does it by default
+(psutil.Popen, then nice, ionice and cpu_affinity from the parent) with
+starting them through the launcher helper process.
+
+    $ python lqts_tests/bench_launcher.py --count 500
+"""
+
+import os
+import shlex
+import subprocess
+import time
+
+import click
+import psutil
+
+from lqts.launcher import Launcher
+
+
+def bench_popen(command: list, count: int, cores: list) -> tuple[float, float]:
+    procs = []
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    for _ in range(count):
+        p = psutil.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        p.nice(10)
+        p.ionice(psutil.IOPRIO_CLASS_BE, value=5)
+        p.cpu_affinity(cores)
+        procs.append(p)
+    elapsed = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+
+    for p in procs:
+        p.wait()
+
+    return count / elapsed, 1000 * cpu / count
+
+
+def bench_launcher(command: list, count: int, cores: list) -> tuple[float, float]:
+    launcher = Launcher().start()
+    try:
+        cpu0 = time.process_time()
+        t0 = time.perf_counter()
+        pids = [launcher.spawn(command, cwd=os.getcwd(), cores=cores) for _ in range(count)]
+        elapsed = time.perf_counter() - t0
+        cpu = time.process_time() - cpu0
+
+        for pid in pids:
+            while launcher.returncode(pid) is None:
+                time.sleep(0.01)
+    finally:
+        launcher.shutdown()
+
+    return count / elapsed, 1000 * cpu / count
+
+
+@click.command()
+@click.option("--count", default=200, type=int, help="Number of jobs to start with each method")
+@click.option("--command", default="true", help="Command each job runs")
+@click.option("--ballast-mb", default=500, type=int, help="Memory to allocate in this process before benchmarking")
+def main(count, command, ballast_mb):
+    """
+    Prints the number of jobs started per second with and without the launcher,
+    and how much CPU time this (the "server") process spent per job started.
+    """
+
+    # The server is a large process.  Give this one some weight so the cost
+    # of forking it is representative.
+    ballast = bytearray(ballast_mb * 1024 * 1024)
+    for i in range(0, len(ballast), 4096):
+        ballast[i] = 1
+
+    command = shlex.split(command)
+    cores = sorted(os.sched_getaffinity(0))[:1]
+
+    rate_popen, cpu_popen = bench_popen(command, count, cores)
+    rate_launcher, cpu_launcher = bench_launcher(command, count, cores)
+
+    print(f"psutil.Popen + nice/ionice/affinity: {rate_popen:8.1f} jobs/s  {cpu_popen:6.3f} ms server CPU/job")
+    print(f"launcher:                            {rate_launcher:8.1f} jobs/s  {cpu_launcher:6.3f} ms server CPU/job")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+from lqts.core.schema import JobSpec
+
+
+def make_specs(n, command="solve", working_dir=".", log_file=None, **kwargs) -> list[JobSpec]:
+    """
+    *n* job specs with the commands "<command> 0" to "<command> n-1".  A
+    *log_file* such as "solve{i}.log" gets each job's index too.  Any other
+    keyword is a JobSpec field shared by all of them.
+    """
+    return [
+        JobSpec(
+            command=f"{command} {i}",
+            working_dir=str(working_dir),
+            log_file=log_file.format(i=i) if log_file else None,
+            **kwargs,
+        )
+        for i in range(n)
+    ]
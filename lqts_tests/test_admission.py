@@ -0,0 +1,81 @@
+import pytest
+
+from lqts.admission import AdmissionController, read_pressure
+from lqts.core.schema import JobQueue, JobSpec
+from lqts.mp_pool2 import DynamicProcessPool
+from lqts.resources import CPUResourceManager
+
+
+def write_pressure(pressure_dir, resource, some):
+    (pressure_dir / resource).write_text(
+        f"some avg10={some:.2f} avg60=0.00 avg300=0.00 total=0\nfull avg10=0.00 avg60=0.00 avg300=0.00 total=0\n"
+    )
+
+
+def test_read_pressure(tmp_path):
+    write_pressure(tmp_path, "cpu", 12.5)
+    assert read_pressure("cpu", tmp_path) == 12.5
+    assert read_pressure("io", tmp_path) is None
+
+
+def test_hold_and_resume(tmp_path):
+    write_pressure(tmp_path, "cpu", 50)
+    controller = AdmissionController(max_cpu_pressure=20, interval=10, pressure_dir=tmp_path)
+
+    assert controller.update(now=100) == ["cpu_pressure=50.00 > 20.00"]
+    assert not controller.admit(now=101)
+
+    # the readings are reused until the interval is up
+    write_pressure(tmp_path, "cpu", 5)
+    assert controller.update(now=105)
+    assert controller.update(now=111) == []
+    assert controller.admit(now=112)
+
+    metrics = controller.metrics()
+    assert metrics["held"] == 1
+    assert metrics["admitted"] == 1
+    assert metrics["held_seconds"] == pytest.approx(11)
+    assert metrics["readings"]["cpu_pressure"] == 5
+
+
+def test_disabled_controller_always_admits(tmp_path):
+    write_pressure(tmp_path, "cpu", 100)
+    controller = AdmissionController(pressure_dir=tmp_path)
+    assert not controller.enabled
+    assert controller.admit()
+    assert controller.target_workers(2, 4) == 4
+
+
+def test_autoscale(tmp_path):
+    write_pressure(tmp_path, "memory", 30)
+    controller = AdmissionController(max_memory_pressure=20, autoscale=True, interval=0, pressure_dir=tmp_path)
+
+    assert controller.target_workers(4, 4) == 3
+    write_pressure(tmp_path, "memory", 15)  # under the threshold but not under half of it
+    assert controller.target_workers(3, 4) == 3
+    write_pressure(tmp_path, "memory", 5)
+    assert controller.target_workers(3, 4) == 4
+    assert controller.target_workers(4, 4) == 4
+    assert (controller.shrinks, controller.grows) == (1, 1)
+
+
+def test_pool_holds_starts(tmp_path):
+    write_pressure(tmp_path, "io", 80)
+    q = JobQueue()
+    q.submit([JobSpec(command="true", working_dir=str(tmp_path))])
+
+    controller = AdmissionController(max_io_pressure=50, autoscale=True, interval=0, pressure_dir=tmp_path)
+    pool = DynamicProcessPool(q, max_workers=1, admission=controller)
+    pool.CPUManager = CPUResourceManager(2)
+    pool._worker_limit = 2
+
+    pool.feed_queue()
+    assert not q.running_jobs
+    assert controller.held == 1
+
+    pool.autoscale()
+    assert pool.max_workers == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+
+from lqts.agent import Agent
+from lqts.core.schema import AgentReport, Job, JobID, JobQueue, JobSpec, JobStatus
+
+
+def test_request_job_fits_cores():
+    q = JobQueue()
+    big = q.submit([JobSpec(command="big", working_dir=".", cores=4, priority=20)])[0]
+    small = q.submit([JobSpec(command="small", working_dir=".", cores=1)])[0]
+
+    job = q.request_job(cores=2, agent="a1")
+    assert job.job_id == small
+    assert job.agent == "a1"
+    assert job.status == JobStatus.Running
+    assert small in q.running_jobs
+
+    assert q.request_job(cores=2, agent="a1") is None
+
+    job = q.request_job(cores=4, agent="a2")
+    assert job.job_id == big
+
+
+def test_request_job_respects_dependencies():
+    q = JobQueue()
+    first = q.submit([JobSpec(command="first", working_dir=".")])[0]
+    q.submit([JobSpec(command="second", working_dir=".", depends=[first])])
+
+    assert q.request_job(cores=1).job_id == first
+    assert q.request_job(cores=1) is None
+
+
+def test_request_job_skips_function_jobs():
+    q = JobQueue()
+    q.submit([JobSpec(command="", working_dir=".", function="math:factorial")])
+
+    assert q.request_job(cores=8) is None
+
+
+def test_heartbeat_renews_lease_and_finishes_jobs():
+    q = JobQueue(lease_ttl=30)
+    first, second = q.submit([JobSpec(command="a", working_dir="."), JobSpec(command="b", working_dir=".")])
+    job1 = q.request_job(cores=1, agent="a1")
+    job2 = q.request_job(cores=1, agent="a1")
+    assert job1.lease_expires is not None
+
+    job1.lease_expires = datetime.now()
+    done = job2.model_copy()
+    done.status = JobStatus.Completed
+    done.completed = datetime.now()
+
+    lost = q.agent_report(AgentReport(agent="a1", running=[first], completed=[done]))
+
+    assert lost == []
+    assert job1.lease_expires > datetime.now() + timedelta(seconds=20)
+    assert second in q.completed_jobs
+
+    # another agent can't renew or finish a job it doesn't hold
+    assert q.agent_report(AgentReport(agent="a2", running=[first])) == [first]
+
+
+def test_expired_lease_requeues_then_fails():
+    q = JobQueue(lease_ttl=30, lease_max_retries=1)
+    job_id = q.submit([JobSpec(command="a", working_dir=".")])[0]
+
+    job = q.request_job(cores=1, agent="a1")
+    job.lease_expires = datetime.now() - timedelta(seconds=1)
+    assert q.expire_leases() == [job_id]
+    assert job_id in q.queued_jobs
+    assert job.retries == 1
+    assert job.agent is None
+
+    # the old agent's late report is ignored once the job is handed out again
+    job = q.request_job(cores=1, agent="a2")
+    assert q.agent_report(AgentReport(agent="a1", running=[job_id])) == [job_id]
+
+    job.lease_expires = datetime.now() - timedelta(seconds=1)
+    assert q.expire_leases() == [job_id]
+    assert q.completed_jobs[job_id].status == JobStatus.Error
+
+
+def test_expired_array_member_is_queued_again():
+    q = JobQueue(lease_ttl=30, array_threshold=10)
+    job_ids = q.submit([JobSpec(command=f"a {i}", working_dir=".") for i in range(20)])
+    array = q.array_groups[job_ids[0].group]
+
+    job = q.request_job(cores=1, agent="a1")
+    assert array.counts()["Running"] == 1
+
+    job.lease_expires = datetime.now() - timedelta(seconds=1)
+    assert q.expire_leases() == [job.job_id]
+    assert array.state(job.job_id.index) == JobStatus.Queued
+    assert array.counts() == {"Queued": 20}
+
+
+class FailingSession:
+    """Answers the first *failures* heartbeats with a server error"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.posted = []
+
+    def post(self, url, json=None):
+        self.posted.append(json)
+        response = requests.Response()
+        if self.failures:
+            self.failures -= 1
+            response.status_code = 500
+            response._content = b"Internal Server Error"
+        else:
+            response.status_code = 200
+            response._content = b'{"lost": []}'
+        return response
+
+
+def test_heartbeat_keeps_finished_jobs_on_error():
+    session = FailingSession(failures=1)
+    agent = Agent("http://server", cores=1, name="a1", session=session)
+    job = Job(job_id=JobID(group=1, index=0), job_spec=JobSpec(command="a", working_dir="."))
+    job.status = JobStatus.Completed
+    agent.report(job)
+
+    with pytest.raises(requests.HTTPError):
+        agent.heartbeat()
+    assert agent._finished_jobs == [job]
+
+    # run_once logs the error and the report goes with the next heartbeat
+    agent.stop()
+    agent.run()
+    assert agent._finished_jobs == []
+    assert len(session.posted) == 2
+    assert session.posted[-1]["completed"][0]["job_id"] == {"group": 1, "index": 0}
+
+
+def test_agents_share_queue():
+    from agent_harness import run_harness
+
+    results = run_harness(agents=2, cores=1, jobs=4, duration=0.2, timeout=60)
+
+    assert len(results) == 4
+    assert set(results.values()) == {"agent-0", "agent-1"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,107 @@
+
+import pytest
+
+from conftest import make_specs
+from lqts.core.schema import JobID, JobQueue, JobSpec, JobStatus
+
+
+def start_next(q: JobQueue):
+    job = q.next_job()
+    q.on_job_started(job)
+    return job
+
+
+def finish(q: JobQueue, job, status=JobStatus.Completed):
+    job.status = status
+    job.completed = job.started
+    q.on_job_finished(job)
+
+
+def test_array_members_are_made_on_demand():
+    q = JobQueue(array_threshold=10)
+    job_ids = q.submit(make_specs(1000, log_file="solve{i}.log"))
+
+    assert len(job_ids) == 1000
+    assert len(q.queued_jobs) == 1
+    assert q.queued_count() == 1000
+    assert not q.job_groups
+
+    jobs = [start_next(q) for _ in range(3)]
+    assert [job.job_id for job in jobs] == job_ids[:3]
+    assert jobs[2].job_spec.command == "solve 2"
+    assert jobs[2].job_spec.log_file == "solve2.log"
+    assert len(q.queued_jobs) == 1
+    assert q.queued_count() == 997
+
+    finish(q, jobs[0])
+    finish(q, jobs[1], JobStatus.Error)
+    array = q.array_groups[job_ids[0].group]
+    assert array.summary() == f"{job_ids[0]}-{job_ids[-1]}: 2 done, 1 running, 997 queued, 1 error"
+    assert array.unfinished_ranges() == [[2, 1000]]
+
+
+def test_small_or_mixed_groups_are_not_arrays():
+    q = JobQueue(array_threshold=10)
+    q.submit(make_specs(5, log_file="solve{i}.log"))
+    specs = make_specs(20, log_file="solve{i}.log")
+    specs[3].cores = 2
+    q.submit(specs)
+
+    assert not q.array_groups
+    assert len(q.queued_jobs) == 25
+
+
+def test_dependency_on_pending_member():
+    q = JobQueue(array_threshold=10)
+    job_ids = q.submit(make_specs(20, log_file="solve{i}.log"))
+    waiter = q.submit([JobSpec(command="post", working_dir=".", depends=[job_ids[15]], priority=100)])[0]
+
+    assert not q.check_can_job_run(waiter)
+
+    q.qdel([job_ids[15]])
+    assert q.check_can_job_run(waiter)
+
+
+def test_finished_groups_are_compacted():
+    q = JobQueue(array_threshold=10)
+    job_ids = q.submit(make_specs(10, log_file="solve{i}.log"))
+    single = q.submit([JobSpec(command="one", working_dir=".")])[0]
+
+    while q.queued_jobs:
+        finish(q, start_next(q))
+
+    assert not q.array_groups
+    assert not q.job_groups
+    assert q.unfinished_ids(job_ids[0].group) == []
+    assert single in q.completed_jobs
+
+
+def test_qdel_array_group():
+    q = JobQueue(array_threshold=10)
+    job_ids = q.submit(make_specs(50, log_file="solve{i}.log"))
+    running = start_next(q)
+
+    deleted = q.qdel([JobID.parse_obj(str(job_ids[0].group))])
+
+    assert len(deleted) == 50
+    assert running.status == JobStatus.Deleted
+    assert not q.queued_jobs
+    assert not q.array_groups
+
+
+def test_save_and_load_array(tmp_path):
+    q = JobQueue(array_threshold=10, queue_file=str(tmp_path / "queue.txt"))
+    job_ids = q.submit(make_specs(30, log_file="solve{i}.log"))
+    start_next(q)
+    q.save()
+
+    q2 = JobQueue(array_threshold=10, queue_file=str(tmp_path / "queue.txt"))
+    q2.load()
+
+    assert q2.queued_count() == 30
+    assert q2.next_group_number == job_ids[0].group + 1
+    assert q2.array_groups[job_ids[0].group].unfinished == 30
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
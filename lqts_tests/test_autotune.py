@@ -0,0 +1,92 @@
+import pytest
+
+from lqts.autotune import WorkerAutotuner
+from lqts.core.schema import Job, JobID, JobSpec
+
+
+def make_job(predicted=None):
+    return Job(job_id=JobID(group=1, index=0), job_spec=JobSpec(command="solve", working_dir="."), predicted_runtime=predicted)
+
+
+def run_window(tuner, workers, jobs_per_second, now, seconds=100):
+    """Records a window's worth of completions and returns the tuner's choice"""
+    for _ in range(round(jobs_per_second * seconds)):
+        tuner.record(make_job())
+    return tuner.update(workers, now=now + seconds)
+
+
+def simulate(tuner, throughput, start, windows=30):
+    workers = tuner.update(start, now=0)
+    for i in range(windows):
+        workers = run_window(tuner, workers, throughput[workers], now=100 * i)
+    return workers
+
+
+def test_climbs_to_best_count():
+    # memory bandwidth runs out past 3 concurrent jobs
+    throughput = {1: 1.0, 2: 1.9, 3: 2.5, 4: 2.2, 5: 1.8, 6: 1.5}
+    tuner = WorkerAutotuner(min_workers=1, max_workers=6, interval=100, hysteresis=0.05, memory=100)
+
+    assert simulate(tuner, throughput, start=6) == 3
+    assert tuner.report()["scores"][3] == pytest.approx(2.5)
+    measured = [entry["workers"] for entry in tuner.trajectory]
+    # down to 3, a look at 2, then back
+    assert measured[:7] == [6, 5, 4, 3, 2, 3, 3]
+
+
+def test_scores_expire():
+    throughput = {1: 1.0, 2: 1.9, 3: 2.5, 4: 2.2}
+    tuner = WorkerAutotuner(min_workers=1, max_workers=4, interval=100, memory=5)
+    simulate(tuner, throughput, start=3, windows=30)
+
+    measured = [entry["workers"] for entry in tuner.trajectory]
+    assert measured.count(3) > len(measured) / 2
+    # it went back to look at 4 after the first measurement expired
+    assert measured.count(4) > 1
+
+
+def test_hysteresis_holds_on_a_plateau():
+    throughput = {1: 1.0, 2: 2.0, 3: 2.04, 4: 2.05}
+    tuner = WorkerAutotuner(min_workers=1, max_workers=4, interval=100, hysteresis=0.05, memory=100)
+
+    simulate(tuner, throughput, start=2)
+    measured = [entry["workers"] for entry in tuner.trajectory]
+    # after looking around once it stays put instead of chasing small differences
+    assert len(set(measured[6:])) == 1
+
+
+def test_starved_and_short_windows_are_not_scored():
+    tuner = WorkerAutotuner(min_workers=1, max_workers=4, interval=100, min_completions=5)
+    assert tuner.update(4, now=0) == 4
+
+    # too few completions, the window goes on
+    for _ in range(2):
+        tuner.record(make_job())
+    assert tuner.update(4, now=150) == 4
+    assert not tuner.trajectory
+
+    for _ in range(10):
+        tuner.record(make_job())
+    assert tuner.update(4, saturated=False, now=200) == 4
+    assert tuner.trajectory[-1]["score"] is None
+    assert not tuner.scores
+
+
+def test_job_mix_is_normalized():
+    tuner = WorkerAutotuner(min_workers=1, max_workers=2, interval=10, min_completions=1)
+    tuner.update(2, now=0)
+    for _ in range(4):
+        tuner.record(make_job(predicted=10))
+    tuner.record(make_job(predicted=100))
+    # the long job counts for more than the short ones
+    assert tuner._work > 5
+
+
+def test_disabled_tuner_keeps_the_count():
+    tuner = WorkerAutotuner(min_workers=1, max_workers=4, enabled=False)
+    assert tuner.update(3, now=0) == 3
+    assert tuner.update(3, now=1000) == 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,60 @@
+import pytest
+
+from lqts.benchmark import BenchServer, Submitter, parse_metrics, submit_workload
+
+
+class RecordingServer:
+    """Hands out job ids like the server and remembers what was submitted"""
+
+    def __init__(self):
+        self.submissions = []
+
+    def qsub(self, job_specs):
+        group = len(self.submissions) + 1
+        self.submissions.append(job_specs)
+        return [{"group": group, "index": index} for index in range(len(job_specs))]
+
+
+def submit(name, jobs, workers=4, width=3):
+    server = RecordingServer()
+    submitter = Submitter(server, runtime=0.5, working_dir=".")
+    submit_workload(name, submitter, jobs, workers, width)
+    assert submitter.jobs == jobs
+    assert "time.sleep(0.5)" in server.submissions[0][0].command
+    return server.submissions
+
+
+def test_workload_shapes():
+    assert [len(batch) for batch in submit("tiny", 5)] == [1] * 5
+    assert [len(batch) for batch in submit("array", 1000)] == [1000]
+    assert all(batch[0].cores == 4 for batch in submit("wide", 3))
+
+    chain = submit("chain", 4)
+    assert [[(d.group, d.index) for d in batch[0].depends] for batch in chain] == [[], [(1, 0)], [(2, 0)], [(3, 0)]]
+
+    # root, fan of 3, join, fan of 3, join, fan of 1
+    dag = submit("dag", 10)
+    assert [len(batch) for batch in dag] == [1, 3, 1, 3, 1, 1]
+    assert all(len(spec.depends) == 1 and spec.depends[0].group == 1 for spec in dag[1])
+    assert [(d.group, d.index) for d in dag[2][0].depends] == [(2, 0), (2, 1), (2, 2)]
+
+    with pytest.raises(ValueError):
+        submit("spiral", 1)
+
+
+def test_parse_metrics():
+    text = '# HELP lqts_cores Worker cores\n# TYPE lqts_cores gauge\nlqts_cores{state="allocated"} 3\nlqts_workers 8\n'
+    assert parse_metrics(text) == {'lqts_cores{state="allocated"}': 3.0, "lqts_workers": 8.0}
+
+
+def test_server_starts_on_a_free_port():
+    with BenchServer(workers=1) as server:
+        job_ids = server.qsub([Submitter(server, 0, str(server.dir)).spec()])
+        assert job_ids == [{"group": 1, "index": 0}]
+        assert server.metrics()["lqts_jobs_submitted_total"] == 1
+        directory = server.dir
+    assert not directory.exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from lqts.core.schema import JobQueue, JobSpec
+
+
+def test_oldest_completed_job_is_evicted_on_insert():
+    evicted = []
+    q = JobQueue(completed_limit=3, on_evict=evicted.append)
+    job_ids = q.submit([JobSpec(command=str(i), working_dir=".") for i in range(5)])
+
+    for job_id in job_ids:
+        job = q.queued_jobs[job_id]
+        q.on_job_started(job)
+        job.completed = datetime.now()
+        q.on_job_finished(job)
+        assert len(q.completed_jobs) <= 3
+
+    assert list(q.completed_jobs) == job_ids[2:]
+    assert [job.job_id for job in evicted] == job_ids[:2]
+
+
+def test_prune_by_age():
+    q = JobQueue(completed_limit=10)
+    job_ids = q.submit([JobSpec(command=str(i), working_dir=".") for i in range(4)])
+    for job_id in job_ids:
+        job = q.queued_jobs[job_id]
+        q.on_job_started(job)
+        job.completed = datetime.now()
+        q.on_job_finished(job)
+
+    q.completed_jobs[job_ids[0]].completed = datetime.now() - q.config.prune_time_limit - timedelta(hours=1)
+    q.completed_jobs[job_ids[1]].completed = datetime.now() - q.config.prune_time_limit - timedelta(hours=1)
+
+    q.prune()
+    assert list(q.completed_jobs) == job_ids[2:]
+
+    # lowering the limit takes effect on the next prune
+    q.completed_limit = 1
+    q.prune()
+    assert list(q.completed_jobs) == job_ids[3:]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
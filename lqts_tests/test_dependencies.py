@@ -0,0 +1,134 @@
+import pytest
+
+from conftest import make_specs
+from lqts.core.schema import JobID, JobQueue, JobStatus
+from lqts.qsub_util import parse_dependencies
+
+
+def start(q: JobQueue, job_id: JobID):
+    job = q.queued_jobs[job_id]
+    q.on_job_started(job)
+    return job
+
+
+def finish(q: JobQueue, job, status=JobStatus.Completed, returncode=0):
+    job.status = status
+    job.returncode = returncode
+    job.completed = job.started
+    q.on_job_finished(job)
+
+
+def runnable(q: JobQueue) -> list:
+    return sorted(job_id for job_id in list(q.queued_jobs) if q.check_can_job_run(job_id))
+
+
+def test_afterok():
+    q = JobQueue()
+    first, second = q.submit(make_specs(2))
+    ok_waiter = q.submit(make_specs(1, depends_ok=[first]))[0]
+    failed_waiter = q.submit(make_specs(1, depends_ok=[second]))[0]
+
+    assert runnable(q) == [first, second]
+
+    finish(q, start(q, first))
+    finish(q, start(q, second), JobStatus.Error, 1)
+
+    assert runnable(q) == [ok_waiter]
+    assert q.completed_jobs[failed_waiter].status == JobStatus.Deleted
+
+
+def test_afternotok_and_afterany():
+    q = JobQueue()
+    first, second = q.submit(make_specs(2))
+    cleanup = q.submit(make_specs(1, depends_notok=[first]))[0]
+    report = q.submit(make_specs(1, depends=[first, second]))[0]
+
+    finish(q, start(q, first), JobStatus.Completed, 3)  # a non-zero exit is a failure
+    assert runnable(q) == [second, cleanup]
+
+    finish(q, start(q, second))
+    assert report in runnable(q)
+
+
+def test_afternotok_cancelled_on_success():
+    q = JobQueue()
+    first = q.submit(make_specs(1))[0]
+    cleanup = q.submit(make_specs(1, depends_notok=[first]))[0]
+
+    finish(q, start(q, first))
+    assert runnable(q) == []
+    assert q.completed_jobs[cleanup].status == JobStatus.Deleted
+
+
+def test_aftercorr_arrays_release_members_out_of_order():
+    q = JobQueue(array_threshold=10)
+    stage1 = q.submit(make_specs(20))
+    group = stage1[0].group
+    stage2 = q.submit(make_specs(20, depends_corr=[group]))
+    stage2_array = q.array_groups[stage2[0].group]
+
+    assert stage2_array.pending_count() == 20
+
+    jobs = [start(q, stage1[i]) for i in range(5)]
+    finish(q, jobs[3])
+    finish(q, jobs[1], JobStatus.Error, 1)
+
+    # member 3 is released before members 0-2, member 1 can never run
+    assert runnable(q) == [stage1[5], stage2[3]]
+    assert stage2_array.state(1) == JobStatus.Deleted
+    assert stage2_array.pending_count() == 18
+
+
+def test_aftercorr_plain_groups():
+    q = JobQueue()
+    stage1 = q.submit(make_specs(3))
+    stage2 = q.submit(make_specs(3, depends_corr=[stage1[0].group]))
+
+    finish(q, start(q, stage1[2]))
+    assert runnable(q) == stage1[:2] + [stage2[2]]
+
+
+def test_deleting_queued_array_member_lines_up_the_next():
+    q = JobQueue(array_threshold=10)
+    job_ids = q.submit(make_specs(20))
+
+    q.qdel([job_ids[0]])
+    assert list(q.queued_jobs) == [job_ids[1]]
+
+    q.qdel([JobID.parse_obj(str(job_ids[0].group))])
+    assert not q.queued_jobs
+    assert not q.array_groups
+
+
+def test_cancelling_while_picking_lines_up_array_members():
+    q = JobQueue(array_threshold=10)
+    first = q.submit(make_specs(1))[0]
+    finish(q, start(q, first), JobStatus.Error, 1)
+    waiters = q.submit(make_specs(20, depends_ok=[first]))
+    other = q.submit(make_specs(1, priority=1))[0]
+
+    assert q.next_job().job_id == other
+    start(q, other)
+
+    # each cancelled member lines up the next, which is cancelled in turn
+    assert q.next_job() is None
+    assert not q.queued_jobs
+    assert q.dependency_state(waiters[-1]) == "failed"
+
+
+def test_parse_dependencies():
+    dependencies = parse_dependencies(["12.001", "afterok:13.000:13.002", "afternotok:14.000", "aftercorr:15"])
+    assert dependencies == {
+        "depends": [JobID(group=12, index=1)],
+        "depends_ok": [JobID(group=13, index=0), JobID(group=13, index=2)],
+        "depends_notok": [JobID(group=14, index=0)],
+        "depends_corr": [15],
+    }
+    assert parse_dependencies([]) == {}
+
+    with pytest.raises(ValueError):
+        parse_dependencies(["afterwards:12.001"])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import make_specs
+from lqts.core.schema import JobQueue, JobStatus
+from lqts.fairshare import DecayingUsage, FairShare, parse_shares
+
+
+def run_for(q: JobQueue, job, hours):
+    """Starts *job* and finishes it *hours* later"""
+    q.on_job_started(job)
+    job.started = datetime.now() - timedelta(hours=hours)
+    job.status = JobStatus.Completed
+    job.completed = datetime.now()
+    q.on_job_finished(job)
+
+
+def test_parse_shares():
+    assert parse_shares("alice=2, bob=0.5") == {"alice": 2.0, "bob": 0.5}
+    assert parse_shares("") == {}
+
+
+def test_usage_decays():
+    usage = DecayingUsage(half_life=3600)
+    usage.add("a", 100, now=0)
+    assert usage.get("a", now=3600) == pytest.approx(50)
+    usage.add("a", 50, now=3600)
+    assert usage.get("a", now=7200) == pytest.approx(50)
+    assert usage.get("b", now=0) == 0
+
+
+def test_factors():
+    fairshare = FairShare(shares={"alice": 3})
+    fairshare.users.add("alice", 75, now=datetime.now().timestamp())
+    fairshare.users.add("bob", 25, now=datetime.now().timestamp())
+
+    factors = fairshare.factors({"alice": {1}, "bob": {2}, "carol": {3}})
+    # alice used 75% with a 60% share, bob 25% with 20%, carol nothing
+    assert factors[("alice", 1)] == pytest.approx(2 ** -(0.75 / 0.6))
+    assert factors[("bob", 2)] == pytest.approx(2 ** -(0.25 / 0.2))
+    assert factors[("carol", 3)] == 1.0
+
+
+def test_users_are_interleaved():
+    q = JobQueue(fairshare=FairShare(weight=5))
+    alice = q.submit(make_specs(20, user="alice"))
+    run_for(q, q.next_job(), hours=1)
+    bob = q.submit(make_specs(2, user="bob"))
+
+    # bob's jobs were submitted later but alice has used the machine
+    assert q.next_job().job_id == bob[0]
+    run_for(q, q.next_job(), hours=2)
+    assert q.next_job().job_id == alice[1]
+
+    summary = {item["user"]: item for item in q.user_summary()}
+    assert summary["alice"]["queued"] == 19
+    assert summary["bob"]["usage_core_hours"] == pytest.approx(2, abs=0.01)
+    assert summary["bob"]["factor"] < summary["alice"]["factor"]
+
+
+def test_groups_of_one_user_are_interleaved():
+    q = JobQueue(fairshare=FairShare(weight=5))
+    first = q.submit(make_specs(20, user="alice"))
+    run_for(q, q.next_job(), hours=1)
+    second = q.submit(make_specs(5, user="alice"))
+
+    assert q.next_job().job_id == second[0]
+
+    q.fairshare.weight = 0
+    assert q.next_job().job_id == first[1]
+
+
+def test_large_priority_differences_win():
+    q = JobQueue(fairshare=FairShare(weight=5))
+    alice = q.submit(make_specs(3, user="alice", priority=20))
+    run_for(q, q.next_job(), hours=10)
+    q.submit(make_specs(3, user="bob", priority=10))
+
+    assert q.next_job().job_id == alice[1]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
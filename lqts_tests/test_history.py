@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from lqts.core.schema import JobQueue, JobSpec, JobStatus
+from lqts.history import JobHistory
+
+
+def finish(queue: JobQueue, job_id, status=JobStatus.Completed, seconds=10.0):
+    job, _ = queue.find_job(job_id)
+    queue.on_job_started(job)
+    job.started = datetime.now() - timedelta(seconds=seconds)
+    job.status = status
+    job.completed = datetime.now()
+    queue.on_job_finished(job)
+
+
+def test_finished_jobs_are_batched_into_history(tmp_path):
+    history = JobHistory(tmp_path / "history.db", batch_size=3)
+    q = JobQueue(completed_limit=1, history=history)
+    job_ids = q.submit([JobSpec(command=f"solve {i}", working_dir=".") for i in range(4)])
+
+    for job_id in job_ids[:2]:
+        finish(q, job_id)
+    # nothing is written until a batch is full
+    assert history._pending and history._db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] == 0
+
+    finish(q, job_ids[2], status=JobStatus.Error, seconds=30)
+    assert history._db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] == 3
+
+    q.qdel([job_ids[3]])
+
+    # the history keeps what the queue prunes
+    q.prune()
+    assert len(q.completed_jobs) == 1
+    assert len(history.query()) == 4
+
+    assert [job.job_id for job in history.query(status="E")] == [job_ids[2]]
+    assert [job.job_id for job in history.query(command="solve 1")] == [job_ids[1]]
+    assert len(history.query(group=job_ids[0].group, limit=2)) == 2
+    assert history.query(since=datetime.now() + timedelta(hours=1)) == []
+
+
+def test_evicted_dependencies_cost_one_lookup(tmp_path):
+    history = JobHistory(tmp_path / "history.db", batch_size=1000)
+    q = JobQueue(completed_limit=2, history=history)
+    job_ids = q.submit([JobSpec(command=f"solve {i}", working_dir=".") for i in range(20)])
+    for job_id in job_ids[:-1]:
+        finish(q, job_id)
+    finish(q, job_ids[-1], status=JobStatus.Error)
+    waiter = q.submit([JobSpec(command="report", working_dir=".", depends_ok=job_ids[:-1])])[0]
+
+    # a job the queue has no record of is looked up in the history once
+    q._outcomes.clear()
+    lookups = []
+    get = history.get
+    history.get = lambda job_id: lookups.append(job_id) or get(job_id)
+
+    for _ in range(3):
+        assert q.next_job().job_id == waiter
+    # the last two are still in completed_jobs
+    assert sorted(lookups) == sorted(job_ids[:-2])
+    # found among the jobs waiting to be written, without writing them
+    assert history._db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] == 0
+
+    assert q.dependency_state(job_ids[-1]) == "failed"
+
+
+def test_history_summary(tmp_path):
+    history = JobHistory(tmp_path / "history.db")
+    q = JobQueue(history=history)
+    job_ids = q.submit([JobSpec(command="a", working_dir=".") for i in range(3)])
+    finish(q, job_ids[0], seconds=10)
+    finish(q, job_ids[1], seconds=20)
+    finish(q, job_ids[2], status=JobStatus.Error, seconds=60)
+
+    summary = {row["status"]: row for row in history.summary(by="status")}
+    assert summary["C"]["count"] == 2
+    assert summary["C"]["mean_walltime"] == pytest.approx(15, abs=1)
+    assert summary["E"]["max_walltime"] == pytest.approx(60, abs=1)
+
+    history.close()
+    # the database is usable by a new reader
+    assert len(JobHistory(tmp_path / "history.db").query()) == 3
+
+
+def test_bad_filters(tmp_path):
+    history = JobHistory(tmp_path / "history.db")
+    with pytest.raises(ValueError):
+        history.query(status="foo")
+    with pytest.raises(ValueError):
+        history.summary(by="user")
+
+
+def test_server_rejects_bad_filters():
+    import requests
+
+    from lqts.benchmark import BenchServer
+
+    with BenchServer(workers=1) as server:
+        for path, params in (
+            ("/api_v1/history", {"status": "foo"}),
+            ("/api_v1/history/summary", {"status": "foo"}),
+            ("/api_v1/history/summary", {"by": "user"}),
+        ):
+            response = requests.get(f"{server.url}{path}", params=params, timeout=10)
+            assert response.status_code == 400, (path, params)
+        assert requests.get(f"{server.url}/api_v1/history/summary", timeout=10).status_code == 200
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
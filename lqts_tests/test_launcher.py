@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+
+import psutil
+import pytest
+
+from lqts.core.schema import JobQueue, JobSpec, JobStatus
+from lqts.launcher import Launcher
+from lqts.mp_pool2 import WorkItem
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="the launcher is POSIX only")
+
+
+def wait_for_exit(launcher, pid, timeout=10.0):
+    t0 = time.time()
+    while launcher.returncode(pid) is None and time.time() - t0 < timeout:
+        time.sleep(0.01)
+    return launcher.returncode(pid)
+
+
+def test_spawn_sets_cwd_and_affinity(tmp_path):
+    launcher = Launcher().start()
+    try:
+        log_file = tmp_path / "out.log"
+        cores = sorted(os.sched_getaffinity(0))[:1]
+        pid = launcher.spawn(
+            [sys.executable, "-c", "import os; print(os.getcwd()); print(sorted(os.sched_getaffinity(0)))"],
+            cwd=str(tmp_path),
+            cores=cores,
+            log_file=str(log_file),
+        )
+        assert wait_for_exit(launcher, pid) == 0
+
+        lines = log_file.read_text().splitlines()
+        assert lines[0] == str(tmp_path)
+        assert lines[1] == str(cores)
+    finally:
+        launcher.shutdown()
+
+
+def test_spawn_reports_exit_code(tmp_path):
+    launcher = Launcher().start()
+    try:
+        pid = launcher.spawn([sys.executable, "-c", "raise SystemExit(3)"], cwd=str(tmp_path))
+        assert wait_for_exit(launcher, pid) == 3
+    finally:
+        launcher.shutdown()
+
+
+def test_spawn_missing_command(tmp_path):
+    launcher = Launcher().start()
+    try:
+        with pytest.raises(FileNotFoundError):
+            launcher.spawn(["this-command-does-not-exist"], cwd=str(tmp_path))
+    finally:
+        launcher.shutdown()
+
+
+def test_work_item_with_launcher(tmp_path, monkeypatch):
+    cwd = tmp_path / "server"
+    cwd.mkdir()
+    monkeypatch.chdir(cwd)
+
+    q = JobQueue()
+    # a relative log file is found from the job's working dir
+    log_file = tmp_path / "job.log"
+    js = JobSpec(command=f"{sys.executable} -c \"print('hello')\"", working_dir=str(tmp_path), log_file="job.log")
+    job_id = q.submit([js])[0]
+    job, _ = q.find_job(job_id)
+
+    launcher = Launcher().start()
+    try:
+        wi = WorkItem(job=job, cores=sorted(os.sched_getaffinity(0))[:1], launcher=launcher)
+        wi.start()
+        assert isinstance(wi.process, psutil.Process)
+        # the launcher starts the job in its working dir, the server's is left alone
+        assert os.getcwd() == str(cwd)
+
+        t0 = time.time()
+        while wi.is_running() and time.time() - t0 < 10:
+            time.sleep(0.05)
+
+        assert wi.get_status() == JobStatus.Completed
+        wi.clean_up()
+
+        text = log_file.read_text()
+        assert f"Job ID:  {job_id}" in text
+        assert "hello" in text
+        assert "Job Performance" in text
+    finally:
+        launcher.shutdown()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,95 @@
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from lqts import metrics
+from lqts.core.schema import JobQueue, JobSpec, JobStatus
+from lqts.mp_pool2 import DynamicProcessPool
+from lqts.resources import CPUResourceManager
+
+
+def test_render_text_format():
+    registry = metrics.Registry()
+    requests = registry.counter("requests_total", "Requests", ["route"])
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    registry.add_collector(lambda: [metrics.Gauge("depth", "Depth", ["status"], {"Q": 2, "R": 1})])
+
+    requests.inc(1, "/a")
+    requests.inc(2, "/a")
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{route="/a"} 3' in lines
+    assert "# TYPE latency_seconds histogram" in lines
+    # buckets are cumulative
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "latency_seconds_sum 5.55" in lines
+    assert "latency_seconds_count 3" in lines
+    assert 'depth{status="Q"} 2' in lines
+
+
+def test_broken_collector_is_skipped():
+    registry = metrics.Registry()
+    registry.counter("ok_total", "Fine")
+    registry.add_collector(lambda: 1 / 0)
+    assert "ok_total 0" in registry.render()
+
+
+def test_queue_updates_counters(tmp_path):
+    submitted = metrics.JOBS_SUBMITTED.value()
+    dispatched = metrics.JOBS_DISPATCHED.value()
+    completed = metrics.JOBS_COMPLETED.value("C")
+    waits = metrics.JOB_WAIT.count()
+    saves = metrics.QUEUE_SAVE.count()
+
+    q = JobQueue(queue_file=str(tmp_path / "queue.txt"))
+    job_ids = q.submit([JobSpec(command="solve", working_dir=".") for _ in range(3)])
+    assert metrics.JOBS_SUBMITTED.value() == submitted + 3
+
+    job = q.queued_jobs[job_ids[0]]
+    job.submitted = datetime.now() - timedelta(seconds=30)
+    q.on_job_started(job)
+    assert metrics.JOBS_DISPATCHED.value() == dispatched + 1
+    assert metrics.JOB_WAIT.count() == waits + 1
+
+    job.status = JobStatus.Completed
+    job.completed = datetime.now()
+    q.on_job_finished(job)
+    assert metrics.JOBS_COMPLETED.value("C") == completed + 1
+
+    q.save()
+    assert metrics.QUEUE_SAVE.count() == saves + 1
+    assert metrics.QUEUE_FILE_BYTES._values[()] == (tmp_path / "queue.txt").stat().st_size
+
+    depth = metrics.queue_collector(q)()[0]
+    assert depth._values == {("Q",): 2, ("C",): 1}
+
+
+def test_pool_reaps_jobs(tmp_path):
+    reaped = metrics.JOB_REAP.count()
+
+    q = JobQueue()
+    q.submit([JobSpec(command=f'{sys.executable} -c "pass"', working_dir=str(tmp_path))])
+    pool = DynamicProcessPool(q, max_workers=1)
+    pool.CPUManager = CPUResourceManager(1)
+
+    pool.feed_queue()
+    t0 = time.time()
+    while not q.completed_jobs and time.time() - t0 < 20:
+        pool.process_completions()
+        time.sleep(0.05)
+
+    assert metrics.JOB_REAP.count() == reaped + 1
+    gauges = {gauge.name: gauge for gauge in metrics.pool_collector(pool)()}
+    assert gauges["lqts_cores"]._values == {("allocated",): 0, ("idle",): 1}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
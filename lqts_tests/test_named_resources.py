@@ -0,0 +1,102 @@
+import sys
+import time
+
+import pytest
+
+from conftest import make_specs
+from lqts.core.schema import JobQueue, JobStatus
+from lqts.mp_pool2 import DynamicProcessPool, WorkItem
+from lqts.qsub_util import parse_resources
+from lqts.resources import CPUResourceManager, ResourceManager, parse_counts
+
+
+def test_parse():
+    assert parse_counts("abaqus_lic=8, nvme_io=4") == {"abaqus_lic": 8, "nvme_io": 4}
+    assert parse_counts("") == {}
+    assert parse_resources(["abaqus_lic=2", "nvme_io"]) == {"abaqus_lic": 2, "nvme_io": 1}
+
+
+def test_allocation_is_all_or_nothing():
+    manager = ResourceManager({"lic": 3, "io": 1})
+
+    assert manager.allocate("a", {"lic": 2, "io": 1})
+    assert not manager.allocate("b", {"lic": 1, "io": 1})
+    assert manager.in_use == {"lic": 2, "io": 1}
+
+    manager.release("a")
+    manager.release("a")
+    assert manager.in_use == {"lic": 0, "io": 0}
+    assert manager.allocate("b", {"lic": 1, "io": 1})
+
+    with pytest.raises(ValueError):
+        manager.check({"lic": 4})
+    with pytest.raises(ValueError):
+        manager.check({"matlab": 1})
+
+
+def test_waiting_jobs_let_others_start(tmp_path):
+    q = JobQueue(resources=ResourceManager({"lic": 2}))
+    licensed = q.submit(make_specs(3, "true", tmp_path, resources={"lic": 1}))
+    other = q.submit(make_specs(1, "true", tmp_path))[0]
+
+    for _ in range(2):
+        job = q.next_job()
+        assert q.allocate_resources(job)
+        q.on_job_started(job)
+
+    # the third licensed job waits, the unlicensed one can go
+    assert q.next_job().job_id == other
+
+    status = q.resource_status()["lic"]
+    assert status["in_use"] == 2
+    assert set(status["holders"]) == {str(job_id) for job_id in licensed[:2]}
+    assert status["waiting"] == [str(licensed[2])]
+
+    with pytest.raises(ValueError):
+        q.submit(make_specs(1, "true", tmp_path, resources={"lic": 3}))
+
+
+def test_pool_allocates_with_cores(tmp_path):
+    q = JobQueue(resources=ResourceManager({"lic": 1}))
+    command = f'{sys.executable} -c "import time; time.sleep(0.3)"'
+    job_ids = q.submit(make_specs(3, command, tmp_path, resources={"lic": 1}))
+
+    pool = DynamicProcessPool(q, max_workers=1)
+    pool.CPUManager = CPUResourceManager(3)
+
+    pool.feed_queue()
+    assert list(q.running_jobs) == job_ids[:1]
+    assert pool.CPUManager.cpu_avalaible_count() == 2
+
+    t0 = time.time()
+    while (q.queued_jobs or q.running_jobs) and time.time() - t0 < 30:
+        pool.process_completions()
+        pool.feed_queue()
+        assert len(q.running_jobs) <= 1
+        time.sleep(0.05)
+
+    assert set(q.completed_jobs) == set(job_ids)
+    assert q.resources.in_use == {"lic": 0}
+
+
+def test_failed_start_frees_cores_and_resources(tmp_path, monkeypatch):
+    q = JobQueue(resources=ResourceManager({"lic": 1}))
+    job_id = q.submit(make_specs(1, "true", tmp_path, resources={"lic": 1}))[0]
+
+    def start(self):
+        raise OSError("launcher went away")
+
+    monkeypatch.setattr(WorkItem, "start", start)
+    pool = DynamicProcessPool(q, max_workers=1)
+    pool.CPUManager = CPUResourceManager(1)
+
+    pool.feed_queue()
+    assert pool.CPUManager.cpu_avalaible_count() == 1
+    assert q.resources.in_use == {"lic": 0}
+    assert pool._work_items == {}
+    # errored rather than retried on every pass
+    assert q.completed_jobs[job_id].status == JobStatus.Error
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,77 @@
+import sys
+import time
+
+import pytest
+
+from lqts.core.schema import PHASES, Job, JobID, JobQueue, JobSpec
+from lqts.history import JobHistory
+from lqts.mp_pool2 import DynamicProcessPool
+from lqts.overhead import job_intervals, overhead_report
+from lqts.resources import CPUResourceManager
+
+
+def make_job(group, index, offsets):
+    job = Job(job_id=JobID(group=group, index=index), job_spec=JobSpec(command="solve", working_dir="."))
+    for phase, offset in zip(PHASES, offsets):
+        job.mark(phase, 1000.0 + offset)
+    return job
+
+
+def test_intervals_and_report():
+    # submitted ready selected allocated spawned first_output exited reaped persisted
+    job = make_job(1, 0, [0, 0, 5, 5.1, 5.3, 6, 15.3, 16.3, 17.3])
+    intervals = job_intervals(job)
+    assert intervals["queue_wait"] == pytest.approx(5)
+    assert intervals["spawn"] == pytest.approx(0.2)
+    assert intervals["run"] == pytest.approx(10)
+    assert intervals["reap"] == pytest.approx(1)
+
+    # a job still running has only the intervals it has reached
+    running = make_job(1, 1, [0, 0, 1, 1.1, 1.2])
+    assert set(job_intervals(running)) == {"dependency_wait", "queue_wait", "allocation", "spawn", "dispatch"}
+
+    other = make_job(2, 0, [0, 3, 3, 3, 3, 3, 4, 4, 4])
+
+    report = overhead_report([job, running, other])
+    assert [item["group"] for item in report] == [1, 2]
+    first = report[0]
+    assert first["jobs"] == 2
+    assert first["intervals"]["spawn"]["count"] == 2
+    assert first["intervals"]["run"]["count"] == 1
+    # allocation + spawn + reap + persist
+    assert first["overhead"]["max"] == pytest.approx(0.1 + 0.2 + 1 + 1)
+    assert report[1]["intervals"]["dependency_wait"]["mean"] == pytest.approx(3)
+
+    combined = overhead_report([job, running, other], by_group=False)
+    assert len(combined) == 1 and combined[0]["group"] is None
+    assert combined[0]["jobs"] == 3
+    assert combined[0]["intervals"]["dispatch"]["max"] == pytest.approx(0.3)
+
+
+def test_pool_records_phases(tmp_path):
+    q = JobQueue()
+    q.history = JobHistory(tmp_path / "history.db")
+    job_id = q.submit([JobSpec(command=f"{sys.executable} -c \"print('hello')\"", working_dir=str(tmp_path))])[0]
+    pool = DynamicProcessPool(q, max_workers=1)
+    pool.CPUManager = CPUResourceManager(1)
+
+    pool.feed_queue()
+    t0 = time.time()
+    while job_id not in q.completed_jobs and time.time() - t0 < 20:
+        pool.process_completions()
+        time.sleep(0.05)
+    q.history.flush()
+
+    phases = q.completed_jobs[job_id].phases
+    assert set(phases) == set(PHASES)
+    # output is read by another thread, so it may be noticed after the exit
+    in_order = [phases[name] for name in PHASES if name != "first_output"]
+    assert in_order == sorted(in_order)
+    assert phases["first_output"] >= phases["spawned"]
+
+    # the history has the phases too, including when it was written
+    assert q.history.get(job_id).phases["persisted"] == phases["persisted"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
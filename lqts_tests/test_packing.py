@@ -0,0 +1,93 @@
+import sys
+import time
+
+import pytest
+
+from lqts.core.schema import JobQueue, JobSpec, JobStatus
+from lqts.mp_pool2 import DynamicProcessPool, PackedWorkItem
+from lqts.resources import CPUResourceManager
+
+
+def run_until_done(pool, q, timeout=30.0):
+    t0 = time.time()
+    while (q.queued_jobs or q.running_jobs) and time.time() - t0 < timeout:
+        pool.feed_queue()
+        time.sleep(0.05)
+        pool.process_completions()
+
+
+def test_next_pack(tmp_path):
+    q = JobQueue()
+    js = JobSpec(command="true", working_dir=str(tmp_path), pack=4)
+    job_ids = q.submit([js] * 10)
+
+    first = q.next_job()
+    chunk = q.next_pack(first)
+
+    assert [job.job_id for job in chunk] == job_ids[:4]
+
+
+def test_packed_jobs(tmp_path):
+    q = JobQueue()
+    specs = [
+        JobSpec(
+            command=f'{sys.executable} -c "raise SystemExit({i % 3})"',
+            working_dir=str(tmp_path),
+            pack=8,
+        )
+        for i in range(20)
+    ]
+    job_ids = q.submit(specs)
+
+    pool = DynamicProcessPool(q, max_workers=1, feed_delay=0.0)
+    pool.CPUManager = CPUResourceManager(1)
+    pool.feed_queue()
+
+    # one slot, one runner, a full chunk of jobs running in it
+    assert len(pool._work_items) == 1
+    assert isinstance(list(pool._work_items.values())[0], PackedWorkItem)
+    assert len(q.running_jobs) == 8
+
+    run_until_done(pool, q)
+
+    assert len(q.completed_jobs) == 20
+    for i, job_id in enumerate(job_ids):
+        job = q.completed_jobs[job_id]
+        assert job.returncode == i % 3
+        assert job.status == (JobStatus.Completed if i % 3 == 0 else JobStatus.Error)
+        assert job.completed >= job.started
+
+
+def test_deleting_one_job_of_a_chunk(tmp_path):
+    q = JobQueue()
+    specs = [
+        JobSpec(command=f'{sys.executable} -c "import time; time.sleep(0.3)"', working_dir=str(tmp_path), pack=4)
+        for _ in range(4)
+    ]
+    job_ids = q.submit(specs)
+
+    pool = DynamicProcessPool(q, max_workers=1, feed_delay=0.0)
+    pool.CPUManager = CPUResourceManager(1)
+    pool.feed_queue()
+    assert len(q.running_jobs) == 4
+
+    # the running first job and a later one that hasn't started yet
+    for job_id in (job_ids[0], job_ids[2]):
+        assert q.qdel([job_id]) == [job_id]
+        assert pool.kill_job(job_id)
+    assert len(pool._work_items) == 1
+
+    run_until_done(pool, q)
+
+    statuses = [q.completed_jobs[job_id].status for job_id in job_ids]
+    assert statuses == [JobStatus.Deleted, JobStatus.Completed, JobStatus.Deleted, JobStatus.Completed]
+
+    t0 = time.time()
+    while pool._work_items and time.time() - t0 < 10:
+        pool.process_completions()
+        time.sleep(0.05)
+    assert pool.CPUManager.cpu_avalaible_count() == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
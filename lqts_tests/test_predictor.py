@@ -0,0 +1,94 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from lqts.core.schema import Job, JobID, JobQueue, JobSpec, JobStatus
+from lqts.predictor import P2Quantile, RuntimePredictor, job_keys
+
+
+def finished_job(command, seconds, working_dir=".", status=JobStatus.Completed, returncode=0):
+    started = datetime(2024, 1, 1)
+    return Job(
+        job_id=JobID(group=1, index=0),
+        job_spec=JobSpec(command=command, working_dir=working_dir),
+        status=status,
+        returncode=returncode,
+        started=started,
+        completed=started + timedelta(seconds=seconds),
+    )
+
+
+def test_p2_quantiles():
+    rng = random.Random(1)
+    median, p90 = P2Quantile(0.5), P2Quantile(0.9)
+    for _ in range(20000):
+        x = rng.random()
+        median.add(x)
+        p90.add(x)
+
+    assert median.value() == pytest.approx(0.5, abs=0.02)
+    assert p90.value() == pytest.approx(0.9, abs=0.02)
+
+    few = P2Quantile(0.5)
+    for x in (3, 1, 2):
+        few.add(x)
+    assert few.value() == 2
+
+
+def test_argument_shape():
+    a = job_keys(JobSpec(command='"solver" mesh12.inp --tol 1e-6 -n=4', working_dir="/a"))
+    b = job_keys(JobSpec(command="solver mesh7.inp --tol 1e-8 -n=16", working_dir="/b"))
+
+    assert a[0] != b[0]
+    assert a[1] == b[1] == "solver|*.inp --tol # -n=#"
+    assert a[2] == "solver"
+
+
+def test_predictions_fall_back_to_less_specific_keys():
+    predictor = RuntimePredictor(min_samples=3)
+    assert predictor.predict(JobSpec(command="solver a.inp", working_dir=".")) is None
+
+    predictor.learn_from(finished_job("solver a.inp", seconds) for seconds in (10, 20, 30))
+    predictor.observe(finished_job("solver a.inp", 1000, status=JobStatus.Error, returncode=1))
+    predictor.observe(finished_job("solver -v a.inp", 100))
+
+    assert predictor.predict(JobSpec(command="solver b.inp", working_dir=".")) == 20
+    # one sample isn't enough, so the executable's runtimes are used
+    assert predictor.predict(JobSpec(command="solver -v b.inp", working_dir=".")) == 30
+    assert predictor.predict_p90(JobSpec(command="solver b.inp", working_dir=".")) == 30
+
+
+def test_queue_predictions_and_shortest_first():
+    q = JobQueue(predictor=RuntimePredictor(min_samples=1), shortest_first=True)
+    q.predictor.observe(finished_job("long x", 600))
+    q.predictor.observe(finished_job("short x", 60))
+
+    long_id, short_id = q.submit([JobSpec(command="long y", working_dir="."), JobSpec(command="short y", working_dir=".")])
+    capped_id = q.submit([JobSpec(command="long z", working_dir=".", walltime=100)])[0]
+
+    assert q.queued_jobs[long_id].predicted_runtime == 600
+    assert q.queued_jobs[capped_id].predicted_runtime == 100
+    assert q.next_job().job_id == short_id
+
+    q.shortest_first = False
+    assert q.next_job().job_id == long_id
+
+
+def test_estimate_completion():
+    q = JobQueue(predictor=RuntimePredictor(min_samples=1))
+    q.predictor.observe(finished_job("solve x", 100))
+    job_ids = q.submit([JobSpec(command=f"solve {i}", working_dir=".") for i in range(5)])
+
+    # 5 jobs of 100 s on 2 cores take 3 rounds
+    assert q.estimate_completion(job_ids, cores=2) == {"seconds": 300, "jobs": 5, "unpredicted": 0}
+    assert q.estimate_completion(job_ids[:2], cores=2)["seconds"] == 100
+
+    job = q.next_job()
+    q.on_job_started(job)
+    job.started = datetime.now() - timedelta(seconds=40)
+    assert q.estimate_completion(job_ids, cores=2)["seconds"] == pytest.approx(260, abs=1)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,108 @@
+import sys
+import time
+from datetime import datetime, timedelta
+
+import psutil
+import pytest
+
+from lqts.core.schema import Job, JobID, JobQueue, JobSpec, JobStatus
+from lqts.mp_pool2 import DynamicProcessPool, WorkItem
+from lqts.resources import CPUResourceManager
+
+SLEEP = f'{sys.executable} -c "import time; time.sleep(30)"'
+
+
+def fake_work_item(pool, index, priority, cores, started_minutes_ago):
+    job = Job(
+        job_id=JobID(group=1, index=index),
+        job_spec=JobSpec(command="solve", working_dir=".", priority=priority, cores=len(cores)),
+        started=datetime.now() - timedelta(minutes=started_minutes_ago),
+    )
+    pool.CPUManager.reserve_processors(cores)
+    pool._work_items[job.job_id] = WorkItem(job=job, cores=cores)
+    return job.job_id
+
+
+def wait_for_status(process, stopped, timeout=5.0):
+    t0 = time.time()
+    while (process.status() == psutil.STATUS_STOPPED) != stopped and time.time() - t0 < timeout:
+        time.sleep(0.01)
+    return process.status()
+
+
+def test_victims_lose_the_least_work():
+    pool = DynamicProcessPool(JobQueue(), max_workers=1, preempt_priority=50)
+    pool.CPUManager = CPUResourceManager(6)
+    old = fake_work_item(pool, 0, priority=1, cores=[0, 1], started_minutes_ago=600)
+    recent = fake_work_item(pool, 1, priority=1, cores=[2], started_minutes_ago=5)
+    fake_work_item(pool, 2, priority=5, cores=[3], started_minutes_ago=1)
+    bigger = fake_work_item(pool, 3, priority=1, cores=[4, 5], started_minutes_ago=60)
+
+    urgent = Job(job_spec=JobSpec(command="urgent", working_dir=".", priority=100, cores=1))
+    assert [w.job.job_id for w in pool.select_victims(urgent)] == [recent]
+
+    urgent.job_spec.cores = 2
+    # the recent one-core job is not enough, and not needed once the two-core one is taken
+    assert [w.job.job_id for w in pool.select_victims(urgent)] == [bigger]
+
+    urgent.job_spec.cores = 7
+    assert pool.select_victims(urgent) is None
+
+    # only jobs of lower priority are suspended
+    urgent.job_spec.priority = 1
+    urgent.job_spec.cores = 1
+    assert pool.select_victims(urgent) is None
+    assert old in pool._work_items
+
+
+def test_urgent_job_suspends_and_resumes(tmp_path):
+    q = JobQueue()
+    low = q.submit([JobSpec(command=SLEEP, working_dir=str(tmp_path), priority=1)])[0]
+    pool = DynamicProcessPool(q, max_workers=1, preempt_priority=50)
+    pool.CPUManager = CPUResourceManager(1)
+
+    try:
+        pool.feed_queue()
+        victim = pool._work_items[low]
+
+        urgent = q.submit(
+            [JobSpec(command=f'{sys.executable} -c "pass"', working_dir=str(tmp_path), priority=100)]
+        )[0]
+        pool.feed_queue()
+
+        assert urgent in q.running_jobs
+        assert q.running_jobs[low].status == JobStatus.Paused
+        assert q.running_jobs[low].preempted is not None
+        assert wait_for_status(victim.process, stopped=True) == psutil.STATUS_STOPPED
+
+        t0 = time.time()
+        while urgent not in q.completed_jobs and time.time() - t0 < 20:
+            pool.process_completions()
+            time.sleep(0.05)
+        pool.feed_queue()
+
+        assert q.running_jobs[low].status == JobStatus.Running
+        assert q.running_jobs[low].suspended_seconds > 0
+        assert victim.cores == [0]
+        assert wait_for_status(victim.process, stopped=False) != psutil.STATUS_STOPPED
+    finally:
+        pool.kill_job(None, kill_all=True)
+
+
+def test_preemption_is_off_by_default(tmp_path):
+    q = JobQueue()
+    q.submit([JobSpec(command=SLEEP, working_dir=str(tmp_path), priority=1)])
+    pool = DynamicProcessPool(q, max_workers=1)
+    pool.CPUManager = CPUResourceManager(1)
+
+    try:
+        pool.feed_queue()
+        urgent = q.submit([JobSpec(command="true", working_dir=str(tmp_path), priority=100)])[0]
+        pool.feed_queue()
+        assert urgent in q.queued_jobs
+    finally:
+        pool.kill_job(None, kill_all=True)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
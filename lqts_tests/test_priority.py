@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import make_specs
+from lqts.core.schema import Job, JobID, JobQueue, JobStatus
+
+
+def order(q: JobQueue) -> list:
+    return [job.job_id for job in q.ordered_queued()]
+
+
+def test_order_matches_priority_then_age():
+    q = JobQueue()
+    low = q.submit(make_specs(2, priority=1))
+    high = q.submit(make_specs(2, priority=10))
+
+    assert order(q) == high + low
+    assert q.next_job().job_id == high[0]
+
+
+def test_aging_lets_waiting_jobs_catch_up():
+    q = JobQueue(priority_aging=2.0)  # 2 points per hour
+    old = q.submit(make_specs(1, priority=1))[0]
+    q.queued_jobs[old].submitted = datetime.now() - timedelta(hours=6)
+    q._rebuild_index()
+    new = q.submit(make_specs(1, priority=10))[0]
+
+    # 1 + 2 * 6 = 13 beats 10
+    assert q.effective_priority(q.queued_jobs[old]) == pytest.approx(13, abs=0.01)
+    assert order(q) == [old, new]
+
+    q.priority_aging = 0.0
+    assert order(q) == [new, old]
+
+
+def test_set_priority_reindexes():
+    q = JobQueue()
+    solves = q.submit(make_specs(3))
+    meshes = q.submit(make_specs(3, command="mesh"))
+
+    assert q.set_priority(20, command="mesh*") == 3
+    assert order(q) == meshes + solves
+
+    assert q.set_priority(30, job_ids=[solves[2]]) == 1
+    assert order(q)[0] == solves[2]
+    assert q.queued_jobs[solves[2]].job_spec.priority == 30
+
+    q.queued_jobs[solves[0]].status = JobStatus.Paused
+    assert q.set_priority(40, group=solves[0].group, status="P") == 1
+    assert order(q)[0] == solves[0]
+
+
+def test_set_priority_of_no_jobs():
+    q = JobQueue()
+    job_ids = q.submit(make_specs(3, priority=1))
+
+    # an empty list is no jobs, not every job
+    assert q.set_priority(99, job_ids=[]) == 0
+    assert all(q.queued_jobs[job_id].job_spec.priority == 1 for job_id in job_ids)
+
+
+def test_set_priority_filters_explicit_jobs():
+    q = JobQueue()
+    job_ids = q.submit(make_specs(3))
+    q.queued_jobs[job_ids[0]].status = JobStatus.Paused
+
+    assert q.set_priority(50, job_ids=job_ids, status="P") == 1
+    assert q.set_priority(60, job_ids=job_ids, command="*2") == 1
+    assert [q.queued_jobs[job_id].job_spec.priority for job_id in job_ids] == [50, 10, 60]
+
+
+class Reply:
+    text = "1"
+
+
+def test_qpriority_sends_filters_with_job_ids(monkeypatch):
+    from click.testing import CliRunner
+
+    from lqts.commands import qpriority
+
+    posts = []
+    monkeypatch.setattr(
+        qpriority.requests, "post", lambda url, params=None, json=None: posts.append((url, params, json)) or Reply()
+    )
+
+    result = CliRunner().invoke(qpriority.qpriority, ["20", "3.1", "--status", "Q", "--command", "*mesh*"])
+    assert result.exit_code == 0
+    [(url, params, json)] = posts
+    assert url.endswith("/api_v1/qpriority")
+    assert params == {"priority": "20", "status": "Q", "command": "*mesh*"}
+    assert json == [{"group": 3, "index": 1}]
+
+
+def test_set_priority_of_array_template():
+    q = JobQueue(array_threshold=10)
+    job_ids = q.submit(make_specs(20, priority=1))
+    other = q.submit(make_specs(1, priority=5))[0]
+
+    assert q.set_priority(9, group=job_ids[0].group) == 20
+    q.on_job_started(q.next_job())
+    # the member lined up next was made from the changed template
+    assert q.queued_jobs[job_ids[1]].job_spec.priority == 9
+    assert q.next_job().job_id == job_ids[1]
+    assert other in order(q)
+
+
+def test_index_recovers_from_direct_changes():
+    q = JobQueue()
+    job_ids = q.submit(make_specs(3))
+    assert order(q) == job_ids
+
+    # e.g. a restarted server moving a reattached job back to running
+    q.queued_jobs.pop(job_ids[0])
+    assert order(q) == job_ids[1:]
+
+    q.queued_jobs[JobID(group=9, index=0)] = Job(
+        job_id=JobID(group=9, index=0), job_spec=make_specs(1, priority=50)[0], submitted=datetime.now()
+    )
+    assert order(q) == [JobID(group=9, index=0)] + job_ids[1:]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
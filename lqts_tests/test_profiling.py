@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from lqts.profiling import TIMINGS, collapsed, sample_stacks, timed
+
+
+def test_timed_functions():
+    @timed("test.sync")
+    def work(x):
+        time.sleep(0.01)
+        return x * 2
+
+    @timed("test.async")
+    async def async_work(x):
+        await asyncio.sleep(0.01)
+        return x + 1
+
+    assert work(2) == 4
+    assert work(3) == 6
+    assert asyncio.run(async_work(1)) == 2
+
+    report = TIMINGS.report()
+    assert report["test.sync"]["count"] == 2
+    assert report["test.sync"]["total"] >= 0.02
+    assert report["test.sync"]["max"] >= report["test.sync"]["mean"] > 0
+    assert report["test.async"]["count"] == 1
+
+    # exceptions are still timed
+    @timed("test.error")
+    def fail():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        fail()
+    assert TIMINGS.report()["test.error"]["count"] == 1
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sample_stacks():
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+    thread.start()
+    try:
+        stacks, samples = sample_stacks(0.2, interval=0.005)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert samples > 5
+    busy = [stack for stack in stacks if stack.startswith("busy-worker;")]
+    assert busy and all("test_profiling:busy_loop" in stack for stack in busy)
+    # the sampling thread leaves itself out
+    assert not any("sample_stacks" in stack for stack in stacks)
+
+    text = collapsed(stacks)
+    stack, count = text.splitlines()[0].rsplit(" ", 1)
+    assert stacks[stack] == int(count)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from lqts.core.schema import JobQueue, JobSpec, JobStatus
+from lqts.mp_pool2 import DynamicProcessPool, FunctionWorkItem
+from lqts.py_workers import PythonWorkerPool, resolve_function
+from lqts.resources import CPUResourceManager
+
+
+def wait_for_reply(worker, timeout=20.0):
+    t0 = time.time()
+    while not worker.is_done() and time.time() - t0 < timeout:
+        time.sleep(0.01)
+    return worker.reply
+
+
+def test_resolve_function():
+    import os.path
+
+    assert resolve_function("os.path:join") is os.path.join
+
+
+def test_worker_runs_function(tmp_path):
+    pool = PythonWorkerPool()
+    worker = pool.acquire()
+    try:
+        worker.submit({"function": "math:factorial", "args": [5], "working_dir": str(tmp_path)})
+        assert wait_for_reply(worker) == {"ok": True, "result": 120}
+
+        log_file = tmp_path / "out.log"
+        worker.submit(
+            {
+                "function": "builtins:print",
+                "args": ["hello from the worker"],
+                "working_dir": str(tmp_path),
+                "log_file": str(log_file),
+            }
+        )
+        assert wait_for_reply(worker)["ok"]
+        assert "hello from the worker" in log_file.read_text()
+
+        worker.submit({"function": "math:sqrt", "args": [-1], "working_dir": str(tmp_path)})
+        reply = wait_for_reply(worker)
+        assert not reply["ok"]
+        assert "ValueError" in reply["error"]
+    finally:
+        worker.stop()
+
+
+def test_worker_is_reused_and_recycled(tmp_path):
+    pool = PythonWorkerPool(max_tasks=2)
+    try:
+        worker = pool.acquire()
+        pid = worker.process.pid
+        for i in range(2):
+            worker.submit({"function": "math:factorial", "args": [3], "working_dir": str(tmp_path)})
+            wait_for_reply(worker)
+            pool.release(worker)
+            worker = pool.acquire()
+            if i == 0:
+                assert worker.process.pid == pid
+
+        # the worker ran max_tasks jobs, so it was replaced
+        assert worker.process.pid != pid
+        pool.release(worker)
+    finally:
+        pool.shutdown()
+
+
+def test_function_job_in_pool(tmp_path):
+    q = JobQueue()
+    js = JobSpec(command="", working_dir=str(tmp_path), function="math:factorial", function_args=[10])
+    job_id = q.submit([js])[0]
+
+    pool = DynamicProcessPool(q, max_workers=1, py_pool=PythonWorkerPool())
+    pool.CPUManager = CPUResourceManager(1)
+    try:
+        pool.feed_queue()
+        assert isinstance(pool._work_items[job_id], FunctionWorkItem)
+
+        t0 = time.time()
+        while q.running_jobs and time.time() - t0 < 20:
+            time.sleep(0.05)
+            pool.process_completions()
+
+        assert q.completed_jobs[job_id].status == JobStatus.Completed
+    finally:
+        pool.py_pool.shutdown()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,57 @@
+import pytest
+
+from lqts.core.schema import JobQueue, JobSpec
+from lqts.html.qstat_data import QstatTableData
+
+
+def make_queue(n=30):
+    q = JobQueue()
+    q.submit([JobSpec(command=f"solve case{i:02}", working_dir="/work", priority=i % 3) for i in range(n)])
+    return q
+
+
+def test_paging_and_counts():
+    q = make_queue()
+    data = QstatTableData()
+
+    page = data.query(q, draw=3, start=10, length=5, order_column=0)
+    assert page["draw"] == 3
+    assert page["recordsTotal"] == page["recordsFiltered"] == 30
+    assert [row[3] for row in page["data"]] == [f"solve case{i:02}" for i in range(10, 15)]
+
+    assert len(data.query(q, start=25, length=50)["data"]) == 5
+    assert len(data.query(q, length=-1)["data"]) == 30
+
+
+def test_sort_and_search():
+    q = make_queue()
+    data = QstatTableData()
+
+    page = data.query(q, length=100, order_column=2, order_dir="desc")
+    priorities = [int(row[2]) for row in page["data"]]
+    assert priorities == sorted(priorities, reverse=True)
+
+    page = data.query(q, length=100, search="CASE1 solve")
+    assert page["recordsFiltered"] == 10
+    assert page["recordsTotal"] == 30
+
+
+def test_rebuilt_only_when_the_queue_changes():
+    q = make_queue()
+    data = QstatTableData()
+
+    data.query(q)
+    data.query(q, start=20, search="case2")
+    assert data.rebuilds == 1
+
+    q.submit([JobSpec(command="mesh", working_dir="/work")])
+    assert data.query(q)["recordsTotal"] == 31
+    assert data.rebuilds == 2
+
+    # completed jobs are a different table
+    data.query(q, include_complete=True)
+    assert data.rebuilds == 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+
+import pytest
+
+from lqts.core.schema import JobQueue, JobSpec, JobStatus
+from lqts.mp_pool2 import DynamicProcessPool
+from lqts.resources import CPUResourceManager
+from lqts.result_cache import ResultCache
+
+
+def make_spec(tmp_path, **kwargs):
+    return JobSpec(
+        command="mysolver in.txt",
+        working_dir=str(tmp_path),
+        cache=True,
+        inputs=["in.txt"],
+        outputs=["out.txt"],
+        **kwargs,
+    )
+
+
+def test_key_follows_inputs_and_env(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    (tmp_path / "in.txt").write_text("1")
+    spec = make_spec(tmp_path, cache_env=["SOLVER_MODE"])
+    key = cache.key(spec)
+
+    assert cache.key(spec) == key
+
+    (tmp_path / "in.txt").write_text("22")
+    assert cache.key(spec) != key
+
+    key = cache.key(spec)
+    spec.env["SOLVER_MODE"] = "fast"
+    assert cache.key(spec) != key
+
+
+def test_store_restore_and_lru(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=20)
+    (tmp_path / "in.txt").write_text("1")
+    spec = make_spec(tmp_path)
+
+    assert not cache.restore("a", spec)
+
+    (tmp_path / "out.txt").write_text("result a")
+    assert cache.store("a", spec)
+    (tmp_path / "out.txt").write_text("result b")
+    assert cache.store("b", spec)
+
+    (tmp_path / "out.txt").unlink()
+    assert cache.restore("a", spec)
+    assert (tmp_path / "out.txt").read_text() == "result a"
+
+    # "b" is now the least recently used, so it goes first
+    (tmp_path / "out.txt").write_text("result c")
+    assert cache.store("c", spec)
+    assert cache.stats()["entries"] == 2
+    assert not cache.restore("b", spec)
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 2, 1)
+
+    # the index is rebuilt from disk
+    assert ResultCache(tmp_path / "cache").stats()["entries"] == 2
+
+
+def test_pool_completes_cached_job(tmp_path, monkeypatch):
+    monkeypatch.chdir(os.getcwd())
+    cache = ResultCache(tmp_path / "cache")
+    pool = DynamicProcessPool(JobQueue(), result_cache=cache)
+    pool.CPUManager = CPUResourceManager(1)
+
+    script = tmp_path / "solver.py"
+    script.write_text("open('out.txt', 'w').write(open('in.txt').read() * 2)")
+    (tmp_path / "in.txt").write_text("ab")
+    spec = JobSpec(
+        command=f"{sys.executable} solver.py",
+        working_dir=str(tmp_path),
+        cache=True,
+        inputs=["in.txt"],
+        outputs=["out.txt"],
+    )
+
+    first = pool.job_queue.submit([spec])[0]
+    pool.feed_queue()
+    assert first in pool._work_items
+    t0 = time.time()
+    while first not in pool.job_queue.completed_jobs and time.time() - t0 < 15:
+        pool.process_completions()
+        time.sleep(0.05)
+    assert cache.stats()["stores"] == 1
+
+    (tmp_path / "out.txt").unlink()
+    second = pool.job_queue.submit([spec.model_copy()])[0]
+    pool.feed_queue()
+
+    job = pool.job_queue.completed_jobs[second]
+    assert job.status == JobStatus.Completed
+    assert job.cached
+    assert (tmp_path / "out.txt").read_text() == "abab"
+    assert cache.stats()["hits"] == 1
+
+
+def test_waiting_job_is_looked_up_once(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    pool = DynamicProcessPool(JobQueue(), max_workers=1, result_cache=cache)
+    pool.CPUManager = CPUResourceManager(1)
+    (tmp_path / "in.txt").write_text("1")
+    pool.job_queue.submit([make_spec(tmp_path, cores=2)])
+
+    keys = []
+    key = cache.key
+    cache.key = lambda job_spec: keys.append(job_spec) or key(job_spec)
+
+    # it never gets its 2 cores
+    for _ in range(5):
+        pool.feed_queue()
+    assert len(keys) == 1
+    assert cache.stats()["misses"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
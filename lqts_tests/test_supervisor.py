@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+
+import psutil
+import pytest
+
+from lqts.core.schema import JobQueue, JobSpec, JobStatus
+from lqts.mp_pool2 import DynamicProcessPool, SupervisedWorkItem
+from lqts.resources import CPUResourceManager, ProcState
+from lqts.supervisor import is_supervisor, read_state
+
+
+def make_pool(tmp_path, queue=None):
+    pool = DynamicProcessPool(queue or JobQueue(), max_workers=2, state_dir=str(tmp_path / "state"))
+    pool.CPUManager = CPUResourceManager(2)
+    return pool
+
+
+def wait_for(predicate, timeout=15):
+    t0 = time.time()
+    while not predicate() and time.time() - t0 < timeout:
+        time.sleep(0.05)
+    return predicate()
+
+
+def submit(queue, tmp_path, code):
+    command = f'{sys.executable} -c "{code}"'
+    js = JobSpec(command=command, working_dir=str(tmp_path), log_file=str(tmp_path / "job.log"))
+    return queue.submit([js])[0]
+
+
+def test_supervised_job_runs(tmp_path, monkeypatch):
+    monkeypatch.chdir(os.getcwd())
+    pool = make_pool(tmp_path)
+    job_id = submit(pool.job_queue, tmp_path, "print('hello')")
+
+    pool.feed_queue()
+    work_item = pool._work_items[job_id]
+    assert isinstance(work_item, SupervisedWorkItem)
+
+    assert wait_for(lambda: (pool.process_completions(), job_id in pool.job_queue.completed_jobs)[1])
+
+    job = pool.job_queue.completed_jobs[job_id]
+    assert job.status == JobStatus.Completed
+    assert job.returncode == 0
+    assert not work_item.state_file.exists()
+
+    text = (tmp_path / "job.log").read_text()
+    assert f"Job ID:  {job_id}" in text
+    assert "hello" in text
+    assert "Job Performance" in text
+
+
+def test_reattach_after_restart(tmp_path, monkeypatch):
+    monkeypatch.chdir(os.getcwd())
+    pool = make_pool(tmp_path)
+    long_job = submit(pool.job_queue, tmp_path, "import time; time.sleep(1.5)")
+    short_job = submit(pool.job_queue, tmp_path, "pass")
+    pool.feed_queue()
+    cores = pool._work_items[long_job].cores
+    state_file = pool._work_items[short_job].state_file
+
+    # the server goes away, leaving the jobs running
+    pool.shutdown(wait=False)
+    assert wait_for(lambda: "returncode" in read_state(state_file))
+
+    # a new server loads its saved queue, which lists the jobs as paused
+    queue = JobQueue()
+    for job_id in (long_job, short_job):
+        job = pool.job_queue.running_jobs[job_id].model_copy()
+        job.status = JobStatus.Paused
+        queue.queued_jobs[job_id] = job
+
+    new_pool = make_pool(tmp_path, queue)
+    assert sorted(new_pool.reattach()) == sorted([long_job, short_job])
+
+    # the job that finished while the server was down is already complete
+    assert queue.completed_jobs[short_job].status == JobStatus.Completed
+    assert queue.completed_jobs[short_job].returncode == 0
+
+    # the running job holds on to its cores until it is done
+    assert long_job in queue.running_jobs
+    assert all(new_pool.CPUManager.processors[core] == ProcState.busy for core in cores)
+    assert wait_for(lambda: (new_pool.process_completions(), long_job in queue.completed_jobs)[1])
+    assert new_pool.CPUManager.cpu_avalaible_count() == 2
+
+
+def test_kill_supervised_job(tmp_path, monkeypatch):
+    monkeypatch.chdir(os.getcwd())
+    pool = make_pool(tmp_path)
+    job_id = submit(pool.job_queue, tmp_path, "import time; time.sleep(30)")
+    pool.feed_queue()
+    work_item = pool._work_items[job_id]
+    assert wait_for(lambda: "pid" in read_state(work_item.state_file))
+    pid = read_state(work_item.state_file)["pid"]
+
+    pool.kill_job(job_id)
+
+    assert wait_for(lambda: not is_supervisor(work_item.process.pid) or work_item.process.poll() is not None)
+    assert not psutil.pid_exists(pid) or psutil.Process(pid).status() == psutil.STATUS_ZOMBIE
+    assert not work_item.state_file.exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,88 @@
+import contextlib
+import os
+import sys
+import time
+
+import pytest
+
+from lqts.core.schema import JobID, JobQueue, JobSpec, JobStatus
+from lqts.launcher import Launcher
+from lqts.mp_pool2 import WorkItem
+from lqts.resources import THREAD_COUNT_VARIABLES, thread_environment
+
+
+def test_thread_environment_matches_cores():
+    env = thread_environment(JobID(group=3, index=2), [4, 5])
+
+    for name in THREAD_COUNT_VARIABLES:
+        assert env[name] == "2"
+    assert env["LQTS_JOB_ID"] == "3.002"
+    assert env["LQTS_CORES"] == "4,5"
+    assert env["OMP_PLACES"] == "{4},{5}"
+
+
+def test_thread_environment_overrides():
+    env = thread_environment(JobID(group=1, index=0), [0, 1, 2, 3], threads=1, overrides={"MKL_NUM_THREADS": 2})
+
+    assert env["OMP_NUM_THREADS"] == "1"
+    assert env["MKL_NUM_THREADS"] == "2"
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="The launcher needs Linux")
+def test_job_sees_environment(tmp_path, monkeypatch):
+    monkeypatch.chdir(os.getcwd())
+
+    q = JobQueue()
+    log_file = tmp_path / "job.log"
+    command = f"{sys.executable} -c \"import os; print('threads=' + os.environ['OMP_NUM_THREADS'])\""
+    js = JobSpec(command=command, working_dir=str(tmp_path), log_file=str(log_file), env={"MY_SETTING": "abc"})
+    job_id = q.submit([js])[0]
+    job, _ = q.find_job(job_id)
+    job.started = job.submitted
+
+    launcher = Launcher().start()
+    try:
+        wi = WorkItem(job=job, cores=sorted(os.sched_getaffinity(0))[:1], launcher=launcher)
+        wi.start()
+
+        t0 = time.time()
+        while wi.is_running() and time.time() - t0 < 10:
+            time.sleep(0.05)
+        assert wi.get_status() == JobStatus.Completed
+        wi.clean_up()
+    finally:
+        launcher.shutdown()
+
+    text = log_file.read_text()
+    assert "threads=1" in text
+    # the header records what was injected
+    assert "    OMP_NUM_THREADS=1" in text
+    assert f"    LQTS_JOB_ID={job_id}" in text
+    assert "    MY_SETTING=abc" in text
+
+
+def test_python_worker_limits_running_thread_pools(tmp_path, monkeypatch):
+    from lqts import py_workers
+
+    seen = []
+
+    @contextlib.contextmanager
+    def threadpool_limits(limits=None):
+        seen.append(limits)
+        yield
+
+    monkeypatch.setattr(py_workers, "threadpool_limits", threadpool_limits)
+    monkeypatch.chdir(tmp_path)
+
+    env = thread_environment(JobID(group=1, index=0), [0, 1])
+    reply = py_workers._run_task({"function": "math:factorial", "args": [3], "working_dir": str(tmp_path), "env": env})
+    assert reply == {"ok": True, "result": 6}
+    assert seen == [2]
+
+    # without threadpoolctl the job still runs
+    monkeypatch.setattr(py_workers, "threadpool_limits", None)
+    assert py_workers._run_task({"function": "math:factorial", "args": [3], "working_dir": str(tmp_path)})["ok"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,66 @@
+import pytest
+
+from lqts.core.schema import Job, JobID, JobSpec
+from lqts.html.qtop_data import qtop_snapshot
+from lqts.topology import CpuUtilization, parse_cpulist, read_topology
+
+
+def test_parse_cpulist():
+    assert parse_cpulist("0-3,8,10-11\n") == [0, 1, 2, 3, 8, 10, 11]
+    assert parse_cpulist("5") == [5]
+    assert parse_cpulist("") == []
+
+
+def test_read_topology(tmp_path):
+    for node, cpus in ((0, "0-1"), (1, "2-3")):
+        node_dir = tmp_path / "node" / f"node{node}"
+        node_dir.mkdir(parents=True)
+        (node_dir / "cpulist").write_text(cpus + "\n")
+    for cpu in range(4):
+        topology_dir = tmp_path / "cpu" / f"cpu{cpu}" / "topology"
+        topology_dir.mkdir(parents=True)
+        (topology_dir / "physical_package_id").write_text(f"{cpu // 2}\n")
+
+    # cpu 4 has no entries and falls back to socket 0, node 0
+    assert read_topology(5, tmp_path) == {0: (0, 0), 1: (0, 0), 2: (1, 1), 3: (1, 1), 4: (0, 0)}
+
+
+def write_stat(path, cpus):
+    lines = ["cpu  0 0 0 0 0 0 0 0 0 0"]
+    for cpu, (busy, idle) in enumerate(cpus):
+        lines.append(f"cpu{cpu} {busy} 0 0 {idle} 0 0 0 0 0 0")
+    path.write_text("\n".join(lines) + "\nintr 0\n")
+
+
+def test_utilization_from_proc_stat(tmp_path):
+    stat = tmp_path / "stat"
+    utilization = CpuUtilization(interval=1.0, stat_file=stat)
+
+    write_stat(stat, [(100, 100), (0, 200)])
+    utilization.sample(now=0)
+
+    write_stat(stat, [(175, 125), (0, 300)])
+    # within the interval the previous values are reused
+    assert utilization.sample(now=0.5) == {0: 0.5, 1: 0.0}
+    assert utilization.sample(now=2) == {0: 0.75, 1: 0.0}
+
+
+def test_snapshot_groups_and_states():
+    jobs = [
+        Job(job_id=JobID(group=7, index=0), job_spec=JobSpec(command="a", working_dir="."), cores=[1, 2]),
+        Job(job_id=JobID(group=8, index=0), job_spec=JobSpec(command="b", working_dir="."), cores=[3], agent="remote"),
+    ]
+    topology = {0: (0, 0), 1: (0, 0), 2: (1, 1), 3: (1, 1)}
+    snapshot = qtop_snapshot(jobs, worker_cores=[1, 2, 3], cpu_count=4, topology=topology, utilization={1: 0.9, 2: 0.1})
+
+    assert snapshot["cpu_count"] == 4
+    assert [(g["socket"], g["node"]) for g in snapshot["groups"]] == [(0, 0), (1, 1)]
+    cores = {core["core"]: core for group in snapshot["groups"] for core in group["cores"]}
+    assert [cores[i]["state"] for i in range(4)] == ["unused", "job", "job", "free"]
+    assert cores[1]["job"] == cores[2]["job"] == str(jobs[0].job_id)
+    assert cores[1]["busy"] and not cores[2]["busy"]
+    assert cores[3]["utilization"] is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])